@@ -32,6 +32,8 @@ class CFFContext(object):
 	def __init__(self, fontSet):
 		self.fontSet = fontSet
 		self.varStore = None
+		# when true, charstrings loaded only for dumping them are not kept
+		self.lazy = False
 		
 	def __getattr__(self, name):
 		if name == 'isCFF2':
@@ -57,6 +59,7 @@ class CFFFontSet(object):
 		
 	def decompile(self, file, otFont):
 		self.otFont = otFont
+		self.cffCtx.lazy = getattr(otFont, "lazy", None) is True
 		sstruct.unpack(cffHeaderFormat, file.read(3), self)
 		assert self.major in (1,2), "unknown CFF format: %d.%d" % (self.major, self.minor)
 		if self.major == 1:
@@ -886,8 +889,15 @@ class CharStrings(object):
 		i = 0
 		step = 10
 		numGlyphs = len(names)
+		lazy = self.charStringsAreIndexed and self.charStringsIndex.cffCtx.lazy
 		for name in names:
+			if lazy:
+				index = self.charStrings[name]
+				loaded = self.charStringsIndex.items[index] is not None
 			charStr, fdSelectIndex = self.getItemAndSelector(name)
+			if lazy and not loaded:
+				# decompiled and then dropped by TopDict.decompileAllCharStrings
+				charStr.decompile()
 			if charStr.needsDecompilation():
 				raw = [("raw", 1)]
 			else:
@@ -901,6 +911,8 @@ class CharStrings(object):
 			charStr.toXML(xmlWriter)
 			xmlWriter.endtag("CharString")
 			xmlWriter.newline()
+			if lazy and not loaded:
+				self.charStringsIndex.items[index] = None
 			if not i % step and progress is not None:
 				progress.setLabel("Dumping 'CFF ' table... (%s)" % name)
 				progress.increment(step / numGlyphs)
@@ -2194,8 +2206,25 @@ class TopDict(BaseDict):
 
 	def decompileAllCharStrings(self, progress):
 		# Make sure that all the Private Dicts have been instantiated.
+		charStrings = self.CharStrings
+		if charStrings.charStringsAreIndexed and self.cffCtx.lazy:
+			# Decompile each charstring for the subroutines it calls to get
+			# decompiled too, but don't keep the ones that weren't loaded.
+			charStringsIndex = charStrings.charStringsIndex
+			for i in range(len(charStringsIndex)):
+				loaded = charStringsIndex.items[i] is not None
+				try:
+					charStringsIndex[i].decompile()
+				except:
+					log.error("Error in charstring %s", i)
+					raise
+				if not loaded:
+					charStringsIndex.items[i] = None
+				if not i % 30 and progress:
+					progress.increment(0)  # update
+			return
 		i = 0
-		for charString in self.CharStrings.values():
+		for charString in charStrings.values():
 			try:
 				charString.decompile()
 			except:
@@ -57,6 +57,8 @@ class XMLReader(object):
 	def _parseFile(self, file):
 		from xml.parsers.expat import ParserCreate
 		parser = ParserCreate()
+		# deliver the text between two tags in one call, not line by line
+		parser.buffer_text = True
 		parser.StartElementHandler = self._startElementHandler
 		parser.EndElementHandler = self._endElementHandler
 		parser.CharacterDataHandler = self._characterDataHandler
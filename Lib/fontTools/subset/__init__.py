@@ -13,6 +13,9 @@ import sys
 import struct
 import array
 import logging
+import threading
+from collections import OrderedDict
+from binascii import hexlify
 from types import MethodType
 
 __usage__ = "pyftsubset font-file [glyph...] [--option=value]..."
@@ -373,6 +376,117 @@ def _set_update(s, *others):
 def _dict_subset(d, glyphs):
     return {g:d[g] for g in glyphs}
 
+def _bits_from_ids(gids):
+    bits = 0
+    if not isinstance(gids, (list, tuple)):
+        gids = list(gids)
+    if len(gids) < 16:
+        for gid in gids:
+            bits |= 1 << gid
+        return bits
+    data = bytearray((max(gids) >> 3) + 1)
+    for gid in gids:
+        data[gid >> 3] |= 1 << (gid & 7)
+    data.reverse()
+    return int(hexlify(bytes(data)), 16)
+
+
+class _GlyphIDSet(object):
+    """A set of glyph IDs, stored as the bits of a Python int.
+
+    Union, intersection and comparison of whole sets are single int
+    operations, which is most of what the closure over GSUB does."""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, gids=(), bits=0):
+        self.bits = bits | _bits_from_ids(gids)
+
+    def __contains__(self, gid):
+        return (self.bits >> gid) & 1 == 1
+
+    def __iter__(self):
+        digits = bin(self.bits)[:1:-1]
+        gid = digits.find('1')
+        while gid != -1:
+            yield gid
+            gid = digits.find('1', gid + 1)
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __bool__(self):
+        return self.bits != 0
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.bits == other.bits
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __and__(self, other):
+        return _GlyphIDSet(bits=self.bits & other.bits)
+
+    def __or__(self, other):
+        return _GlyphIDSet(bits=self.bits | other.bits)
+
+    def __sub__(self, other):
+        return _GlyphIDSet(bits=self.bits & ~other.bits)
+
+    def __ior__(self, other):
+        self.bits |= other.bits
+        return self
+
+    def intersects(self, other):
+        return self.bits & other.bits != 0
+
+    def copy(self):
+        return _GlyphIDSet(bits=self.bits)
+
+    def add(self, gid):
+        self.bits |= 1 << gid
+
+    def update(self, gids):
+        self.bits |= _bits_from_ids(gids)
+
+
+class _GlyphIDMap(object):
+    """Maps glyph names to glyph IDs and back. Glyphs missing from the
+    glyph order get IDs past its end."""
+
+    def __init__(self, glyph_order=()):
+        self.glyph_order = list(glyph_order)
+        self.ids = {g:i for i,g in enumerate(self.glyph_order)}
+
+    def get_id(self, glyph):
+        gid = self.ids.get(glyph)
+        if gid is None:
+            gid = self.ids[glyph] = len(self.glyph_order)
+            self.glyph_order.append(glyph)
+        return gid
+
+    def get_ids(self, glyphs):
+        return [self.get_id(g) for g in glyphs]
+
+    def glyph_set(self, glyphs):
+        return _GlyphIDSet(self.get_ids(glyphs))
+
+    def glyph_names(self, glyph_set):
+        return [self.glyph_order[i] for i in glyph_set]
+
+def _closure_data(s, obj, build):
+    """Returns build(glyph_map) for obj, computed once per GSUB closure."""
+    key = id(obj)
+    data = s._closureData.get(key)
+    if data is None:
+        data = s._closureData[key] = build(s._glyph_map)
+    return data
+
 
 @_add_method(otTables.Coverage)
 def intersect(self, glyphs):
@@ -391,6 +505,18 @@ def subset(self, glyphs):
     self.glyphs = [g for g in self.glyphs if g in glyphs]
     return indices
 
+@_add_method(otTables.Coverage)
+def closure_ids(self, s):
+    """Returns the set of glyph IDs of the coverage, and a dict mapping
+    them to coverage indices."""
+    def build(glyph_map):
+        gids = glyph_map.get_ids(self.glyphs)
+        index = {}
+        for i,gid in enumerate(gids):
+            index.setdefault(gid, i)
+        return _GlyphIDSet(gids), index
+    return _closure_data(s, self, build)
+
 @_add_method(otTables.Coverage)
 def remap(self, coverage_map):
     """Remaps coverage."""
@@ -411,6 +537,34 @@ def intersect_class(self, glyphs, klass):
     return set(g for g,v in self.classDefs.items()
                             if v == klass and g in glyphs)
 
+@_add_method(otTables.ClassDef)
+def closure_ids(self, s):
+    """Returns the glyph ID sets of the classes, and the set of all the
+    glyph IDs of the ClassDef."""
+    def build(glyph_map):
+        classes = {}
+        for g,v in self.classDefs.items():
+            classes.setdefault(v, []).append(glyph_map.get_id(g))
+        classes = {v:_GlyphIDSet(gids) for v,gids in classes.items()}
+        return classes, _GlyphIDSet(glyph_map.get_ids(self.classDefs))
+    return _closure_data(s, self, build)
+
+@_add_method(otTables.ClassDef)
+def intersect_ids(self, s, glyph_set):
+    """Returns ascending list of the classes matching glyph_set."""
+    classes, all_glyphs = self.closure_ids(s)
+    return _uniq_sort(
+         ([0] if glyph_set - all_glyphs else []) +
+            [v for v,gids in classes.items() if gids.intersects(glyph_set)])
+
+@_add_method(otTables.ClassDef)
+def intersect_class_ids(self, s, glyph_set, klass):
+    """Returns set of the glyph IDs of glyph_set matching class."""
+    classes, all_glyphs = self.closure_ids(s)
+    if klass == 0:
+        return glyph_set - all_glyphs
+    return glyph_set & classes.get(klass, _GlyphIDSet())
+
 @_add_method(otTables.ClassDef)
 def subset(self, glyphs, remap=False):
     """Returns ascending list of remaining classes."""
@@ -429,9 +583,25 @@ def remap(self, class_map):
     """Remaps classes."""
     self.classDefs = {g:class_map.index(v) for g,v in self.classDefs.items()}
 
+@_add_method(otTables.SingleSubst)
+def closure_ids(self, s):
+    def build(glyph_map):
+        mapping = {glyph_map.get_id(g):glyph_map.get_id(v)
+                   for g,v in self.mapping.items()}
+        return mapping, _GlyphIDSet(mapping)
+    return _closure_data(s, self, build)
+
 @_add_method(otTables.SingleSubst)
 def closure_glyphs(self, s, cur_glyphs):
-    s.glyphs.update(v for g,v in self.mapping.items() if g in cur_glyphs)
+    mapping, keys = self.closure_ids(s)
+    s.glyphs.update(mapping[g] for g in cur_glyphs & keys)
+
+@_add_method(otTables.SingleSubst,
+             otTables.MultipleSubst,
+             otTables.AlternateSubst,
+             otTables.LigatureSubst)
+def closure_input_glyphs(self, s):
+    return self.closure_ids(s)[-1]
 
 @_add_method(otTables.SingleSubst)
 def subset_glyphs(self, s):
@@ -439,11 +609,24 @@ def subset_glyphs(self, s):
                     if g in s.glyphs and v in s.glyphs}
     return bool(self.mapping)
 
-@_add_method(otTables.MultipleSubst)
+@_add_method(otTables.MultipleSubst,
+             otTables.AlternateSubst)
+def closure_ids(self, s):
+    def build(glyph_map):
+        if isinstance(self, otTables.AlternateSubst):
+            mapping = self.alternates
+        else:
+            mapping = self.mapping
+        mapping = {glyph_map.get_id(g):glyph_map.get_ids(v)
+                   for g,v in mapping.items()}
+        return mapping, _GlyphIDSet(mapping)
+    return _closure_data(s, self, build)
+
+@_add_method(otTables.MultipleSubst,
+             otTables.AlternateSubst)
 def closure_glyphs(self, s, cur_glyphs):
-    for glyph, subst in self.mapping.items():
-        if glyph in cur_glyphs:
-            _set_update(s.glyphs, subst)
+    mapping, keys = self.closure_ids(s)
+    s.glyphs.update(v for g in cur_glyphs & keys for v in mapping[g])
 
 @_add_method(otTables.MultipleSubst)
 def subset_glyphs(self, s):
@@ -451,11 +634,6 @@ def subset_glyphs(self, s):
                     if g in s.glyphs and all(sub in s.glyphs for sub in v)}
     return bool(self.mapping)
 
-@_add_method(otTables.AlternateSubst)
-def closure_glyphs(self, s, cur_glyphs):
-    _set_update(s.glyphs, *(vlist for g,vlist in self.alternates.items()
-                            if g in cur_glyphs))
-
 @_add_method(otTables.AlternateSubst)
 def subset_glyphs(self, s):
     self.alternates = {g:vlist
@@ -464,12 +642,26 @@ def subset_glyphs(self, s):
                        all(v in s.glyphs for v in vlist)}
     return bool(self.alternates)
 
+@_add_method(otTables.LigatureSubst)
+def closure_ids(self, s):
+    def build(glyph_map):
+        ligatures = {glyph_map.get_id(g):
+                         [(glyph_map.get_ids(seq.Component),
+                           glyph_map.get_id(seq.LigGlyph)) for seq in seqs]
+                     for g,seqs in self.ligatures.items()}
+        inputs = _GlyphIDSet(ligatures)
+        for seqs in ligatures.values():
+            for components, _ in seqs:
+                inputs.update(components)
+        return ligatures, _GlyphIDSet(ligatures), inputs
+    return _closure_data(s, self, build)
+
 @_add_method(otTables.LigatureSubst)
 def closure_glyphs(self, s, cur_glyphs):
-    _set_update(s.glyphs, *([seq.LigGlyph for seq in seqs
-                             if all(c in s.glyphs for c in seq.Component)]
-                            for g,seqs in self.ligatures.items()
-                            if g in cur_glyphs))
+    ligatures, keys, _ = self.closure_ids(s)
+    glyphs = s.glyphs
+    glyphs.update([lig for g in cur_glyphs & keys for components, lig in ligatures[g]
+                   if all(c in glyphs for c in components)])
 
 @_add_method(otTables.LigatureSubst)
 def subset_glyphs(self, s):
@@ -485,12 +677,24 @@ def subset_glyphs(self, s):
 @_add_method(otTables.ReverseChainSingleSubst)
 def closure_glyphs(self, s, cur_glyphs):
     if self.Format == 1:
-        indices = self.Coverage.intersect(cur_glyphs)
-        if(not indices or
-           not all(c.intersect(s.glyphs)
+        coverage, coverage_index = self.Coverage.closure_ids(s)
+        if(not cur_glyphs.intersects(coverage) or
+           not all(c.closure_ids(s)[0].intersects(s.glyphs)
                    for c in self.LookAheadCoverage + self.BacktrackCoverage)):
             return
-        s.glyphs.update(self.Substitute[i] for i in indices)
+        substitutes = s._glyph_map.get_ids(self.Substitute)
+        s.glyphs.update(substitutes[coverage_index[g]]
+                        for g in cur_glyphs & coverage)
+    else:
+        assert 0, "unknown format: %s" % self.Format
+
+@_add_method(otTables.ReverseChainSingleSubst)
+def closure_input_glyphs(self, s):
+    if self.Format == 1:
+        glyphs = self.Coverage.closure_ids(s)[0].copy()
+        for c in self.LookAheadCoverage + self.BacktrackCoverage:
+            glyphs |= c.closure_ids(s)[0]
+        return glyphs
     else:
         assert 0, "unknown format: %s" % self.Format
 
@@ -888,21 +1092,22 @@ def __subset_classify_context(self):
 def closure_glyphs(self, s, cur_glyphs):
     c = self.__subset_classify_context()
 
-    indices = c.Coverage(self).intersect(cur_glyphs)
-    if not indices:
+    coverage, coverage_index = c.Coverage(self).closure_ids(s)
+    if not cur_glyphs.intersects(coverage):
         return []
-    cur_glyphs = c.Coverage(self).intersect_glyphs(cur_glyphs)
+    cur_glyphs = cur_glyphs & coverage
+    indices = sorted(coverage_index[g] for g in cur_glyphs)
+    glyph_map = s._glyph_map
 
     if self.Format == 1:
-        ContextData = c.ContextData(self)
         rss = getattr(self, c.RuleSet)
         rssCount = getattr(self, c.RuleSetCount)
         for i in indices:
             if i >= rssCount or not rss[i]: continue
             for r in getattr(rss[i], c.Rule):
                 if not r: continue
-                if not all(all(c.Intersect(s.glyphs, cd, k) for k in klist)
-                           for cd,klist in zip(ContextData, c.RuleData(r))):
+                if not all(all(k in s.glyphs for k in klist)
+                           for klist in _context_rule_ids(s, c, r)):
                     continue
                 chaos = set()
                 for ll in getattr(r, c.LookupRecord):
@@ -913,9 +1118,9 @@ def closure_glyphs(self, s, cur_glyphs):
                         pos_glyphs = None
                     else:
                         if seqi == 0:
-                            pos_glyphs = frozenset([c.Coverage(self).glyphs[i]])
+                            pos_glyphs = _GlyphIDSet([glyph_map.get_id(c.Coverage(self).glyphs[i])])
                         else:
-                            pos_glyphs = frozenset([r.Input[seqi - 1]])
+                            pos_glyphs = _GlyphIDSet([glyph_map.get_id(r.Input[seqi - 1])])
                     lookup = s.table.LookupList.Lookup[ll.LookupListIndex]
                     chaos.add(seqi)
                     if lookup.may_have_non_1to1():
@@ -923,7 +1128,7 @@ def closure_glyphs(self, s, cur_glyphs):
                     lookup.closure_glyphs(s, cur_glyphs=pos_glyphs)
     elif self.Format == 2:
         ClassDef = getattr(self, c.ClassDef)
-        indices = ClassDef.intersect(cur_glyphs)
+        indices = ClassDef.intersect_ids(s, cur_glyphs)
         ContextData = c.ContextData(self)
         rss = getattr(self, c.RuleSet)
         rssCount = getattr(self, c.RuleSetCount)
@@ -931,7 +1136,7 @@ def closure_glyphs(self, s, cur_glyphs):
             if i >= rssCount or not rss[i]: continue
             for r in getattr(rss[i], c.Rule):
                 if not r: continue
-                if not all(all(c.Intersect(s.glyphs, cd, k) for k in klist)
+                if not all(all(_context_intersect_class_ids(s, cd, s.glyphs, k) for k in klist)
                            for cd,klist in zip(ContextData, c.RuleData(r))):
                     continue
                 chaos = set()
@@ -943,18 +1148,19 @@ def closure_glyphs(self, s, cur_glyphs):
                         pos_glyphs = None
                     else:
                         if seqi == 0:
-                            pos_glyphs = frozenset(ClassDef.intersect_class(cur_glyphs, i))
+                            pos_glyphs = ClassDef.intersect_class_ids(s, cur_glyphs, i)
                         else:
-                            pos_glyphs = frozenset(ClassDef.intersect_class(s.glyphs, getattr(r, c.Input)[seqi - 1]))
+                            pos_glyphs = ClassDef.intersect_class_ids(s, s.glyphs, getattr(r, c.Input)[seqi - 1])
                     lookup = s.table.LookupList.Lookup[ll.LookupListIndex]
                     chaos.add(seqi)
                     if lookup.may_have_non_1to1():
                         chaos.update(range(seqi, len(getattr(r, c.Input))+2))
                     lookup.closure_glyphs(s, cur_glyphs=pos_glyphs)
     elif self.Format == 3:
-        if not all(x.intersect(s.glyphs) for x in c.RuleData(self)):
+        if not all(x.closure_ids(s)[0].intersects(s.glyphs) for x in c.RuleData(self)):
             return []
         r = self
+        InputCoverage = r.InputCoverage if c.Chain else r.Coverage
         chaos = set()
         for ll in getattr(r, c.LookupRecord):
             if not ll: continue
@@ -964,17 +1170,67 @@ def closure_glyphs(self, s, cur_glyphs):
                 pos_glyphs = None
             else:
                 if seqi == 0:
-                    pos_glyphs = frozenset(cur_glyphs)
+                    pos_glyphs = cur_glyphs
                 else:
-                    pos_glyphs = frozenset(r.InputCoverage[seqi].intersect_glyphs(s.glyphs))
+                    pos_glyphs = InputCoverage[seqi].closure_ids(s)[0] & s.glyphs
             lookup = s.table.LookupList.Lookup[ll.LookupListIndex]
             chaos.add(seqi)
             if lookup.may_have_non_1to1():
-                chaos.update(range(seqi, len(r.InputCoverage)+1))
+                chaos.update(range(seqi, len(InputCoverage)+1))
             lookup.closure_glyphs(s, cur_glyphs=pos_glyphs)
     else:
         assert 0, "unknown format: %s" % self.Format
 
+def _context_rule_ids(s, c, r):
+    """Returns the glyph IDs of the sequences of a Format 1 context rule."""
+    return _closure_data(s, r, lambda glyph_map: [glyph_map.get_ids(seq)
+                                                  for seq in c.RuleData(r)])
+
+def _context_intersect_class_ids(s, cd, glyph_set, klass):
+    if cd:
+        return cd.intersect_class_ids(s, glyph_set, klass)
+    return glyph_set if klass == 0 else _GlyphIDSet()
+
+@_add_method(otTables.ContextSubst,
+             otTables.ChainContextSubst)
+def closure_input_glyphs(self, s):
+    c = self.__subset_classify_context()
+
+    glyphs = c.Coverage(self).closure_ids(s)[0].copy()
+    if self.Format in (1, 2):
+        rules = [r for rs in getattr(self, c.RuleSet) if rs
+                 for r in getattr(rs, c.Rule) if r]
+    else:
+        rules = [self]
+    if self.Format == 1:
+        for r in rules:
+            for seq in _context_rule_ids(s, c, r):
+                glyphs.update(seq)
+    elif self.Format == 2:
+        ContextData = c.ContextData(self)
+        for cd in ContextData:
+            if cd:
+                glyphs |= cd.closure_ids(s)[1]
+        for r in rules:
+            # Class 0 matches any glyph not in the ClassDef
+            if any(0 in klist for klist in c.RuleData(r)):
+                return None
+    elif self.Format == 3:
+        for cov in c.RuleData(self):
+            glyphs |= cov.closure_ids(s)[0]
+    else:
+        assert 0, "unknown format: %s" % self.Format
+
+    for r in rules:
+        for ll in getattr(r, c.LookupRecord):
+            if not ll: continue
+            lookup = s.table.LookupList.Lookup[ll.LookupListIndex]
+            inputs = lookup.closure_input_glyphs(s)
+            if inputs is None:
+                return None
+            glyphs |= inputs
+    return glyphs
+
 @_add_method(otTables.ContextSubst,
              otTables.ContextPos,
              otTables.ChainContextSubst,
@@ -1103,6 +1359,13 @@ def closure_glyphs(self, s, cur_glyphs):
     else:
         assert 0, "unknown format: %s" % self.Format
 
+@_add_method(otTables.ExtensionSubst)
+def closure_input_glyphs(self, s):
+    if self.Format == 1:
+        return self.ExtSubTable.closure_input_glyphs(s)
+    else:
+        assert 0, "unknown format: %s" % self.Format
+
 @_add_method(otTables.ExtensionSubst)
 def may_have_non_1to1(self):
     if self.Format == 1:
@@ -1145,7 +1408,7 @@ def collect_lookups(self):
 @_add_method(otTables.Lookup)
 def closure_glyphs(self, s, cur_glyphs=None):
     if cur_glyphs is None:
-        cur_glyphs = frozenset(s.glyphs)
+        cur_glyphs = s.glyphs.copy()
 
     # Memoize
     if (id(self), cur_glyphs) in s._doneLookups:
@@ -1161,6 +1424,28 @@ def closure_glyphs(self, s, cur_glyphs=None):
     assert(s._activeLookups[-1] == self)
     del s._activeLookups[-1]
 
+@_add_method(otTables.Lookup)
+def closure_input_glyphs(self, s):
+    """Returns the set of glyph IDs whose presence in s.glyphs may change
+    what closure_glyphs() adds, or None if that can be any glyph."""
+    # Memoize
+    key = id(self)
+    if key in s._closureInputs:
+        return s._closureInputs[key]
+    # Be conservative about lookups that recurse into themselves
+    s._closureInputs[key] = None
+
+    glyphs = _GlyphIDSet()
+    for st in self.SubTable:
+        if not st: continue
+        inputs = st.closure_input_glyphs(s)
+        if inputs is None:
+            glyphs = None
+            break
+        glyphs |= inputs
+    s._closureInputs[key] = glyphs
+    return glyphs
+
 @_add_method(otTables.Lookup)
 def subset_glyphs(self, s):
     self.SubTable = [st for st in self.SubTable if st and st.subset_glyphs(s)]
@@ -1342,8 +1627,9 @@ def subset_glyphs(self, s):
   return True
 
 @_add_method(ttLib.getTableClass('GSUB'))
-def closure_glyphs(self, s):
-    s.table = self.table
+def closure_lookups(self, s):
+    """Returns the indices of the lookups that the glyph closure runs, and
+    a dict mapping each of them to the glyph IDs that it reads."""
     if self.table.ScriptList:
         feature_indices = self.table.ScriptList.collect_features()
     else:
@@ -1352,20 +1638,56 @@ def closure_glyphs(self, s):
         lookup_indices = self.table.FeatureList.collect_lookups(feature_indices)
     else:
         lookup_indices = []
-    if self.table.LookupList:
-        while True:
-            orig_glyphs = frozenset(s.glyphs)
-            s._activeLookups = []
-            s._doneLookups = set()
-            for i in lookup_indices:
-                if i >= self.table.LookupList.LookupCount: continue
-                if not self.table.LookupList.Lookup[i]: continue
-                self.table.LookupList.Lookup[i].closure_glyphs(s)
-            del s._activeLookups, s._doneLookups
-            if orig_glyphs == s.glyphs:
-                break
+    if not self.table.LookupList:
+        return [], {}
+    lookups = self.table.LookupList.Lookup
+    lookup_indices = [i for i in lookup_indices
+                      if i < self.table.LookupList.LookupCount and lookups[i]]
+
+    # Find the glyphs that each lookup reads, so that after the first
+    # pass, only the lookups that may add new glyphs are re-run.
+    s.table = self.table
+    s._closureInputs = {}
+    inputs = {i: lookups[i].closure_input_glyphs(s) for i in lookup_indices}
+    del s._closureInputs, s.table
+    return lookup_indices, inputs
+
+@_add_method(ttLib.getTableClass('GSUB'))
+def closure_glyph_ids(self, s, lookup_indices, inputs):
+    """Closes the glyph-ID set s.glyphs over the lookups, as returned by
+    closure_lookups()."""
+    s.table = self.table
+    lookups = self.table.LookupList.Lookup if lookup_indices else []
+    pending = lookup_indices
+    while pending:
+        orig_glyphs = s.glyphs.copy()
+        s._activeLookups = []
+        s._doneLookups = set()
+        for i in pending:
+            lookups[i].closure_glyphs(s)
+        del s._activeLookups, s._doneLookups
+        new_glyphs = s.glyphs - orig_glyphs
+        if not new_glyphs:
+            break
+        pending = [i for i in lookup_indices
+                   if inputs[i] is None or inputs[i].intersects(new_glyphs)]
     del s.table
 
+@_add_method(ttLib.getTableClass('GSUB'))
+def closure_glyphs(self, s):
+    # The closure runs on glyph-ID bitsets; it goes back to glyph
+    # names when done, since that's what the other tables use.
+    if not hasattr(s, '_glyph_map'):
+        s._glyph_map = _GlyphIDMap()
+    glyph_map = s._glyph_map
+    s._closureData = {}
+    s.glyphs = glyph_map.glyph_set(s.glyphs)
+    try:
+        self.closure_glyph_ids(s, *self.closure_lookups(s))
+    finally:
+        s.glyphs = set(glyph_map.glyph_names(s.glyphs))
+        del s._closureData
+
 @_add_method(ttLib.getTableClass('GSUB'),
              ttLib.getTableClass('GPOS'))
 def subset_glyphs(self, s):
@@ -1623,7 +1945,15 @@ def prune_pre_subset(self, font, options):
 
 @_add_method(ttLib.getTableClass('gvar'))
 def subset_glyphs(self, s):
-    self.variations = _dict_subset(self.variations, s.glyphs)
+    variations = self.variations
+    if isinstance(variations, dict):
+        self.variations = _dict_subset(variations, s.glyphs)
+    else:
+        # Lazy mapping: drop the other glyphs without decoding any, so
+        # that the kept glyphs that are never accessed are written back
+        # as their original bytes.
+        for g in [g for g in variations.keys() if g not in s.glyphs]:
+            del variations[g]
     self.glyphCount = len(self.variations)
     return bool(self.variations)
 
@@ -1748,6 +2078,11 @@ def subset_glyphs(self, s):
         self.HorizGlyphConstruction = [self.HorizGlyphConstruction[i] for i in indices]
         self.HorizGlyphCount = len(self.HorizGlyphConstruction)
 
+    # Load the glyphs of the retained constructions while the glyph order
+    # is the original one; the closure may not have read them.
+    for c in (self.VertGlyphConstruction or []) + (self.HorizGlyphConstruction or []):
+        c.closure_glyphs(None)
+
     return True
 
 @_add_method(ttLib.getTableClass('MATH'))
@@ -1868,15 +2203,12 @@ def subset_glyphs(self, s):
         font = cff[fontname]
         cs = font.CharStrings
 
-        # Load all glyphs
-        for g in font.charset:
-            if g not in s.glyphs: continue
-            c, _ = cs.getItemAndSelector(g)
-
         if cs.charStringsAreIndexed:
             indices = [i for i,g in enumerate(font.charset) if g in s.glyphs]
             csi = cs.charStringsIndex
-            csi.items = [csi.items[i] for i in indices]
+            # Load the retained glyphs only, since the index can't be
+            # read from the file anymore once subset.
+            csi.items = [csi[i] for i in indices]
             del csi.file, csi.offsets
             if hasattr(font, "FDSelect"):
                 sel = font.FDSelect
@@ -1890,7 +2222,8 @@ def subset_glyphs(self, s):
                 #sel.format = None
                 sel.format = 3
                 sel.gidArray = [sel.gidArray[i] for i in indices]
-            cs.charStrings = {g:indices.index(v)
+            new_indices = {v:i for i,v in enumerate(indices)}
+            cs.charStrings = {g:new_indices[v]
                               for g,v in cs.charStrings.items()
                               if g in s.glyphs}
         else:
@@ -1904,15 +2237,21 @@ def subset_glyphs(self, s):
 
 @_add_method(psCharStrings.T2CharString)
 def subset_subroutines(self, subrs, gsubrs):
-    p = self.program
-    assert len(p)
-    for i in range(1, len(p)):
-        if p[i] == 'callsubr':
-            assert isinstance(p[i-1], int)
-            p[i-1] = subrs._used.index(p[i-1] + subrs._old_bias) - subrs._new_bias
-        elif p[i] == 'callgsubr':
-            assert isinstance(p[i-1], int)
-            p[i-1] = gsubrs._used.index(p[i-1] + gsubrs._old_bias) - gsubrs._new_bias
+    calls = self._subr_calls
+    del self._subr_calls
+    if not calls:
+        return
+    code = self.bytecode
+    data = []
+    pos = 0
+    for start,end,is_global,index in calls:
+        callee_subrs = gsubrs if is_global else subrs
+        new_index = callee_subrs._new_indices[index] - callee_subrs._new_bias
+        data.append(code[pos:start])
+        data.append(psCharStrings.encodeIntT2(new_index))
+        pos = end
+    data.append(code[pos:])
+    self.setBytecode(bytesjoin(data))
 
 @_add_method(psCharStrings.T2CharString)
 def drop_hints(self):
@@ -1945,23 +2284,128 @@ def drop_hints(self):
 
     del self._hints
 
-class _MarkingT2Decompiler(psCharStrings.SimpleT2Decompiler):
+def _read_t2_int(code, i):
+    b0 = code[i]
+    if b0 == 28:
+        v = (code[i+1] << 8) | code[i+2]
+        return v - 0x10000 if v & 0x8000 else v
+    if b0 <= 246:
+        return b0 - 139
+    if b0 <= 250:
+        return (b0 - 247) * 256 + code[i+1] + 108
+    return -(b0 - 251) * 256 - code[i+1] - 108
+
+class _MarkingT2Scanner(object):
+
+    """Marks the subroutines that charstrings call, reading their bytecode
+    directly instead of decompiling them.
+
+    Only the depth of the operand stack and the hint count are tracked,
+    the way SimpleT2Decompiler does; that is all it takes to find the
+    calls. Each charstring is scanned once per state that it is called
+    in. The first scan of a charstring also records where in its bytecode
+    the subroutine numbers are, as '_subr_calls', for subset_subroutines()
+    to renumber them."""
+
+    _stemOps = frozenset(['hstem', 'vstem', 'hstemhm', 'vstemhm'])
+    _nopOps = frozenset(['return', 'endchar', 'ignore'])
+    _unsupportedOps = frozenset(['blend', 'vsindex',
+                                 'and', 'or', 'not', 'store', 'abs', 'add',
+                                 'sub', 'div', 'load', 'neg', 'eq', 'drop',
+                                 'put', 'get', 'ifelse', 'random', 'mul',
+                                 'sqrt', 'dup', 'exch', 'index', 'roll'])
+
+    def __init__(self, globalSubrs):
+        self.globalSubrs = globalSubrs
+        self._states = {}
+        self._biases = {}
 
-    def __init__(self, localSubrs, globalSubrs):
-        psCharStrings.SimpleT2Decompiler.__init__(self,
-                                                  localSubrs,
-                                                  globalSubrs)
-        for subrs in [localSubrs, globalSubrs]:
+    def execute(self, charString):
+        localSubrs = getattr(charString.private, "Subrs", [])
+        self._scan(charString, localSubrs, 0, 0, 0)
+
+    def _bias(self, subrs):
+        bias = self._biases.get(id(subrs))
+        if bias is None:
+            bias = self._biases[id(subrs)] = psCharStrings.calcSubrBias(subrs)
             if subrs and not hasattr(subrs, "_used"):
                 subrs._used = set()
+        return bias
+
+    def _scan(self, charString, localSubrs, hintCount, hintMaskBytes, depth):
+        key = (id(charString), id(localSubrs), hintCount, hintMaskBytes, depth)
+        state = self._states.get(key)
+        if state is not None:
+            return state
+
+        charString.compile()
+        code = bytearray(charString.bytecode)
+        operators = charString.operators
+        calls = []
+        n = len(code)
+        i = 0
+        numStart = numEnd = None
+        while i < n:
+            b0 = code[i]
+            if b0 >= 32 or b0 == 28:
+                numStart = i
+                if b0 <= 246:
+                    i += 3 if b0 == 28 else 1
+                elif b0 <= 254:
+                    i += 2
+                else:
+                    i += 5
+                numEnd = i
+                depth += 1
+                continue
 
-    def op_callsubr(self, index):
-        self.localSubrs._used.add(self.operandStack[-1]+self.localBias)
-        psCharStrings.SimpleT2Decompiler.op_callsubr(self, index)
-
-    def op_callgsubr(self, index):
-        self.globalSubrs._used.add(self.operandStack[-1]+self.globalBias)
-        psCharStrings.SimpleT2Decompiler.op_callgsubr(self, index)
+            opStart = i
+            if b0 == 12:
+                op = operators.get((12, code[i+1]))
+                i += 2
+            else:
+                op = operators.get(b0)
+                i += 1
+            if op is None:
+                break # Like SimpleT2Decompiler does
+            elif op == 'callsubr' or op == 'callgsubr':
+                assert numEnd == opStart and code[numStart] != 255, \
+                    "subroutine number is not an integer just before %s" % op
+                index = _read_t2_int(code, numStart)
+                depth -= 1
+                if op == 'callsubr':
+                    subrs = localSubrs
+                    is_global = False
+                else:
+                    subrs = self.globalSubrs
+                    is_global = True
+                index += self._bias(subrs)
+                subrs._used.add(index)
+                calls.append((numStart, numEnd, is_global, index))
+                hintCount, hintMaskBytes, depth = self._scan(
+                    subrs[index], localSubrs, hintCount, hintMaskBytes, depth)
+            elif op in self._stemOps:
+                # The hint count doesn't matter once the mask size is known
+                if not hintMaskBytes:
+                    hintCount += depth // 2
+                depth = 0
+            elif op == 'hintmask' or op == 'cntrmask':
+                if not hintMaskBytes:
+                    hintCount += depth // 2
+                    depth = 0
+                    hintMaskBytes = (hintCount + 7) // 8
+                    hintCount = 0
+                i += hintMaskBytes
+            elif op in self._unsupportedOps:
+                raise NotImplementedError(op)
+            elif op not in self._nopOps:
+                depth = 0
+            numEnd = None
+
+        if not hasattr(charString, '_subr_calls'):
+            charString._subr_calls = calls
+        state = self._states[key] = (hintCount, hintMaskBytes, depth)
+        return state
 
 class _DehintingT2Decompiler(psCharStrings.T2WidthExtractor):
 
@@ -2164,7 +2608,8 @@ def prune_post_subset(self, options):
         if hasattr(font, "FDSelect"):
             sel = font.FDSelect
             indices = _uniq_sort(sel.gidArray)
-            sel.gidArray = [indices.index (ss) for ss in sel.gidArray]
+            new_indices = {v:i for i,v in enumerate(indices)}
+            sel.gidArray = [new_indices[ss] for ss in sel.gidArray]
             arr = font.FDArray
             arr.items = [arr[i] for i in indices]
             del arr.file, arr.offsets
@@ -2228,11 +2673,11 @@ def prune_post_subset(self, options):
         # Renumber subroutines to remove unused ones
 
         # Mark all used subroutines
+        scanner = _MarkingT2Scanner(font.GlobalSubrs)
         for g in font.charset:
             c, _ = cs.getItemAndSelector(g)
-            subrs = getattr(c.private, "Subrs", [])
-            decompiler = _MarkingT2Decompiler(subrs, c.globalSubrs)
-            decompiler.execute(c)
+            scanner.execute(c)
+        del scanner
 
         all_subrs = [font.GlobalSubrs]
         if hasattr(font, 'FDSelect'):
@@ -2240,14 +2685,12 @@ def prune_post_subset(self, options):
         elif hasattr(font.Private, 'Subrs') and font.Private.Subrs:
             all_subrs.append(font.Private.Subrs)
 
-        subrs = set(subrs) # Remove duplicates
-
         # Prepare
         for subrs in all_subrs:
             if not hasattr(subrs, '_used'):
                 subrs._used = set()
             subrs._used = _uniq_sort(subrs._used)
-            subrs._old_bias = psCharStrings.calcSubrBias(subrs)
+            subrs._new_indices = {v:i for i,v in enumerate(subrs._used)}
             subrs._new_bias = psCharStrings.calcSubrBias(subrs._used)
 
         # Renumber glyph charstrings
@@ -2277,7 +2720,7 @@ def prune_post_subset(self, options):
 
         # Cleanup
         for subrs in all_subrs:
-            del subrs._used, subrs._old_bias, subrs._new_bias
+            del subrs._used, subrs._new_indices, subrs._new_bias
 
     return True
 
@@ -2669,7 +3112,9 @@ class Subsetter(object):
                 log.info("Closing glyph list over 'GSUB': %d glyphs before",
                          len(self.glyphs))
                 log.glyphs(self.glyphs, font=font)
+                self._glyph_map = _GlyphIDMap(glyph_order)
                 font['GSUB'].closure_glyphs(self)
+                del self._glyph_map
                 self.glyphs.intersection_update(realGlyphs)
                 log.info("Closed glyph list over 'GSUB': %d glyphs after",
                          len(self.glyphs))
@@ -2830,6 +3275,254 @@ def save_font(font, outfile, options):
     font.flavor = options.flavor
     font.save(outfile, reorderTables=options.canonical_order)
 
+class _LRUCache(object):
+    """A dict of the last 'size' items set or looked up."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is not None:
+                self._items[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+class PreparedFont(object):
+    """A font to make many subsets of, as a web font server does.
+
+    The font file is read once, and the tables that the glyph closure
+    reads ('cmap', 'GSUB' and 'glyf', as well as 'MATH' and 'COLR') are
+    decompiled and pruned once. The map from Unicode to glyph IDs, the
+    glyphs that each GSUB lookup reads, the GSUB coverage indices and
+    the component graph of 'glyf' are built from them up front, and the
+    glyph closure of each new request runs on those. The closures of
+    recent requests are kept, and so are the recent subset fonts, as
+    bytes.
+
+    Each subset is made from a new TTFont reading the font from memory,
+    so the prepared tables are never modified, and the tables that the
+    subsetter doesn't touch are copied without being decompiled.
+
+    The options can't be changed once the font is prepared."""
+
+    # Subsetter attributes that _closure_glyphs() computes
+    _plan_attrs = ('glyphs_requested', 'glyphs_missing', 'unicodes_missing',
+                   'glyphs_cmaped', 'glyphs_gsubed', 'glyphs_mathed',
+                   'glyphs_colred', 'glyphs_glyfed', 'glyphs_all')
+
+    # Tables that Subsetter._closure_glyphs() reads
+    _closure_tables = ('cmap', 'GSUB', 'MATH', 'COLR', 'glyf')
+
+    def __init__(self, fontFile, options=None, cache_size=64, plan_cache_size=1024):
+
+        if not options:
+            options = Options()
+
+        self.options = options
+        if hasattr(fontFile, 'read'):
+            self.data = fontFile.read()
+        else:
+            with open(fontFile, 'rb') as f:
+                self.data = f.read()
+
+        # Prune the closure tables as _prune_pre_subset() does for each
+        # subset, but only once.
+        font = load_font(BytesIO(self.data), options)
+        for tag in self._closure_tables:
+            if tag not in font or tag in options.drop_tables:
+                continue
+            table = font[tag]
+            if (hasattr(table, 'prune_pre_subset') and
+                    not table.prune_pre_subset(font, options)):
+                del font[tag]
+        self.tables = {tag: font[tag] for tag in self._closure_tables
+                       if tag in font}
+
+        glyph_order = font.getGlyphOrder()
+        self._glyph_map = glyph_map = _GlyphIDMap(glyph_order)
+        self._glyph_count = len(glyph_order)
+
+        # Unicode to glyph IDs, over all the Unicode cmap subtables
+        self._cmap = {}
+        self._unicodes_cmapped = set()
+        if 'cmap' in self.tables:
+            for t in self.tables['cmap'].tables:
+                if not t.isUnicode(): continue
+                if t.format == 14:
+                    items = [(u,g) for uvs in t.uvsDict.values()
+                             for u,g in uvs if g is not None]
+                else:
+                    items = t.cmap.items()
+                for u,g in items:
+                    self._cmap.setdefault(u, set()).add(glyph_map.get_id(g))
+                self._unicodes_cmapped.update(t.cmap)
+        # Unicodes that aren't in the cmap don't change the subset, so
+        # requests are cached without them.
+        self.unicodes_mapped = frozenset(self._cmap)
+
+        # The lookups that the closure runs, with the glyphs each reads,
+        # and the coverage data of their subtables as glyph-ID sets
+        self._closure_data = {}
+        if 'GSUB' in self.tables:
+            s = Subsetter(options)
+            s._glyph_map = glyph_map
+            s._closureData = self._closure_data
+            self._gsub_lookups = self.tables['GSUB'].closure_lookups(s)
+
+        # Composite glyph IDs to the IDs of their components
+        self._components = {}
+        if 'glyf' in self.tables:
+            glyf = self.tables['glyf']
+            for gid,g in enumerate(glyph_order):
+                if g not in glyf.glyphs: continue
+                components = glyf.glyphs[g].getComponentNames(glyf)
+                if components:
+                    self._components[gid] = glyph_map.get_ids(components)
+
+        font.close()
+
+        self._lock = threading.Lock()
+        self._plans = _LRUCache(plan_cache_size)
+        self._fonts = _LRUCache(cache_size)
+
+    def _request_key(self, subsetter):
+        unicodes = subsetter.unicodes_requested
+        if self.options.ignore_missing_unicodes:
+            unicodes = unicodes.intersection(self.unicodes_mapped)
+        return (frozenset(unicodes),
+                frozenset(subsetter.glyph_names_requested),
+                frozenset(subsetter.glyph_ids_requested))
+
+    def _closure_glyphs(self, s, font):
+        """Does what s._closure_glyphs(font) does, on the prepared tables,
+        for font loaded from the prepared data."""
+        options = self.options
+        glyph_order = font.getGlyphOrder()
+        glyph_count = self._glyph_count
+        glyph_map = self._glyph_map
+        names = lambda glyphs: frozenset(glyph_order[i] for i in glyphs
+                                         if i < glyph_count)
+
+        # The glyph IDs are the same, but font may not have the glyph
+        # names of the prepared font.
+        reverse = font.getReverseGlyphMap()
+
+        s.glyphs_requested = set(s.glyph_names_requested)
+        s.glyphs_requested.update(glyph_order[i] for i in s.glyph_ids_requested
+                                  if i < glyph_count)
+        s.glyphs_missing = set(g for g in s.glyphs_requested if g not in reverse)
+        s.glyphs_missing.update(i for i in s.glyph_ids_requested
+                                if i >= glyph_count)
+        if s.glyphs_missing:
+            log.info("Missing requested glyphs: %s", s.glyphs_missing)
+            if not options.ignore_missing_glyphs:
+                raise s.MissingGlyphsSubsettingError(s.glyphs_missing)
+
+        glyphs = _GlyphIDSet(reverse[g] for g in s.glyphs_requested
+                             if g in reverse)
+
+        s.unicodes_missing = set()
+        if 'cmap' in self.tables:
+            for u in s.unicodes_requested:
+                if u in self._cmap:
+                    glyphs.update(self._cmap[u])
+            s.unicodes_missing = s.unicodes_requested - self._unicodes_cmapped
+        s.glyphs_cmaped = names(glyphs)
+        if s.unicodes_missing:
+            missing = ["U+%04X" % u for u in s.unicodes_missing]
+            log.info("Missing glyphs for requested Unicodes: %s", missing)
+            if not options.ignore_missing_unicodes:
+                raise s.MissingUnicodesSubsettingError(missing)
+            del missing
+
+        if options.notdef_glyph:
+            if 'glyf' in font:
+                glyphs.add(0)
+            elif '.notdef' in reverse:
+                glyphs.add(reverse['.notdef'])
+        if options.recommended_glyphs and 'glyf' in font:
+            glyphs.update(range(min(4, glyph_count)))
+
+        # These closures may add glyphs missing from the glyph order to
+        # the shared glyph map.
+        with self._lock:
+            if 'GSUB' in self.tables:
+                with timer("close glyph list over 'GSUB'"):
+                    s._glyph_map = glyph_map
+                    s._closureData = self._closure_data
+                    s.glyphs = glyphs
+                    self.tables['GSUB'].closure_glyph_ids(s, *self._gsub_lookups)
+                    del s._glyph_map, s._closureData, s.glyphs
+            s.glyphs_gsubed = names(glyphs)
+
+            for tag in ('MATH', 'COLR'):
+                if tag in self.tables:
+                    with timer("close glyph list over '%s'" % tag):
+                        # These work on the glyph names of the prepared font
+                        s.glyphs = set(glyph_map.glyph_names(glyphs))
+                        self.tables[tag].closure_glyphs(s)
+                        glyphs = glyph_map.glyph_set(s.glyphs)
+                        del s.glyphs
+                setattr(s, 'glyphs_mathed' if tag == 'MATH' else 'glyphs_colred',
+                        names(glyphs))
+
+        if self._components:
+            with timer("close glyph list over 'glyf'"):
+                decompose = glyphs
+                while decompose:
+                    components = _GlyphIDSet()
+                    for gid in decompose:
+                        components.update(self._components.get(gid, ()))
+                    decompose = components - glyphs
+                    glyphs |= decompose
+        s.glyphs_glyfed = names(glyphs)
+
+        s.glyphs_all = s.glyphs_glyfed
+
+        log.info("Retaining %d glyphs", len(s.glyphs_all))
+
+    def subset(self, glyphs=[], gids=[], unicodes=[], text=""):
+        """Returns the subset font, compiled, for the glyphs and characters
+        specified as for Subsetter.populate()."""
+        subsetter = Subsetter(options=self.options)
+        subsetter.populate(glyphs=glyphs, gids=gids, unicodes=unicodes, text=text)
+        key = self._request_key(subsetter)
+
+        data = self._fonts.get(key)
+        if data is not None:
+            return data
+
+        dontLoadGlyphNames = not self.options.glyph_names and not glyphs
+        font = load_font(BytesIO(self.data), self.options,
+                         dontLoadGlyphNames=dontLoadGlyphNames)
+        subsetter._prune_pre_subset(font)
+        plan = self._plans.get(key)
+        if plan is None:
+            self._closure_glyphs(subsetter, font)
+            plan = {k: getattr(subsetter, k) for k in self._plan_attrs}
+            self._plans[key] = plan
+        else:
+            subsetter.__dict__.update(plan)
+        subsetter._subset_glyphs(font)
+        subsetter._prune_post_subset(font)
+
+        f = BytesIO()
+        save_font(font, f, self.options)
+        font.close()
+        data = f.getvalue()
+        self._fonts[key] = data
+        return data
+
 def parse_unicodes(s):
     import re
     s = re.sub (r"0[xX]", " ", s)
@@ -2986,6 +3679,7 @@ def main(args=None):
 __all__ = [
     'Options',
     'Subsetter',
+    'PreparedFont',
     'load_font',
     'save_font',
     'parse_gids',
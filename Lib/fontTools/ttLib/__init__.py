@@ -46,6 +46,8 @@ from fontTools.misc.py23 import *
 from fontTools.misc.loggingTools import deprecateArgument, deprecateFunction
 import os
 import sys
+import array
+import types
 import logging
 
 
@@ -65,7 +67,8 @@ class TTFont(object):
 	def __init__(self, file=None, res_name_or_index=None,
 			sfntVersion="\000\001\000\000", flavor=None, checkChecksums=False,
 			verbose=None, recalcBBoxes=True, allowVID=False, ignoreDecompileErrors=False,
-			recalcTimestamp=True, fontNumber=-1, lazy=None, quiet=None):
+			recalcTimestamp=True, fontNumber=-1, lazy=None, quiet=None,
+			useMmap=False, reuseUnmodifiedTables=False):
 
 		"""The constructor can be called with a few different arguments.
 		When reading a font from disk, 'file' should be either a pathname
@@ -120,6 +123,23 @@ class TTFont(object):
 		If lazy is set to True, many data structures are loaded lazily, upon
 		access only.  If it is set to False, many data structures are loaded
 		immediately.  The default is lazy=None which is somewhere in between.
+
+		If useMmap is set to True, the input file is memory-mapped instead of
+		being read in memory, and the raw table data are returned as memoryview
+		slices of the mapping (on Python 3), which are only copied when a table
+		is decompiled. This is useful when only a few tables of large fonts
+		are needed. The mapping is released by close(); the file must not be
+		modified while the font is open. Files which can't be mapped (e.g.
+		BytesIO streams) are read as usual.
+
+		If reuseUnmodifiedTables is set to True, a snapshot of each table's
+		content is taken right after it is decompiled. Upon save/compile,
+		tables whose content (and glyph order) did not change since then are
+		not recompiled: their original binary data is copied from the input
+		file instead. This speeds up saving fonts whose tables were loaded
+		only for inspection, at the cost of taking the snapshots. Tables
+		recalculated from other tables (e.g. 'head' or 'maxp' when
+		recalcTimestamp or recalcBBoxes are true) are always recompiled.
 		"""
 
 		from fontTools.ttLib import sfnt
@@ -131,6 +151,9 @@ class TTFont(object):
 			setattr(self, name, val)
 
 		self.lazy = lazy
+		self.useMmap = useMmap
+		self.reuseUnmodifiedTables = reuseUnmodifiedTables
+		self._fingerprints = {}
 		self.recalcBBoxes = recalcBBoxes
 		self.recalcTimestamp = recalcTimestamp
 		self.tables = {}
@@ -168,7 +191,7 @@ class TTFont(object):
 		else:
 			# assume "file" is a readable file object
 			closeStream = False
-		if not self.lazy:
+		if not self.lazy and not self.useMmap:
 			# read input file in memory and wrap a stream around it to allow overwriting
 			tmp = BytesIO(file.read())
 			if hasattr(file, 'name'):
@@ -177,7 +200,8 @@ class TTFont(object):
 			if closeStream:
 				file.close()
 			file = tmp
-		self.reader = sfnt.SFNTReader(file, checkChecksums, fontNumber=fontNumber)
+		self.reader = sfnt.SFNTReader(file, checkChecksums, fontNumber=fontNumber,
+				useMmap=self.useMmap)
 		self.sfntVersion = self.reader.sfntVersion
 		self.flavor = self.reader.flavor
 		self.flavorData = self.reader.flavorData
@@ -187,16 +211,32 @@ class TTFont(object):
 		if self.reader is not None:
 			self.reader.close()
 
-	def save(self, file, reorderTables=True):
+	def save(self, file, reorderTables=True, workers=None):
 		"""Save the font to disk. Similarly to the constructor,
 		the 'file' argument can be either a pathname or a writable
 		file object.
+
+		If 'workers' is greater than 1, the tables which no other table
+		depends upon (e.g. 'GSUB', 'GPOS', 'CFF ', 'gvar', 'post') are
+		compiled in a pool of that many worker processes, after all the
+		tables they may depend upon have been compiled in this process.
+		The output is the same as when compiling the tables one by one,
+		except that the changes which compiling a table makes to the
+		table itself (e.g. promoting lookups to Extension to fix offset
+		overflows) are not kept in the TTFont object. This requires the
+		'fork' start method for worker processes; on platforms without
+		it, or when the font is read lazily from a file on disk, the
+		tables are compiled one by one.
 		"""
 		from fontTools.ttLib import sfnt
 		if not hasattr(file, "write"):
 			if self.lazy and self.reader.file.name == file:
 				raise TTLibError(
 					"Can't overwrite TTFont when 'lazy' attribute is True")
+			if (self.useMmap and self.reader is not None and
+					getattr(self.reader.file, "name", None) == file):
+				raise TTLibError(
+					"Can't overwrite TTFont when 'useMmap' attribute is True")
 			closeStream = True
 			file = open(file, "wb")
 		else:
@@ -214,9 +254,12 @@ class TTFont(object):
 		tmp = BytesIO()
 		writer = sfnt.SFNTWriter(tmp, numTables, self.sfntVersion, self.flavor, self.flavorData)
 
-		done = []
-		for tag in tags:
-			self._writeTable(tag, writer, done)
+		if workers is not None and workers > 1 and self._canForkWorkers():
+			self._writeTablesInParallel(tags, writer, workers)
+		else:
+			done = []
+			for tag in tags:
+				self._writeTable(tag, writer, done)
 
 		writer.close()
 
@@ -245,13 +288,17 @@ class TTFont(object):
 
 	def saveXML(self, fileOrPath, progress=None, quiet=None,
 			tables=None, skipTables=None, splitTables=False, disassembleInstructions=True,
-			bitmapGlyphDataFormat='raw', newlinestr=None):
+			bitmapGlyphDataFormat='raw', newlinestr=None, streaming=False):
 		"""Export the font as TTX (an XML-based text file), or as a series of text
 		files when splitTables is true. In the latter case, the 'fileOrPath'
 		argument should be a path to a directory.
 		The 'tables' argument must either be false (dump all tables) or a
 		list of tables to dump. The 'skipTables' argument may be a list of tables
 		to skip, but only when the 'tables' argument is false.
+		If 'streaming' is true, tables that haven't been loaded yet are
+		decompiled lazily, written out glyph by glyph, and dropped again
+		once dumped, so that memory use doesn't grow with the font size.
+		The output is the same.
 		"""
 		from fontTools import version
 		from fontTools.misc import xmlWriter
@@ -308,7 +355,10 @@ class TTFont(object):
 				writer.newline()
 			else:
 				tableWriter = writer
-			self._tableToXML(tableWriter, tag, progress)
+			if streaming:
+				self._tableToXMLStreaming(tableWriter, tag, progress)
+			else:
+				self._tableToXML(tableWriter, tag, progress)
 			if splitTables:
 				tableWriter.endtag("ttFont")
 				tableWriter.newline()
@@ -322,6 +372,21 @@ class TTFont(object):
 		if not hasattr(fileOrPath, "write") and fileOrPath != "-":
 			writer.close()
 
+	def _tableToXMLStreaming(self, writer, tag, progress):
+		loadedTables = set(self.tables)
+		lazy = self.lazy
+		self.lazy = True
+		try:
+			self._tableToXML(writer, tag, progress)
+		finally:
+			self.lazy = lazy
+			# drop the tables, including any dependencies, that were only
+			# loaded for dumping this one; they can be loaded again later
+			for t in list(self.tables):
+				if t not in loadedTables:
+					del self.tables[t]
+					self._fingerprints.pop(t, None)
+
 	def _tableToXML(self, writer, tag, progress, quiet=None):
 		if quiet is not None:
 			deprecateArgument("quiet", "configure logging instead")
@@ -416,12 +481,17 @@ class TTFont(object):
 				import traceback
 				log.debug("Reading '%s' table from disk", tag)
 				data = self.reader[tag]
+				if isinstance(data, memoryview):
+					data = data.tobytes()
 				tableClass = getTableClass(tag)
 				table = tableClass(tag)
 				self.tables[tag] = table
 				log.debug("Decompiling '%s' table", tag)
 				try:
 					table.decompile(data, self)
+					if self.reuseUnmodifiedTables:
+						self._fingerprints[tag] = (
+							table, self._getGlyphOrderSnapshot(), _fingerprint(table))
 				except:
 					if not self.ignoreDecompileErrors:
 						raise
@@ -447,6 +517,7 @@ class TTFont(object):
 			raise KeyError("'%s' table not found" % tag)
 		if tag in self.tables:
 			del self.tables[tag]
+		self._fingerprints.pop(tag, None)
 		if self.reader and tag in self.reader:
 			del self.reader[tag]
 
@@ -481,6 +552,9 @@ class TTFont(object):
 				self.glyphOrder = glyphOrder
 		else:
 			self._getGlyphNamesFromCmap()
+		if self.reuseUnmodifiedTables:
+			# the glyph order used by the tables decompiled before this point
+			self._origGlyphOrder = list(self.glyphOrder)
 		return self.glyphOrder
 
 	def _getGlyphNamesFromCmap(self):
@@ -660,11 +734,92 @@ class TTFont(object):
 		writer[tag] = tabledata
 		done.append(tag)
 
+	def _canForkWorkers(self):
+		if _getForkContext() is None:
+			log.debug("worker processes can't be forked; compiling tables serially")
+			return False
+		reader = self.reader
+		if reader is not None and getattr(reader, "_mmap", None) is None:
+			try:
+				reader.file.fileno()
+			except (AttributeError, IOError, ValueError):
+				pass  # e.g. BytesIO
+			else:
+				# the forked processes would share the file position
+				log.debug("font is read from a file; compiling tables serially")
+				return False
+		return True
+
+	def _writeTablesInParallel(self, tags, writer, workers):
+		"""Helper function for self.save(): write the same tables in the same
+		order as _writeTable does, compiling the tables which no other table
+		depends upon in worker processes.
+		"""
+		global _workerFont
+
+		order = []
+		done = set()
+		def visit(tag):
+			if tag in done:
+				return
+			done.add(tag)
+			for masterTable in getTableClass(tag).dependencies:
+				if masterTable in self:
+					visit(masterTable)
+			order.append(tag)
+		for tag in tags:
+			visit(tag)
+
+		masterTables = set()
+		for tag in order:
+			masterTables.update(getTableClass(tag).dependencies)
+
+		data = {}
+		for tag in order:
+			if tag in masterTables:
+				data[tag] = self.getTableData(tag)
+
+		compileTags = []
+		for tag in order:
+			if tag in masterTables:
+				continue
+			if self.isLoaded(tag) and not self._isTableUnmodified(tag):
+				compileTags.append(tag)
+			else:
+				data[tag] = self.getTableData(tag)
+
+		if len(compileTags) > 1:
+			log.debug("compiling %s in %d worker processes",
+			          ", ".join("'%s'" % tag for tag in compileTags), workers)
+			_workerFont = self
+			try:
+				pool = _getForkContext().Pool(min(workers, len(compileTags)))
+				try:
+					results = pool.map(_getWorkerTableData, compileTags, chunksize=1)
+				finally:
+					pool.close()
+					pool.join()
+			finally:
+				_workerFont = None
+			data.update(zip(compileTags, results))
+		else:
+			for tag in compileTags:
+				data[tag] = self.getTableData(tag)
+
+		for tag in order:
+			log.debug("writing '%s' table to disk", tag)
+			writer[tag] = data[tag]
+
 	def getTableData(self, tag):
 		"""Returns raw table data, whether compiled or directly read from disk.
+		If the font was opened with useMmap=True, data that is read from disk
+		may be a memoryview rather than a bytes object.
 		"""
 		tag = Tag(tag)
 		if self.isLoaded(tag):
+			if self._isTableUnmodified(tag):
+				log.debug("Reading unmodified '%s' table from disk", tag)
+				return self.reader[tag]
 			log.debug("compiling '%s' table", tag)
 			return self.tables[tag].compile(self)
 		elif self.reader and tag in self.reader:
@@ -673,6 +828,46 @@ class TTFont(object):
 		else:
 			raise KeyError(tag)
 
+	def _getGlyphOrderSnapshot(self):
+		glyphOrder = getattr(self, "glyphOrder", None)
+		if glyphOrder is None:
+			return None
+		# share the same copy between all the tables decompiled with it
+		snapshot = getattr(self, "_glyphOrderSnapshot", None)
+		if snapshot != glyphOrder:
+			snapshot = self._glyphOrderSnapshot = list(glyphOrder)
+		return snapshot
+
+	def _isTableUnmodified(self, tag):
+		"""Return True if the table was decompiled while the font was
+		opened with reuseUnmodifiedTables=True, and neither its content nor
+		anything else it gets compiled from has changed since then; i.e. if
+		its original binary data can be written as is.
+		"""
+		try:
+			table, glyphOrder, fingerprint = self._fingerprints[tag]
+		except KeyError:
+			return False
+		if table is not self.tables.get(tag):
+			return False  # table was replaced
+		if self.reader is None or tag not in self.reader:
+			return False
+		if self.recalcTimestamp and tag == "head":
+			return False
+		if self.recalcBBoxes and tag in _recalcBBoxesTables:
+			return False
+		if glyphOrder is None:
+			# decompiled before the glyph order was loaded
+			glyphOrder = getattr(self, "_origGlyphOrder", None)
+		if glyphOrder != getattr(self, "glyphOrder", None):
+			return False
+		masterTables = list(getTableClass(tag).dependencies)
+		masterTables.extend(_implicitDependencies.get(tag, ()))
+		for masterTable in masterTables:
+			if self.isLoaded(masterTable) and not self._isTableUnmodified(masterTable):
+				return False
+		return fingerprint == _fingerprint(table)
+
 	def getGlyphSet(self, preferCFF=True):
 		"""Return a generic GlyphSet, which is a dict-like object
 		mapping glyph names to glyph objects. The returned glyph objects
@@ -797,6 +992,121 @@ class GlyphOrder(object):
 			self.glyphOrder.append(attrs["name"])
 
 
+# The font being saved by TTFont._writeTablesInParallel; worker processes
+# are forked after it is set, so they can compile its tables.
+_workerFont = None
+
+def _getWorkerTableData(tag):
+	return _workerFont.getTableData(tag)
+
+def _getForkContext():
+	"""Return an object with a multiprocessing-like Pool() that forks the
+	worker processes, or None if this isn't possible on this platform."""
+	import multiprocessing
+	try:
+		startMethods = multiprocessing.get_all_start_methods()
+	except AttributeError:
+		# Python 2: the multiprocessing module only forks, when it can.
+		return multiprocessing if hasattr(os, "fork") else None
+	if "fork" not in startMethods:
+		return None
+	return multiprocessing.get_context("fork")
+
+
+# Tables which get recalculated from other tables upon compile, when the
+# TTFont's recalcBBoxes attribute is true.
+_recalcBBoxesTables = frozenset(["head", "hhea", "vhea", "maxp", "glyf"])
+
+# Tables which are read upon compiling a table, in addition to the ones
+# listed in the table class' 'dependencies' attribute.
+_implicitDependencies = {
+	"OS/2": ["cmap"],
+	"LTSH": ["maxp"],
+	"hdmx": ["maxp"],
+}
+
+
+class _Ref(object):
+	"""Marks an object already seen while taking a fingerprint."""
+
+
+def _fingerprint(obj):
+	"""Return a flat list of the values held by 'obj' and all the objects it
+	references, interleaved with their types and sizes. Two fingerprints
+	compare equal only if the two object graphs held equal values.
+	This is used to detect whether a decompiled table was modified.
+	"""
+	result = []
+	_fingerprintWalk(obj, result, {})
+	return result
+
+
+_atomicTypes = set([
+	type(None), bool, int, float, unicode, bytes, Tag, type,
+	types.FunctionType, types.MethodType, types.BuiltinFunctionType,
+])
+try:
+	_atomicTypes.add(long)
+except NameError:
+	pass  # Python 3
+
+
+def _fingerprintWalk(obj, result, memo):
+	cls = type(obj)
+	if cls in _atomicTypes:
+		result.append(cls)
+		result.append(obj)
+		return
+	objId = id(obj)
+	if objId in memo:
+		result.append(_Ref)
+		result.append(memo[objId])
+		return
+	memo[objId] = len(memo)
+	result.append(cls)
+	if isinstance(obj, TTFont):
+		# a back-reference to the font; its tables are checked separately
+		return
+	if isinstance(obj, (list, tuple)):
+		result.append(len(obj))
+		for item in list.__iter__(obj) if isinstance(obj, list) else obj:
+			_fingerprintWalk(item, result, memo)
+	elif isinstance(obj, dict):
+		result.append(len(obj))
+		for key, value in obj.items():
+			_fingerprintWalk(key, result, memo)
+			_fingerprintWalk(value, result, memo)
+	elif isinstance(obj, (set, frozenset)):
+		result.append(frozenset(obj))
+	elif isinstance(obj, array.array):
+		result.append(obj.typecode)
+		result.append(obj.tostring())
+	elif isinstance(obj, bytearray):
+		result.append(bytes(obj))
+	else:
+		slots = set()
+		for klass in cls.__mro__:
+			klassSlots = klass.__dict__.get("__slots__", ())
+			if isinstance(klassSlots, basestring):
+				klassSlots = (klassSlots,)
+			slots.update(klassSlots)
+		slots.discard("__dict__")
+		slots.discard("__weakref__")
+		attrs = getattr(obj, "__dict__", None)
+		if attrs is None and not slots:
+			# opaque object (e.g. a file): only compare identities
+			result.append(obj)
+			return
+		for name in sorted(slots):
+			result.append(name)
+			_fingerprintWalk(getattr(obj, name, _Ref), result, memo)
+		if attrs is not None:
+			result.append(len(attrs))
+			for name, value in attrs.items():
+				result.append(name)
+				_fingerprintWalk(value, result, memo)
+
+
 def getTableModule(tag):
 	"""Fetch the packer/unpacker module for a table.
 	Return None when no module is found.
@@ -41,9 +41,12 @@ class SFNTReader(object):
 		# return default object
 		return object.__new__(cls)
 
-	def __init__(self, file, checkChecksums=1, fontNumber=-1):
+	def __init__(self, file, checkChecksums=1, fontNumber=-1, useMmap=False):
 		self.file = file
 		self.checkChecksums = checkChecksums
+		self._mmap = None
+		if useMmap:
+			self._mapFile()
 
 		self.flavor = None
 		self.flavorData = None
@@ -100,6 +103,33 @@ class SFNTReader(object):
 		if self.flavor == "woff":
 			self.flavorData = WOFFFlavorData(self)
 
+	def _mapFile(self):
+		"""Memory-map the input file, if it is backed by a real file
+		descriptor. Table data is then sliced out of the mapping instead of
+		being read from the file. With Python 3 the slices are memoryview
+		objects, so no data is copied until a table is actually decompiled.
+		"""
+		import mmap
+		try:
+			fileno = self.file.fileno()
+		except (AttributeError, IOError, ValueError):
+			# e.g. BytesIO, or a file-like object wrapping a resource fork
+			log.debug("can't memory-map %r; falling back to regular reads", self.file)
+			return
+		try:
+			self._mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+		except (EnvironmentError, ValueError):
+			# e.g. empty files, or streams like pipes that can't be mapped
+			log.debug("can't memory-map %r; falling back to regular reads", self.file)
+			return
+		try:
+			self._view = memoryview(self._mmap)
+		except TypeError:
+			# Python 2's mmap objects don't support the new buffer protocol;
+			# slicing the map still saves a seek and a read, but does copy.
+			self._view = self._mmap
+		self._tableViews = {}
+
 	def has_key(self, tag):
 		return tag in self.tables
 
@@ -110,12 +140,21 @@ class SFNTReader(object):
 
 	def __getitem__(self, tag):
 		"""Fetch the raw table data."""
-		entry = self.tables[Tag(tag)]
-		data = entry.loadData (self.file)
+		tag = Tag(tag)
+		entry = self.tables[tag]
+		if self._mmap is not None:
+			try:
+				rawData = self._tableViews[tag]
+			except KeyError:
+				rawData = self._tableViews[tag] = entry.sliceData(self._view)
+			data = entry.decodeData(rawData)
+		else:
+			data = entry.loadData (self.file)
 		if self.checkChecksums:
 			if tag == 'head':
 				# Beh: we have to special-case the 'head' table.
-				checksum = calcChecksum(data[:8] + b'\0\0\0\0' + data[12:])
+				headData = _tobytes(data)
+				checksum = calcChecksum(b"".join([headData[:8], b'\0\0\0\0', headData[12:]]))
 			else:
 				checksum = calcChecksum(data)
 			if self.checkChecksums > 1:
@@ -130,6 +169,18 @@ class SFNTReader(object):
 		del self.tables[Tag(tag)]
 
 	def close(self):
+		if self._mmap is not None:
+			# memoryviews exported from the mapping must be released before
+			# it can be closed; they are invalid from now on.
+			for view in self._tableViews.values():
+				if isinstance(view, memoryview):
+					view.release()
+			self._tableViews.clear()
+			if isinstance(self._view, memoryview):
+				self._view.release()
+			self._view = None
+			self._mmap.close()
+			self._mmap = None
 		self.file.close()
 
 
@@ -234,7 +285,8 @@ class SFNTWriter(object):
 		entry.tag = tag
 		entry.offset = self.nextTableOffset
 		if tag == 'head':
-			entry.checkSum = calcChecksum(data[:8] + b'\0\0\0\0' + data[12:])
+			data = _tobytes(data)
+			entry.checkSum = calcChecksum(b"".join([data[:8], b'\0\0\0\0', data[12:]]))
 			self.headTable = data
 			entry.uncompressed = True
 		else:
@@ -456,6 +508,15 @@ class DirectoryEntry(object):
 			data = self.decodeData(data)
 		return data
 
+	def sliceData(self, buf):
+		"""Return the raw (still encoded) table data as a slice of 'buf',
+		a buffer holding the whole input file, e.g. a memoryview of a
+		memory-mapped file.
+		"""
+		data = buf[self.offset:self.offset + self.length]
+		assert len(data) == self.length
+		return data
+
 	def saveData(self, file, data):
 		if hasattr(self.__class__, 'encodeData'):
 			data = self.encodeData(data)
@@ -540,6 +601,14 @@ class WOFFFlavorData():
 				self.privData = data
 
 
+def _tobytes(data):
+	"""Return buffers like memoryview as bytes, which Python 2 needs to
+	join or unpack them."""
+	if isinstance(data, memoryview):
+		return data.tobytes()
+	return data
+
+
 def calcChecksum(data):
 	"""Calculate the checksum for an arbitrary block of data.
 	Optionally takes a 'start' argument, which allows you to
@@ -554,9 +623,10 @@ def calcChecksum(data):
 		>>> print(calcChecksum(b"abcdxyz"))
 		3655064932
 	"""
+	data = _tobytes(data)
 	remainder = len(data) % 4
 	if remainder:
-		data += b"\0" * (4 - remainder)
+		data = b"".join([data, b"\0" * (4 - remainder)])
 	value = 0
 	blockSize = 4096
 	assert blockSize % 4 == 0
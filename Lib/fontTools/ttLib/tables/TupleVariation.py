@@ -118,6 +118,16 @@ class TupleVariation(object):
 				            ", ".join(sorted(attrs.keys())))
 
 	def compile(self, axisTags, sharedCoordIndices, sharedPoints):
+		if sharedPoints is not None:
+			return self.compileWithPoints_(axisTags, sharedCoordIndices, sharedPoints)
+		points = self.getUsedPoints()
+		packedPoints = self.compilePoints(points, len(self.coordinates))
+		return self.compileWithPoints_(axisTags, sharedCoordIndices, points, packedPoints)
+
+	def compileWithPoints_(self, axisTags, sharedCoordIndices, points, packedPoints=None):
+		"""Compile the tuple with the deltas of points, which are the
+		glyph's shared points if packedPoints is None, and else are the
+		private points that packedPoints encodes."""
 		tupleData = []
 
 		assert all(tag in axisTags for tag in self.axes.keys()), ("Unknown axis tag found.", self.axes.keys(), axisTags)
@@ -134,13 +144,11 @@ class TupleVariation(object):
 			flags |= INTERMEDIATE_REGION
 			tupleData.append(intermediateCoord)
 
-		if sharedPoints is not None:
-			auxData = self.compileDeltas(sharedPoints)
+		if packedPoints is None:
+			auxData = self.compileDeltas(points)
 		else:
 			flags |= PRIVATE_POINT_NUMBERS
-			points = self.getUsedPoints()
-			numPointsInGlyph = len(self.coordinates)
-			auxData = self.compilePoints(points, numPointsInGlyph) + self.compileDeltas(points)
+			auxData = packedPoints + self.compileDeltas(points)
 
 		tupleData = struct.pack('>HH', len(auxData), flags) + bytesjoin(tupleData)
 		return (tupleData, auxData)
@@ -449,82 +457,66 @@ def decompileSharedTuples(axisTags, sharedTupleCount, data, offset):
 
 
 def compileSharedTuples(axisTags, variations):
+	"""Return the peak coordinates to share across the font, ranked by
+	the number of bytes that sharing them saves: each tuple that refers
+	to a shared peak instead of embedding it saves its size, and the
+	shared peak costs its size once."""
 	coordCount = {}
 	for var in variations:
 		coord = var.compileCoord(axisTags)
 		coordCount[coord] = coordCount.get(coord, 0) + 1
-	sharedCoords = [(count, coord)
+	sharedCoords = [((count - 1) * len(coord), coord)
 					for (coord, count) in coordCount.items() if count > 1]
 	sharedCoords.sort(reverse=True)
 	MAX_NUM_SHARED_COORDS = TUPLE_INDEX_MASK + 1
 	sharedCoords = sharedCoords[:MAX_NUM_SHARED_COORDS]
-	return [c[1] for c in sharedCoords]  # Strip off counts.
+	return [c[1] for c in sharedCoords]  # Strip off savings.
 
 
 def compileTupleVariationStore(variations, pointCount,
-                               axisTags, sharedTupleIndices):
+                               axisTags, sharedTupleIndices,
+                               useSharedPoints=True):
 	variations = [v for v in variations if v.hasImpact()]
 	if len(variations) == 0:
 		return (0, b"", b"")
 
-	# Each glyph variation tuples modifies a set of control points. To
+	# Each glyph variation tuple modifies a set of control points. To
 	# indicate which exact points are getting modified, a single tuple
-	# can either refer to a shared set of points, or the tuple can
-	# supply its private point numbers.  Because the impact of sharing
-	# can be positive (no need for a private point list) or negative
-	# (need to supply 0,0 deltas for unused points), it is not obvious
-	# how to determine which tuples should take their points from the
-	# shared pool versus have their own. Perhaps we should resort to
-	# brute force, and try all combinations? However, if a glyph has n
-	# variation tuples, we would need to try 2^n combinations (because
-	# each tuple may or may not be part of the shared set). How many
-	# variations tuples do glyphs have?
-	#
-	#   Skia.ttf: {3: 1, 5: 11, 6: 41, 7: 62, 8: 387, 13: 1, 14: 3}
-	#   JamRegular.ttf: {3: 13, 4: 122, 5: 1, 7: 4, 8: 1, 9: 1, 10: 1}
-	#   BuffaloGalRegular.ttf: {1: 16, 2: 13, 4: 2, 5: 4, 6: 19, 7: 1, 8: 3, 9: 8}
-	#   (Reading example: In Skia.ttf, 41 glyphs have 6 variation tuples).
-	#
-
-	# Is this even worth optimizing? If we never use a shared point
-	# list, the private lists will consume 112K for Skia, 5K for
-	# BuffaloGalRegular, and 15K for JamRegular. If we always use a
-	# shared point list, the shared lists will consume 16K for Skia,
-	# 3K for BuffaloGalRegular, and 10K for JamRegular. However, in
-	# the latter case the delta arrays will become larger, but I
-	# haven't yet measured by how much. From gut feeling (which may be
-	# wrong), the optimum is to share some but not all points;
-	# however, then we would need to try all combinations.
-	#
-	# For the time being, we try two variants and then pick the better one:
-	# (a) each tuple supplies its own private set of points;
-	# (b) all tuples refer to a shared set of points, which consists of
-	#     "every control point in the glyph".
-	allPoints = set(range(pointCount))
+	# can either refer to the glyph's shared set of points, or supply
+	# its private point numbers. We share the point set whose packed
+	# encoding, stored once instead of in each tuple that uses it, saves
+	# the most bytes; the other tuples keep their private points. The
+	# packed encoding of each point set is computed only once.
+	pointSets = [frozenset(v.getUsedPoints()) for v in variations]
+	packedPoints = {}
+	pointSetCount = {}
+	for points in pointSets:
+		if points not in packedPoints:
+			packedPoints[points] = TupleVariation.compilePoints(points, pointCount)
+		pointSetCount[points] = pointSetCount.get(points, 0) + 1
+
+	sharedPoints = None
+	if useSharedPoints:
+		bestSavings = 0
+		for points in pointSets:
+			savings = len(packedPoints[points]) * (pointSetCount[points] - 1)
+			if savings > bestSavings:
+				sharedPoints, bestSavings = points, savings
+
 	tuples = []
 	data = []
-	someTuplesSharePoints = False
-	for v in variations:
-		privateTuple, privateData = v.compile(
-			axisTags, sharedTupleIndices, sharedPoints=None)
-		sharedTuple, sharedData = v.compile(
-			axisTags, sharedTupleIndices, sharedPoints=allPoints)
-		# TODO: Apple macOS 10.9.5 (maybe also earlier) up to 10.12 had a bug
-		# that broke variations if the `gvar` table contains shared tuples.
-		# Apple will likely fix this in macOS 10.13. But for the time being,
-		# we never emit shared points although the result would be more compact.
-		# https://rawgit.com/unicode-org/text-rendering-tests/master/reports/CoreText.html#GVAR-1
-		#if (len(sharedTuple) + len(sharedData)) < (len(privateTuple) + len(privateData)):
-		if False:
-			tuples.append(sharedTuple)
-			data.append(sharedData)
-			someTuplesSharePoints = True
+	for v, points in zip(variations, pointSets):
+		if points == sharedPoints:
+			thisTuple, thisData = v.compileWithPoints_(
+				axisTags, sharedTupleIndices, points)
 		else:
-			tuples.append(privateTuple)
-			data.append(privateData)
-	if someTuplesSharePoints:
-		data = bytechr(0) + bytesjoin(data)  # 0x00 = "all points in glyph"
-		tupleVariationCount = tv.TUPLES_SHARE_POINT_NUMBERS | len(tuples)
+			thisTuple, thisData = v.compileWithPoints_(
+				axisTags, sharedTupleIndices, points, packedPoints[points])
+		tuples.append(thisTuple)
+		data.append(thisData)
+	if sharedPoints is not None:
+		data = packedPoints[sharedPoints] + bytesjoin(data)
+		tupleVariationCount = TUPLES_SHARE_POINT_NUMBERS | len(tuples)
 	else:
 		data = bytesjoin(data)
 		tupleVariationCount = len(tuples)
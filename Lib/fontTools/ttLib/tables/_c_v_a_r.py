@@ -35,7 +35,8 @@ class table__c_v_a_r(DefaultTable.DefaultTable):
             variations=[v for v in self.variations if v.hasImpact()],
             pointCount=len(ttFont["cvt "].values),
             axisTags=[axis.axisTag for axis in ttFont["fvar"].axes],
-            sharedTupleIndices={})
+            sharedTupleIndices={},
+            useSharedPoints=False)
         header = {
             "majorVersion": self.majorVersion,
             "minorVersion": self.minorVersion,
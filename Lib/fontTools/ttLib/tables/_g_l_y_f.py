@@ -16,10 +16,22 @@ import sys
 import struct
 import array
 import logging
+try:
+	from collections.abc import MutableMapping
+except ImportError:
+	from UserDict import DictMixin as MutableMapping
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 
 log = logging.getLogger(__name__)
 
+# Number of glyphs whose coordinates table__g_l_y_f.expandGlyphs decodes
+# together; this bounds the size of the intermediate arrays.
+_EXPAND_BATCH_SIZE = 1000
+
 #
 # The Apple and MS rasterizers behave differently for
 # scaled composite components: one does scale first and then translate
@@ -43,6 +55,18 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 
 	def decompile(self, data, ttFont):
 		loca = ttFont['loca']
+		if ttFont.lazy:
+			self.glyphOrder = glyphOrder = ttFont.getGlyphOrder()
+			self.glyphs = _LazyGlyphs(data, loca, glyphOrder)
+			end = int(loca[-1])
+			if len(data) - end >= 4:
+				log.warning(
+					"too much 'glyf' table data: expected %d, received %d bytes",
+					end, len(data))
+			noname = len(loca) - 1 - len(glyphOrder)
+			if noname > 0:
+				log.warning('%s glyphs have no name', noname)
+			return
 		last = int(loca[0])
 		noname = 0
 		self.glyphs = {}
@@ -67,8 +91,20 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 		if noname:
 			log.warning('%s glyphs have no name', noname)
 		if ttFont.lazy is False: # Be lazy for None and True
-			for glyph in self.glyphs.values():
-				glyph.expand(self)
+			self.expandGlyphs(self.glyphs.values())
+
+	def expandGlyphs(self, glyphs):
+		"""Expand the given Glyph objects, decoding the coordinates of
+		simple glyphs in batches rather than one glyph at a time."""
+		glyphs = list(glyphs)
+		for i in range(0, len(glyphs), _EXPAND_BATCH_SIZE):
+			simpleGlyphs = []
+			for glyph in glyphs[i:i+_EXPAND_BATCH_SIZE]:
+				data = glyph._expand(self)
+				if data is not None:
+					simpleGlyphs.append((glyph, data))
+			if simpleGlyphs:
+				_decompileCoordinates(simpleGlyphs)
 
 	def compile(self, ttFont):
 		if not hasattr(self, "glyphOrder"):
@@ -79,9 +115,18 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 		currentLocation = 0
 		dataList = []
 		recalcBBoxes = ttFont.recalcBBoxes
+		glyphs = self.glyphs
+		lazy = isinstance(glyphs, _LazyGlyphs)
+		componentsLoaded = {}
 		for glyphName in self.glyphOrder:
-			glyph = self.glyphs[glyphName]
-			glyphData = glyph.compile(self, recalcBBoxes)
+			if lazy and not glyphs.isLoaded(glyphName) and not (
+					recalcBBoxes and
+					self._componentsLoaded(glyphName, componentsLoaded)):
+				# never accessed, hence unmodified: reuse the original bytes
+				glyphData = glyphs.getGlyphData(glyphName)
+			else:
+				glyph = glyphs[glyphName]
+				glyphData = glyph.compile(self, recalcBBoxes)
 			if padding > 1:
 				glyphData = pad(glyphData, size=padding)
 			locations.append(currentLocation)
@@ -110,6 +155,25 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 			ttFont['maxp'].numGlyphs = len(self.glyphs)
 		return data
 
+	def _componentsLoaded(self, glyphName, memo):
+		"""Return whether a glyph that hasn't been loaded from a lazy glyph
+		store has components that were, directly or through nested
+		components: they may have been modified, which changes its
+		bounding box."""
+		if glyphName in memo:
+			return memo[glyphName]
+		memo[glyphName] = False  # in case components refer back to it
+		glyphs = self.glyphs
+		result = False
+		for component in Glyph(glyphs.getGlyphData(glyphName)).getComponentNames(self):
+			if component not in glyphs:
+				continue
+			if glyphs.isLoaded(component) or self._componentsLoaded(component, memo):
+				result = True
+				break
+		memo[glyphName] = result
+		return result
+
 	def toXML(self, writer, ttFont, progress=None):
 		writer.newline()
 		glyphNames = ttFont.getGlyphNames()
@@ -124,7 +188,7 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 				progress.setLabel("Dumping 'glyf' table... (%s)" % glyphName)
 				progress.increment(progressStep / numGlyphs)
 			counter = counter + 1
-			glyph = self[glyphName]
+			glyph = self._peekGlyph(glyphName)
 			if glyph.numberOfContours:
 				writer.begintag('TTGlyph', [
 						("name", glyphName),
@@ -187,6 +251,16 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 		glyph.expand(self)
 		return glyph
 
+	def _peekGlyph(self, glyphName):
+		"""Like __getitem__, but a glyph that hasn't been loaded from a
+		lazy glyph store yet is returned without being kept in it."""
+		glyphs = self.glyphs
+		if isinstance(glyphs, _LazyGlyphs) and not glyphs.isLoaded(glyphName):
+			glyph = Glyph(glyphs.getGlyphData(glyphName))
+			glyph.expand(self)
+			return glyph
+		return self[glyphName]
+
 	def __setitem__(self, glyphName, glyph):
 		self.glyphs[glyphName] = glyph
 		if glyphName not in self.glyphOrder:
@@ -201,6 +275,74 @@ class table__g_l_y_f(DefaultTable.DefaultTable):
 		return len(self.glyphs)
 
 
+class _LazyGlyphs(MutableMapping):
+
+	"""Mapping of glyph names to Glyph objects, used by the 'glyf' table
+	when the font is loaded with lazy=True. Only the glyph offsets are kept
+	around: each Glyph is created from a slice of the raw table data the
+	first time it is accessed. Glyphs that are never accessed are compiled
+	back as their original bytes.
+	"""
+
+	def __init__(self, data, locations, glyphOrder):
+		self._data = data
+		self._locations = locations
+		numGlyphs = len(locations) - 1
+		self._indices = dict(zip(glyphOrder[:numGlyphs], range(numGlyphs)))
+		for i in range(len(glyphOrder), numGlyphs):
+			self._indices['ttxautoglyph%s' % i] = i
+		self._glyphs = {}
+
+	def isLoaded(self, glyphName):
+		return glyphName in self._glyphs
+
+	def getGlyphData(self, glyphName):
+		"""Return the raw data of a glyph that hasn't been loaded yet."""
+		i = self._indices[glyphName]
+		start = int(self._locations[i])
+		end = int(self._locations[i+1])
+		glyphData = self._data[start:end]
+		if len(glyphData) != (end - start):
+			raise ttLib.TTLibError("not enough 'glyf' table data")
+		return glyphData
+
+	def __getitem__(self, glyphName):
+		try:
+			return self._glyphs[glyphName]
+		except KeyError:
+			pass
+		glyph = self._glyphs[glyphName] = Glyph(self.getGlyphData(glyphName))
+		del self._indices[glyphName]
+		return glyph
+
+	def __setitem__(self, glyphName, glyph):
+		self._indices.pop(glyphName, None)
+		self._glyphs[glyphName] = glyph
+
+	def __delitem__(self, glyphName):
+		if glyphName in self._glyphs:
+			del self._glyphs[glyphName]
+		else:
+			del self._indices[glyphName]
+
+	def __contains__(self, glyphName):
+		return glyphName in self._glyphs or glyphName in self._indices
+
+	has_key = __contains__
+
+	def __iter__(self):
+		for glyphName in list(self._glyphs):
+			yield glyphName
+		for glyphName in list(self._indices):
+			yield glyphName
+
+	def keys(self):
+		return list(self)
+
+	def __len__(self):
+		return len(self._glyphs) + len(self._indices)
+
+
 glyphHeaderFormat = """
 		>	# big endian
 		numberOfContours:	h
@@ -298,6 +440,157 @@ SCALED_COMPONENT_OFFSET		= 0x0800  # composite designed to have the component of
 UNSCALED_COMPONENT_OFFSET	= 0x1000  # composite designed not to have the component offset scaled (designed for MS)
 
 
+def _makeFormatTable(flagShort, flagSame):
+	# bytearray.translate() table and deletechars turning each flag into
+	# the struct format character of its x or y value, if it has one
+	table = bytearray(256)
+	deleteChars = bytearray()
+	for flag in range(256):
+		if flag & flagShort:
+			table[flag] = ord('B')
+		elif flag & flagSame:
+			deleteChars.append(flag)
+		else:
+			table[flag] = ord('h')
+	return bytes(table), bytes(deleteChars)
+
+_xFormatTable = _makeFormatTable(flagXShort, flagXsame)
+_yFormatTable = _makeFormatTable(flagYShort, flagYsame)
+_onCurveTable = bytes(bytearray(flag & flagOnCurve for flag in range(256)))
+
+
+def _unpackFlagsAndCoordinates(nCoordinates, data):
+	"""Expand the repeated flags of a simple glyph, and unpack its x and y
+	values, without their signs. Return the flags as a bytearray, and the
+	values as tuples."""
+	flags = bytearray()
+	i = 0
+	while len(flags) < nCoordinates:
+		flag = byteord(data[i])
+		i = i + 1
+		if flag & flagRepeat:
+			flags.extend(bytearray((flag,)) * (byteord(data[i]) + 1))
+			i = i + 1
+		else:
+			flags.append(flag)
+	assert len(flags) == nCoordinates, "bad glyph flags"
+	data = data[i:]
+	# Build the struct format strings from the flags, so we can unpack
+	# the coordinates in one struct.unpack() call each.
+	xFormat = ">" + tostr(bytes(flags.translate(*_xFormatTable)))
+	yFormat = ">" + tostr(bytes(flags.translate(*_yFormatTable)))
+	xDataLen = struct.calcsize(xFormat)
+	yDataLen = struct.calcsize(yFormat)
+	if len(data) - (xDataLen + yDataLen) >= 4:
+		log.warning(
+			"too much glyph data: %d excess bytes", len(data) - (xDataLen + yDataLen))
+	xCoordinates = struct.unpack(xFormat, data[:xDataLen])
+	yCoordinates = struct.unpack(yFormat, data[xDataLen:xDataLen+yDataLen])
+	return flags, xCoordinates, yCoordinates
+
+
+def _decompileCoordinates(glyphs):
+	"""Decode the outlines of simple glyphs. 'glyphs' is a list of
+	(glyph, data) pairs, where data is what follows the glyph header.
+
+	With NumPy, the deltas of all the glyphs are signed and summed up in
+	one go. Otherwise, each glyph is decoded point by point.
+	"""
+	unpacked = [glyph._decompileContours(data) for glyph, data in glyphs]
+	counts = [len(flags) for flags, _, _ in unpacked]
+	if numpy is not None and 2 * sum(counts) >= _NUMPY_MIN_LENGTH:
+		allFlags = bytearray()
+		allX = []
+		allY = []
+		for flags, xCoordinates, yCoordinates in unpacked:
+			allFlags.extend(flags)
+			allX.extend(xCoordinates)
+			allY.extend(yCoordinates)
+		allFlags = numpy.frombuffer(bytes(allFlags), dtype=numpy.uint8)
+		deltas = numpy.zeros((len(allFlags), 2), dtype=numpy.int64)
+		for column, values, flagShort, flagSame in (
+				(0, allX, flagXShort, flagXsame),
+				(1, allY, flagYShort, flagYsame)):
+			short = (allFlags & flagShort) != 0
+			same = (allFlags & flagSame) != 0
+			delta = deltas[:, column]
+			delta[short | ~same] = values
+			delta[short & ~same] *= -1
+		coordinates = _coordinatesFromDeltas(deltas, counts)
+	else:
+		coordinates = [
+			_coordinatesFromFlags(flags, xCoordinates, yCoordinates)
+			for flags, xCoordinates, yCoordinates in unpacked]
+	for (glyph, _), (flags, _, _), coords in zip(glyphs, unpacked, coordinates):
+		glyph.coordinates = coords
+		# discard all flags but for "flagOnCurve"
+		glyph.flags = array.array("B", bytes(flags.translate(_onCurveTable)))
+
+
+def _coordinatesFromFlags(flags, xCoordinates, yCoordinates):
+	# fill in repetitions and apply signs
+	nCoordinates = len(flags)
+	coordinates = GlyphCoordinates.zeros(nCoordinates)
+	xIndex = 0
+	yIndex = 0
+	for i in range(nCoordinates):
+		flag = flags[i]
+		# x coordinate
+		if flag & flagXShort:
+			if flag & flagXsame:
+				x = xCoordinates[xIndex]
+			else:
+				x = -xCoordinates[xIndex]
+			xIndex = xIndex + 1
+		elif flag & flagXsame:
+			x = 0
+		else:
+			x = xCoordinates[xIndex]
+			xIndex = xIndex + 1
+		# y coordinate
+		if flag & flagYShort:
+			if flag & flagYsame:
+				y = yCoordinates[yIndex]
+			else:
+				y = -yCoordinates[yIndex]
+			yIndex = yIndex + 1
+		elif flag & flagYsame:
+			y = 0
+		else:
+			y = yCoordinates[yIndex]
+			yIndex = yIndex + 1
+		coordinates[i] = (x, y)
+	assert xIndex == len(xCoordinates)
+	assert yIndex == len(yCoordinates)
+	coordinates.relativeToAbsolute()
+	return coordinates
+
+
+def _coordinatesFromDeltas(deltas, counts):
+	"""Turn an (n, 2) NumPy array holding the point deltas of several
+	glyphs, 'counts' points each, into a list of absolute GlyphCoordinates.
+	"""
+	absolute = numpy.cumsum(deltas, axis=0)
+	# restart the sums at the first point of each glyph
+	ends = numpy.cumsum(counts)
+	starts = ends - counts
+	totals = numpy.zeros((len(counts), 2), dtype=absolute.dtype)
+	after = starts > 0
+	totals[after] = absolute[starts[after] - 1]
+	absolute -= numpy.repeat(totals, counts, axis=0)
+	if absolute.size and (absolute.min() < -0x8000 or absolute.max() > 0x7FFF):
+		raise OverflowError("signed short integer is out of range")
+	data = absolute.astype(numpy.int16).tobytes()
+	result = []
+	start = 0
+	for end in ends.tolist():
+		coordinates = GlyphCoordinates()
+		coordinates._a = array.array("h", data[4*start:4*end])
+		result.append(coordinates)
+		start = end
+	return result
+
+
 CompositeMaxpValues = namedtuple('CompositeMaxpValues', ['nPoints', 'nContours', 'maxComponentDepth'])
 
 
@@ -316,25 +609,33 @@ class Glyph(object):
 		self.data = data
 
 	def expand(self, glyfTable):
+		data = self._expand(glyfTable)
+		if data is not None:
+			self.decompileCoordinates(data)
+
+	def _expand(self, glyfTable):
+		"""Like expand(), but the outline data of a simple glyph is returned
+		instead of being decompiled, so it can be decoded along with other
+		glyphs by _decompileCoordinates()."""
 		if not hasattr(self, "data"):
 			# already unpacked
-			return
+			return None
 		if not self.data:
 			# empty char
 			del self.data
 			self.numberOfContours = 0
-			return
+			return None
 		dummy, data = sstruct.unpack2(glyphHeaderFormat, self.data, self)
 		del self.data
 		# Some fonts (eg. Neirizi.ttf) have a 0 for numberOfContours in
 		# some glyphs; decompileCoordinates assumes that there's at least
 		# one, so short-circuit here.
 		if self.numberOfContours == 0:
-			return
+			return None
 		if self.isComposite():
 			self.decompileComponents(data, glyfTable)
-		else:
-			self.decompileCoordinates(data)
+			return None
+		return data
 
 	def compile(self, glyfTable, recalcBBoxes=True):
 		if hasattr(self, "data"):
@@ -389,7 +690,7 @@ class Glyph(object):
 			if self.numberOfContours < 0:
 				raise ttLib.TTLibError("can't mix composites and contours in glyph")
 			self.numberOfContours = self.numberOfContours + 1
-			coordinates = GlyphCoordinates()
+			points = []
 			flags = []
 			for element in content:
 				if not isinstance(element, tuple):
@@ -397,15 +698,15 @@ class Glyph(object):
 				name, attrs, content = element
 				if name != "pt":
 					continue  # ignore anything but "pt"
-				coordinates.append((safeEval(attrs["x"]), safeEval(attrs["y"])))
+				points.append((safeEval(attrs["x"]), safeEval(attrs["y"])))
 				flags.append(not not safeEval(attrs["on"]))
 			flags = array.array("B", flags)
 			if not hasattr(self, "coordinates"):
-				self.coordinates = coordinates
+				self.coordinates = GlyphCoordinates(points)
 				self.flags = flags
-				self.endPtsOfContours = [len(coordinates)-1]
+				self.endPtsOfContours = [len(points)-1]
 			else:
-				self.coordinates.extend (coordinates)
+				self.coordinates.extend(points)
 				self.flags.extend(flags)
 				self.endPtsOfContours.append(len(self.coordinates)-1)
 		elif name == "component":
@@ -467,8 +768,13 @@ class Glyph(object):
 					len(data))
 
 	def decompileCoordinates(self, data):
-		endPtsOfContours = array.array("h")
-		endPtsOfContours.fromstring(data[:2*self.numberOfContours])
+		_decompileCoordinates([(self, data)])
+
+	def _decompileContours(self, data):
+		"""Decompile the contour ends and the instructions of a simple
+		glyph, and unpack the rest of the data. Return the flags as a
+		bytearray, and the unsigned x and y values."""
+		endPtsOfContours = array.array("h", data[:2*self.numberOfContours])
 		if sys.byteorder != "big":
 			endPtsOfContours.byteswap()
 		self.endPtsOfContours = endPtsOfContours.tolist()
@@ -481,86 +787,12 @@ class Glyph(object):
 		self.program.fromBytecode(data[:instructionLength])
 		data = data[instructionLength:]
 		nCoordinates = self.endPtsOfContours[-1] + 1
-		flags, xCoordinates, yCoordinates = \
-				self.decompileCoordinatesRaw(nCoordinates, data)
-
-		# fill in repetitions and apply signs
-		self.coordinates = coordinates = GlyphCoordinates.zeros(nCoordinates)
-		xIndex = 0
-		yIndex = 0
-		for i in range(nCoordinates):
-			flag = flags[i]
-			# x coordinate
-			if flag & flagXShort:
-				if flag & flagXsame:
-					x = xCoordinates[xIndex]
-				else:
-					x = -xCoordinates[xIndex]
-				xIndex = xIndex + 1
-			elif flag & flagXsame:
-				x = 0
-			else:
-				x = xCoordinates[xIndex]
-				xIndex = xIndex + 1
-			# y coordinate
-			if flag & flagYShort:
-				if flag & flagYsame:
-					y = yCoordinates[yIndex]
-				else:
-					y = -yCoordinates[yIndex]
-				yIndex = yIndex + 1
-			elif flag & flagYsame:
-				y = 0
-			else:
-				y = yCoordinates[yIndex]
-				yIndex = yIndex + 1
-			coordinates[i] = (x, y)
-		assert xIndex == len(xCoordinates)
-		assert yIndex == len(yCoordinates)
-		coordinates.relativeToAbsolute()
-		# discard all flags but for "flagOnCurve"
-		self.flags = array.array("B", (f & flagOnCurve for f in flags))
+		return _unpackFlagsAndCoordinates(nCoordinates, data)
 
 	def decompileCoordinatesRaw(self, nCoordinates, data):
-		# unpack flags and prepare unpacking of coordinates
-		flags = array.array("B", [0] * nCoordinates)
-		# Warning: deep Python trickery going on. We use the struct module to unpack
-		# the coordinates. We build a format string based on the flags, so we can
-		# unpack the coordinates in one struct.unpack() call.
-		xFormat = ">" # big endian
-		yFormat = ">" # big endian
-		i = j = 0
-		while True:
-			flag = byteord(data[i])
-			i = i + 1
-			repeat = 1
-			if flag & flagRepeat:
-				repeat = byteord(data[i]) + 1
-				i = i + 1
-			for k in range(repeat):
-				if flag & flagXShort:
-					xFormat = xFormat + 'B'
-				elif not (flag & flagXsame):
-					xFormat = xFormat + 'h'
-				if flag & flagYShort:
-					yFormat = yFormat + 'B'
-				elif not (flag & flagYsame):
-					yFormat = yFormat + 'h'
-				flags[j] = flag
-				j = j + 1
-			if j >= nCoordinates:
-				break
-		assert j == nCoordinates, "bad glyph flags"
-		data = data[i:]
-		# unpack raw coordinates, krrrrrr-tching!
-		xDataLen = struct.calcsize(xFormat)
-		yDataLen = struct.calcsize(yFormat)
-		if len(data) - (xDataLen + yDataLen) >= 4:
-			log.warning(
-				"too much glyph data: %d excess bytes", len(data) - (xDataLen + yDataLen))
-		xCoordinates = struct.unpack(xFormat, data[:xDataLen])
-		yCoordinates = struct.unpack(yFormat, data[xDataLen:xDataLen+yDataLen])
-		return flags, xCoordinates, yCoordinates
+		flags, xCoordinates, yCoordinates = \
+				_unpackFlagsAndCoordinates(nCoordinates, data)
+		return array.array("B", flags), xCoordinates, yCoordinates
 
 	def compileComponents(self, glyfTable):
 		data = b""
@@ -1159,8 +1391,26 @@ class GlyphComponent(object):
 		result = self.__eq__(other)
 		return result if result is NotImplemented else not result
 
+# Below this many values, per-point loops are faster than NumPy's
+# per-call overhead.
+_NUMPY_MIN_LENGTH = 64
+
+
+def _numpyView(a):
+	"""Return an (n, 2) NumPy array sharing memory with array.array 'a'."""
+	return numpy.frombuffer(a, dtype=a.typecode).reshape(-1, 2)
+
+
 class GlyphCoordinates(object):
 
+	"""A list of (x, y) points, stored flat in an array.array.
+
+	When NumPy is installed, whole-glyph operations (translate, scale,
+	transform, arithmetic, relativeToAbsolute, toInt...) on long enough
+	arrays are done on a NumPy view of the same array, instead of looping
+	over the points. The results are the same in both cases.
+	"""
+
 	def __init__(self, iterable=[], typecode="h"):
 		self._a = array.array(typecode)
 		self.extend(iterable)
@@ -1187,6 +1437,30 @@ class GlyphCoordinates(object):
 				self._ensureFloat()
 		return p
 
+	def _view(self):
+		if numpy is None or len(self._a) < _NUMPY_MIN_LENGTH:
+			return None
+		return _numpyView(self._a)
+
+	def _wide(self, v):
+		# Copy of view 'v' in a type that can't overflow while computing
+		return v.astype(numpy.float64 if self.isFloat() else numpy.int64)
+
+	def _setValues(self, v, values):
+		"""Store the (n, 2) NumPy array 'values' into view 'v' of self._a.
+
+		Like storing the points one by one, this switches to float storage
+		if some value is not integral, and raises OverflowError if integers
+		don't fit in the array.
+		"""
+		if not self.isFloat():
+			if values.dtype.kind == 'f' and (values != numpy.floor(values)).any():
+				self._a = array.array("d", [0]) * len(self._a)
+				v = _numpyView(self._a)
+			elif values.size and (values.min() < -0x8000 or values.max() > 0x7FFF):
+				raise OverflowError("signed short integer is out of range")
+		v[...] = values
+
 	@staticmethod
 	def zeros(count):
 		return GlyphCoordinates([(0,0)] * count)
@@ -1229,6 +1503,17 @@ class GlyphCoordinates(object):
 		self._a.extend(tuple(p))
 
 	def extend(self, iterable):
+		if not self.isFloat():
+			points = list(iterable)
+			try:
+				# all-integer coordinates go in without checking each point
+				a = array.array(self._a.typecode, [v for p in points for v in p])
+			except TypeError:
+				pass
+			else:
+				self._a.extend(a)
+				return
+			iterable = points
 		for p in iterable:
 			p = self._checkFloat(p)
 			self._a.extend(p)
@@ -1236,12 +1521,23 @@ class GlyphCoordinates(object):
 	def toInt(self):
 		if not self.isFloat():
 			return
+		v = self._view()
+		if v is not None:
+			# Like round() from py23, which rounds half to even on Python 2 too
+			values = numpy.rint(v)
+			self._a = array.array("h", [0]) * len(self._a)
+			self._setValues(_numpyView(self._a), values)
+			return
 		a = array.array("h")
 		for n in self._a:
 			a.append(int(round(n)))
 		self._a = a
 
 	def relativeToAbsolute(self):
+		v = self._view()
+		if v is not None:
+			self._setValues(v, numpy.cumsum(self._wide(v), axis=0))
+			return
 		a = self._a
 		x,y = 0,0
 		for i in range(len(a) // 2):
@@ -1249,6 +1545,12 @@ class GlyphCoordinates(object):
 			a[2*i+1] = y = a[2*i+1] + y
 
 	def absoluteToRelative(self):
+		v = self._view()
+		if v is not None:
+			values = self._wide(v)
+			values[1:] -= v[:-1]
+			self._setValues(v, values)
+			return
 		a = self._a
 		x,y = 0,0
 		for i in range(len(a) // 2):
@@ -1264,6 +1566,10 @@ class GlyphCoordinates(object):
 		>>> GlyphCoordinates([(1,2)]).translate((.5,0))
 		"""
 		(x,y) = self._checkFloat(p)
+		v = self._view()
+		if v is not None:
+			self._setValues(v, self._wide(v) + (x, y))
+			return
 		a = self._a
 		for i in range(len(a) // 2):
 			a[2*i  ] += x
@@ -1274,6 +1580,10 @@ class GlyphCoordinates(object):
 		>>> GlyphCoordinates([(1,2)]).scale((.5,0))
 		"""
 		(x,y) = self._checkFloat(p)
+		v = self._view()
+		if v is not None:
+			self._setValues(v, self._wide(v) * (x, y))
+			return
 		a = self._a
 		for i in range(len(a) // 2):
 			a[2*i  ] *= x
@@ -1283,6 +1593,15 @@ class GlyphCoordinates(object):
 		"""
 		>>> GlyphCoordinates([(1,2)]).transform(((.5,0),(.2,.5)))
 		"""
+		v = self._view()
+		if v is not None:
+			w = self._wide(v)
+			x = w[:, 0]
+			y = w[:, 1]
+			px = x * t[0][0] + y * t[1][0]
+			py = x * t[0][1] + y * t[1][1]
+			self._setValues(v, numpy.column_stack((px, py)))
+			return
 		a = self._a
 		for i in range(len(a) // 2):
 			x = a[2*i  ]
@@ -1351,6 +1670,10 @@ class GlyphCoordinates(object):
 		GlyphCoordinates([(1, 2)])
 		"""
 		r = self.copy()
+		v = r._view()
+		if v is not None:
+			r._setValues(v, -r._wide(v))
+			return r
 		a = r._a
 		for i in range(len(a)):
 			a[i] = -a[i]
@@ -1390,6 +1713,13 @@ class GlyphCoordinates(object):
 			return self
 		if isinstance(other, GlyphCoordinates):
 			if other.isFloat(): self._ensureFloat()
+			v = self._view()
+			if v is not None:
+				assert len(self._a) == len(other._a)
+				values = self._wide(v)
+				values += _numpyView(other._a)
+				self._setValues(v, values)
+				return self
 			other = other._a
 			a = self._a
 			assert len(a) == len(other)
@@ -1415,6 +1745,13 @@ class GlyphCoordinates(object):
 			return self
 		if isinstance(other, GlyphCoordinates):
 			if other.isFloat(): self._ensureFloat()
+			v = self._view()
+			if v is not None:
+				assert len(self._a) == len(other._a)
+				values = self._wide(v)
+				values -= _numpyView(other._a)
+				self._setValues(v, values)
+				return self
 			other = other._a
 			a = self._a
 			assert len(a) == len(other)
@@ -11,6 +11,10 @@ import logging
 import struct
 import sys
 import fontTools.ttLib.tables.TupleVariation as tv
+try:
+	from collections.abc import MutableMapping
+except ImportError:
+	from UserDict import DictMixin as MutableMapping
 
 
 log = logging.getLogger(__name__)
@@ -44,6 +48,12 @@ GVAR_HEADER_SIZE = sstruct.calcsize(GVAR_HEADER_FORMAT)
 class table__g_v_a_r(DefaultTable.DefaultTable):
 	dependencies = ["fvar", "glyf"]
 
+	# this attribute controls whether the variation tuples of a glyph may share
+	# their point numbers, which makes the table smaller. It is off by default
+	# since CoreText in macOS 10.9.5 up to 10.12 breaks variations that use
+	# shared point numbers; set it to True to produce smaller fonts.
+	useSharedPoints = False
+
 	def __init__(self, tag=None):
 		DefaultTable.DefaultTable.__init__(self, tag)
 		self.version, self.reserved = 1, 0
@@ -51,8 +61,15 @@ class table__g_v_a_r(DefaultTable.DefaultTable):
 
 	def compile(self, ttFont):
 		axisTags = [axis.axisTag for axis in ttFont["fvar"].axes]
-		sharedTuples =  tv.compileSharedTuples(
-			axisTags, itertools.chain(*self.variations.values()))
+		variations = self.variations
+		if (isinstance(variations, _LazyGlyphVariations) and
+				variations.canReuseGlyphData(axisTags)):
+			# The glyphs that were never accessed are written back as their
+			# original bytes, which refer to the original shared tuples.
+			sharedTuples = variations.getSharedTupleData()
+		else:
+			sharedTuples = tv.compileSharedTuples(
+				axisTags, itertools.chain(*variations.values()))
 		sharedTupleIndices = {coord:i for i, coord in enumerate(sharedTuples)}
 		sharedTupleSize = sum([len(c) for c in sharedTuples])
 		compiledGlyphs = self.compileGlyphs_(
@@ -83,12 +100,22 @@ class table__g_v_a_r(DefaultTable.DefaultTable):
 
 	def compileGlyphs_(self, ttFont, axisTags, sharedCoordIndices):
 		result = []
+		variations = self.variations
+		lazy = (isinstance(variations, _LazyGlyphVariations) and
+		        variations.canReuseGlyphData(axisTags))
 		for glyphName in ttFont.getGlyphOrder():
+			if lazy and glyphName in variations and not variations.isLoaded(glyphName):
+				# never accessed, hence unmodified: reuse the original bytes
+				glyphData = variations.getGlyphData(glyphName)
+				if self.useSharedPoints or not _usesSharedPoints(glyphData):
+					result.append(glyphData)
+					continue
 			glyph = ttFont["glyf"][glyphName]
 			pointCount = self.getNumPoints_(glyph)
-			variations = self.variations.get(glyphName, [])
-			result.append(compileGlyph_(variations, pointCount,
-			                            axisTags, sharedCoordIndices))
+			glyphVariations = self.variations.get(glyphName, [])
+			result.append(compileGlyph_(glyphVariations, pointCount,
+			                            axisTags, sharedCoordIndices,
+			                            self.useSharedPoints))
 		return result
 
 	def decompile(self, data, ttFont):
@@ -100,8 +127,14 @@ class table__g_v_a_r(DefaultTable.DefaultTable):
 		offsets = self.decompileOffsets_(data[GVAR_HEADER_SIZE:], tableFormat=(self.flags & 1), glyphCount=self.glyphCount)
 		sharedCoords = tv.decompileSharedTuples(
 			axisTags, self.sharedTupleCount, data, self.offsetToSharedTuples)
-		self.variations = {}
 		offsetToData = self.offsetToGlyphVariationData
+		if ttFont.lazy:
+			sharedTupleData = data[self.offsetToSharedTuples:offsetToData]
+			self.variations = _LazyGlyphVariations(
+				ttFont, data, offsetToData, offsets, sharedCoords, sharedTupleData,
+				axisTags, glyphs)
+			return
+		self.variations = {}
 		for i in range(self.glyphCount):
 			glyphName = glyphs[i]
 			glyph = ttFont["glyf"][glyphName]
@@ -163,7 +196,7 @@ class table__g_v_a_r(DefaultTable.DefaultTable):
 		writer.newline()
 		axisTags = [axis.axisTag for axis in ttFont["fvar"].axes]
 		for glyphName in ttFont.getGlyphOrder():
-			variations = self.variations.get(glyphName)
+			variations = self._peekVariations(glyphName)
 			if not variations:
 				continue
 			writer.begintag("glyphVariations", glyph=glyphName)
@@ -173,6 +206,14 @@ class table__g_v_a_r(DefaultTable.DefaultTable):
 			writer.endtag("glyphVariations")
 			writer.newline()
 
+	def _peekVariations(self, glyphName):
+		"""Like variations.get(), but the variations of a glyph that haven't
+		been decoded from a lazy mapping yet are not kept in it."""
+		variations = self.variations
+		if isinstance(variations, _LazyGlyphVariations):
+			return variations.peek(glyphName)
+		return variations.get(glyphName)
+
 	def fromXML(self, name, attrs, content, ttFont):
 		if name == "version":
 			self.version = safeEval(attrs["value"])
@@ -207,9 +248,113 @@ class table__g_v_a_r(DefaultTable.DefaultTable):
 			return len(getattr(glyph, "coordinates", [])) + NUM_PHANTOM_POINTS
 
 
-def compileGlyph_(variations, pointCount, axisTags, sharedCoordIndices):
+class _LazyGlyphVariations(MutableMapping):
+
+	"""Mapping of glyph names to lists of TupleVariation, used by the 'gvar'
+	table when the font is loaded with lazy=True. Only the offsets of the
+	glyph variation data are kept around: the variations of a glyph are
+	decoded the first time they are accessed. Glyphs whose variations are
+	never accessed are compiled back as their original bytes.
+	"""
+
+	def __init__(self, ttFont, data, offsetToData, offsets, sharedCoords,
+	             sharedTupleData, axisTags, glyphOrder):
+		self._font = ttFont
+		self._data = data
+		self._offsetToData = offsetToData
+		self._offsets = offsets
+		self._sharedCoords = sharedCoords
+		self._sharedTupleData = sharedTupleData
+		self._axisTags = axisTags
+		self._indices = dict(zip(glyphOrder, range(len(offsets) - 1)))
+		self._variations = {}
+
+	def isLoaded(self, glyphName):
+		return glyphName in self._variations
+
+	def canReuseGlyphData(self, axisTags):
+		"""Return True if some glyphs haven't been loaded, and their
+		original data can be compiled as is for the given axes."""
+		return bool(self._indices) and list(axisTags) == list(self._axisTags)
+
+	def getSharedTupleData(self):
+		"""Return the original shared tuples, compiled."""
+		size = len(self._axisTags) * 2
+		data = self._sharedTupleData
+		return [data[i:i+size] for i in range(0, len(self._sharedCoords) * size, size)]
+
+	def getGlyphData(self, glyphName):
+		"""Return the raw data of a glyph that hasn't been loaded yet,
+		padded to an even length."""
+		i = self._indices[glyphName]
+		start = self._offsetToData + self._offsets[i]
+		end = self._offsetToData + self._offsets[i + 1]
+		glyphData = self._data[start:end]
+		if len(glyphData) != (end - start):
+			raise TTLibError("not enough 'gvar' table data")
+		if len(glyphData) % 2 != 0:
+			glyphData = glyphData + b"\0"  # padding
+		return glyphData
+
+	def _decompileGlyph(self, glyphName):
+		glyph = self._font["glyf"]._peekGlyph(glyphName)
+		numPointsInGlyph = table__g_v_a_r.getNumPoints_(glyph)
+		return decompileGlyph_(numPointsInGlyph, self._sharedCoords,
+		                       self._axisTags, self.getGlyphData(glyphName))
+
+	def peek(self, glyphName, default=None):
+		"""Return the variations of a glyph without keeping them around
+		if they haven't been loaded yet."""
+		try:
+			return self._variations[glyphName]
+		except KeyError:
+			pass
+		if glyphName not in self._indices:
+			return default
+		return self._decompileGlyph(glyphName)
+
+	def __getitem__(self, glyphName):
+		try:
+			return self._variations[glyphName]
+		except KeyError:
+			pass
+		variations = self._variations[glyphName] = self._decompileGlyph(glyphName)
+		del self._indices[glyphName]
+		return variations
+
+	def __setitem__(self, glyphName, variations):
+		self._indices.pop(glyphName, None)
+		self._variations[glyphName] = variations
+
+	def __delitem__(self, glyphName):
+		if glyphName in self._variations:
+			del self._variations[glyphName]
+		else:
+			del self._indices[glyphName]
+
+	def __contains__(self, glyphName):
+		return glyphName in self._variations or glyphName in self._indices
+
+	has_key = __contains__
+
+	def __iter__(self):
+		for glyphName in list(self._variations):
+			yield glyphName
+		for glyphName in list(self._indices):
+			yield glyphName
+
+	def keys(self):
+		return list(self)
+
+	def __len__(self):
+		return len(self._variations) + len(self._indices)
+
+
+def compileGlyph_(variations, pointCount, axisTags, sharedCoordIndices,
+                  useSharedPoints=True):
 	tupleVariationCount, tuples, data = tv.compileTupleVariationStore(
-		variations, pointCount, axisTags, sharedCoordIndices)
+		variations, pointCount, axisTags, sharedCoordIndices,
+		useSharedPoints=useSharedPoints)
 	if tupleVariationCount == 0:
 		return b""
 	result = (struct.pack(">HH", tupleVariationCount, 4 + len(tuples)) +
@@ -219,6 +364,13 @@ def compileGlyph_(variations, pointCount, axisTags, sharedCoordIndices):
 	return result
 
 
+def _usesSharedPoints(data):
+	if len(data) < 4:
+		return False
+	tupleVariationCount = struct.unpack(">H", data[:2])[0]
+	return (tupleVariationCount & tv.TUPLES_SHARE_POINT_NUMBERS) != 0
+
+
 def decompileGlyph_(pointCount, sharedTuples, axisTags, data):
 	if len(data) < 4:
 		return []
@@ -8,6 +8,8 @@ import logging
 
 log = logging.getLogger(__name__)
 
+_haveIterUnpack = hasattr(struct.Struct, "iter_unpack")
+
 class OverflowErrorRecord(object):
 	def __init__(self, overflowTuple):
 		self.tableType = overflowTuple[0]
@@ -60,34 +62,45 @@ class BaseTTXConverter(DefaultTable):
 				Traverse the flat list of tables again, calling getData each get the data in the table, now that
 				pos's and offset are known.
 
-				If a lookup subtable overflows an offset, we have to start all over.
+				Before assembling the data, all the offsets are checked. If any
+				lookup subtable overflows an offset, all the overflows found are
+				fixed at once, and only the lookups that were modified are compiled
+				again, before the tables are laid out again.
 		"""
-		overflowRecord = None
+		writer = OTTableWriter(tableTag=self.tableTag)
+		self.table.compile(writer, font)
 
 		while True:
-			try:
-				writer = OTTableWriter(tableTag=self.tableTag)
-				self.table.compile(writer, font)
-				return writer.getAllData()
-
-			except OTLOffsetOverflowError as e:
-
-				if overflowRecord == e.value:
-					raise # Oh well...
-
-				overflowRecord = e.value
-				log.info("Attempting to fix OTLOffsetOverflowError %s", e)
-				lastItem = overflowRecord
-
-				ok = 0
-				if overflowRecord.itemName is None:
-					from .otTables import fixLookupOverFlows
-					ok = fixLookupOverFlows(font, overflowRecord)
-				else:
-					from .otTables import fixSubTableOverFlows
-					ok = fixSubTableOverFlows(font, overflowRecord)
-				if not ok:
-					raise
+			tables = writer._layOutTables()
+			overflowRecords = OTTableWriter._getOverflowErrorRecords(tables)
+			if not overflowRecords:
+				return bytesjoin(table.getData() for table in tables)
+
+			if self.tableTag not in ('GSUB', 'GPOS'):
+				raise OTLOffsetOverflowError(overflowRecords[0])
+
+			log.info("Attempting to fix %d OTLOffsetOverflowErrors, first: %s",
+			         len(overflowRecords), overflowRecords[0])
+			from .otTables import fixOverFlows
+			lookupIndices = fixOverFlows(font, overflowRecords)
+			self._recompileLookups(writer, font, lookupIndices)
+
+	def _recompileLookups(self, writer, font, lookupIndices):
+		"""Replace the writers of the given lookups in the already compiled
+		'writer' tree with freshly compiled ones."""
+		lookupListWriter, = [item for item in writer.items
+		                     if getattr(item, "name", None) == "LookupList"]
+		items = list(lookupListWriter.items)
+		# LookupCount is followed by one offset per lookup
+		positions = [i for i, item in enumerate(items) if hasattr(item, "getData")]
+		lookups = self.table.LookupList.Lookup
+		for lookupIndex in lookupIndices:
+			subWriter = lookupListWriter.getSubWriter()
+			subWriter.name = "Lookup"
+			subWriter.repeatIndex = lookupIndex
+			lookups[lookupIndex].compile(subWriter, font)
+			items[positions[lookupIndex]] = subWriter
+		lookupListWriter.items = items
 
 	def toXML(self, writer, font):
 		self.table.toXML2(writer, font)
@@ -144,6 +157,33 @@ class OTTableReader(object):
 		self.pos = newpos
 		return value
 
+	def readULongArray(self, count):
+		pos = self.pos
+		newpos = pos + count * 4
+		value = struct.unpack(">%dL" % count, self.data[pos:newpos])
+		self.pos = newpos
+		return value
+
+	def readStructArray(self, recordStruct, count):
+		"""Read 'count' consecutive fixed-size records, as described by the
+		struct.Struct object 'recordStruct', and return a list of tuples."""
+		pos = self.pos
+		size = recordStruct.size
+		newpos = pos + count * size
+		data = self.data
+		if len(data) < newpos:
+			raise struct.error(
+				"unpack requires a buffer of %d bytes" % (newpos - pos))
+		if not size:
+			value = [()] * count
+		elif _haveIterUnpack:
+			value = list(recordStruct.iter_unpack(memoryview(data)[pos:newpos]))
+		else:
+			unpack_from = recordStruct.unpack_from
+			value = [unpack_from(data, p) for p in range(pos, newpos, size)]
+		self.pos = newpos
+		return value
+
 	def readInt8(self):
 		pos = self.pos
 		newpos = pos + 1
@@ -272,7 +312,7 @@ class OTTableWriter(object):
 
 	def __hash__(self):
 		# only works after self._doneWriting() has been called
-		return hash(self.items)
+		return self._hash
 
 	def __ne__(self, other):
 		result = self.__eq__(other)
@@ -302,16 +342,28 @@ class OTTableWriter(object):
 		if isExtension:
 			internedTables = {}
 
-		items = self.items
+		# This may be called again on an already assembled tree, after some
+		# of its lookups were compiled again to fix offset overflows.
+		items = list(self.items)
 		for i in range(len(items)):
 			item = items[i]
+			if isinstance(item, bytes):
+				continue
 			if hasattr(item, "getCountData"):
 				items[i] = item.getCountData()
 			elif hasattr(item, "getData"):
 				item._doneWriting(internedTables)
 				if not dontShare:
-					items[i] = item = internedTables.setdefault(item, item)
+					items[i] = internedItem = internedTables.setdefault(item, item)
+					if internedItem is item:
+						# First parent seen in this pass; the one that was
+						# recorded may no longer be part of the tree.
+						item.parent = self
 		self.items = tuple(items)
+		# The children are done at this point, and their hashes cached; so
+		# this doesn't walk the subtree again, and neither does interning
+		# this writer in its parent.
+		self._hash = hash(self.items)
 
 	def _gatherTables(self, tables, extTables, done):
 		# Convert table references in self.items tree to a flat
@@ -371,6 +423,12 @@ class OTTableWriter(object):
 
 	def getAllData(self):
 		"""Assemble all data, including all subtables."""
+		tables = self._layOutTables()
+		return bytesjoin(table.getData() for table in tables)
+
+	def _layOutTables(self):
+		"""Return a flat list of all the unique tables in this writer's tree,
+		with their absolute positions set."""
 		internedTables = {}
 		self._doneWriting(internedTables)
 		tables = []
@@ -381,25 +439,25 @@ class OTTableWriter(object):
 		extTables.reverse()
 		# Gather all data in two passes: the absolute positions of all
 		# subtable are needed before the actual data can be assembled.
+		tables.extend(extTables)
 		pos = 0
 		for table in tables:
 			table.pos = pos
 			pos = pos + table.getDataLength()
+		return tables
 
-		for table in extTables:
-			table.pos = pos
-			pos = pos + table.getDataLength()
-
-		data = []
+	@staticmethod
+	def _getOverflowErrorRecords(tables):
+		"""Return an OverflowErrorRecord for every 16-bit offset that
+		doesn't fit, in the order getData would run into them."""
+		overflowRecords = []
 		for table in tables:
-			tableData = table.getData()
-			data.append(tableData)
-
-		for table in extTables:
-			tableData = table.getData()
-			data.append(tableData)
-
-		return bytesjoin(data)
+			pos = table.pos
+			for item in table.items:
+				if hasattr(item, "getData") and not item.longOffset:
+					if not 0 <= item.pos - pos < 0x10000:
+						overflowRecords.append(table.getOverflowErrorRecord(item))
+		return overflowRecords
 
 	# interface for gathering data, as used by table.compile()
 
@@ -567,6 +625,12 @@ class BaseTable(object):
 	def getConverterByName(self, name):
 		return self.convertersByName[name]
 
+	def getDecompileProgram(self):
+		return self.decompileProgram
+
+	def getCompileProgram(self):
+		return self.compileProgram
+
 	def populateDefaults(self, propagator=None):
 		for conv in self.getConverters():
 			if conv.repeat:
@@ -595,29 +659,8 @@ class BaseTable(object):
 		self.readFormat(reader)
 		table = {}
 		self.__rawTable = table  # for debugging
-		for conv in self.getConverters():
-			if conv.name == "SubTable":
-				conv = conv.getConverter(reader.tableTag,
-						table["LookupType"])
-			if conv.name == "ExtSubTable":
-				conv = conv.getConverter(reader.tableTag,
-						table["ExtensionLookupType"])
-			if conv.name == "FeatureParams":
-				conv = conv.getConverter(reader["FeatureTag"])
-			if conv.repeat:
-				if conv.repeat in table:
-					countValue = table[conv.repeat]
-				else:
-					# conv.repeat is a propagated count
-					countValue = reader[conv.repeat]
-				countValue += conv.aux
-				table[conv.name] = conv.readArray(reader, font, table, countValue)
-			else:
-				if conv.aux and not eval(conv.aux, None, table):
-					continue
-				table[conv.name] = conv.read(reader, font, table)
-				if conv.isPropagated:
-					reader[conv.name] = table[conv.name]
+		for decompileStep in self.getDecompileProgram():
+			decompileStep(reader, font, table)
 
 		if hasattr(self, 'postRead'):
 			self.postRead(table, font)
@@ -644,56 +687,8 @@ class BaseTable(object):
 			writer['LookupType'].setValue(self.__class__.LookupType)
 
 		self.writeFormat(writer)
-		for conv in self.getConverters():
-			value = table.get(conv.name) # TODO Handle defaults instead of defaulting to None!
-			if conv.repeat:
-				if value is None:
-					value = []
-				countValue = len(value) - conv.aux
-				if conv.repeat in table:
-					CountReference(table, conv.repeat, value=countValue)
-				else:
-					# conv.repeat is a propagated count
-					writer[conv.repeat].setValue(countValue)
-				values = value
-				for i, value in enumerate(values):
-					try:
-						conv.write(writer, font, table, value, i)
-					except Exception as e:
-						name = value.__class__.__name__ if value is not None else conv.name
-						e.args = e.args + (name+'['+str(i)+']',)
-						raise
-			elif conv.isCount:
-				# Special-case Count values.
-				# Assumption: a Count field will *always* precede
-				# the actual array(s).
-				# We need a default value, as it may be set later by a nested
-				# table. We will later store it here.
-				# We add a reference: by the time the data is assembled
-				# the Count value will be filled in.
-				ref = writer.writeCountReference(table, conv.name, conv.staticSize)
-				table[conv.name] = None
-				if conv.isPropagated:
-					writer[conv.name] = ref
-			elif conv.isLookupType:
-				# We make sure that subtables have the same lookup type,
-				# and that the type is the same as the one set on the
-				# Lookup object, if any is set.
-				if conv.name not in table:
-					table[conv.name] = None
-				ref = writer.writeCountReference(table, conv.name, conv.staticSize, table[conv.name])
-				writer['LookupType'] = ref
-			else:
-				if conv.aux and not eval(conv.aux, None, table):
-					continue
-				try:
-					conv.write(writer, font, table, value)
-				except Exception as e:
-					name = value.__class__.__name__ if value is not None else conv.name
-					e.args = e.args + (name,)
-					raise
-				if conv.isPropagated:
-					writer[conv.name] = value
+		for compileStep in self.getCompileProgram():
+			compileStep(writer, font, table)
 
 	def readFormat(self, reader):
 		pass
@@ -774,6 +769,12 @@ class FormatSwitchingBaseTable(BaseTable):
 	def getConverterByName(self, name):
 		return self.convertersByName[self.Format][name]
 
+	def getDecompileProgram(self):
+		return self.decompileProgram[self.Format]
+
+	def getCompileProgram(self):
+		return self.compileProgram[self.Format]
+
 	def readFormat(self, reader):
 		self.Format = reader.readUShort()
 		assert self.Format != 0, (self, reader.pos, len(reader.data))
@@ -4,8 +4,10 @@ from fontTools.misc.textTools import safeEval
 from fontTools.misc.fixedTools import (
 	fixedToFloat as fi2fl, floatToFixed as fl2fi, ensureVersionIsLong as fi2ve,
 	versionToFixed as ve2fi)
-from .otBase import ValueRecordFactory, CountReference
+from .otBase import (
+	ValueRecordFactory, CountReference, FormatSwitchingBaseTable)
 from functools import partial
+import struct
 import logging
 
 
@@ -60,6 +62,240 @@ def buildConverters(tableSpec, tableNamespace):
 	return converters, convertersByName
 
 
+def buildConverterPrograms(converters):
+	"""Given a list of converters as returned by buildConverters, return a
+	(decompileProgram, compileProgram) tuple. Each program is a tuple of
+	functions, specialized for each converter, which BaseTable.decompile
+	and BaseTable.compile call in sequence for every table instance:
+
+		decompileStep(reader, font, tableDict)
+		compileStep(writer, font, tableDict)
+
+	This resolves once per table class what would otherwise be figured
+	out once per table instance: which converters need special treatment,
+	and the 'aux' conditions, which are compiled to code objects. Runs of
+	consecutive plain integer fields are read with a single struct call.
+	"""
+	decompileProgram = []
+	run = []
+	for conv in converters:
+		if (not conv.repeat and not conv.aux and not conv.isPropagated and
+				_getStructFormat(conv) is not None):
+			run.append(conv)
+			continue
+		decompileProgram.extend(_buildDecompileRun(run))
+		run = []
+		decompileProgram.append(_buildDecompileStep(conv))
+	decompileProgram.extend(_buildDecompileRun(run))
+
+	compileProgram = [_buildCompileStep(conv) for conv in converters]
+	return tuple(decompileProgram), tuple(compileProgram)
+
+
+def _getStructFormat(conv):
+	"""Return the struct format character of a converter that reads a plain
+	integer value, without side effects; or None if it's something else."""
+	for klass in type(conv).__mro__:
+		if "structFormat" in klass.__dict__:
+			break
+	else:
+		return None
+	if getattr(conv.read, "__func__", None) is not klass.__dict__.get("read"):
+		return None  # subclass overrides read()
+	return klass.structFormat
+
+
+def _compileAux(conv):
+	if conv.aux and not conv.repeat:
+		return compile(conv.aux, "<%s aux>" % conv.name, "eval")
+	return None
+
+
+def _buildDecompileRun(convs):
+	if len(convs) == 1:
+		return [_buildDecompileStep(convs[0])]
+	if not convs:
+		return []
+	names = tuple(conv.name for conv in convs)
+	packer = struct.Struct(">" + "".join(_getStructFormat(conv) for conv in convs))
+	unpack_from = packer.unpack_from
+	size = packer.size
+
+	def decompileStep(reader, font, table):
+		pos = reader.pos
+		table.update(zip(names, unpack_from(reader.data, pos)))
+		reader.pos = pos + size
+
+	return [decompileStep]
+
+
+def _buildDecompileStep(conv):
+	name = conv.name
+	if name == "SubTable":
+		getConverter = lambda reader, table: conv.getConverter(
+			reader.tableTag, table["LookupType"])
+	elif name == "ExtSubTable":
+		getConverter = lambda reader, table: conv.getConverter(
+			reader.tableTag, table["ExtensionLookupType"])
+	elif name == "FeatureParams":
+		getConverter = lambda reader, table: conv.getConverter(reader["FeatureTag"])
+	else:
+		getConverter = lambda reader, table: conv
+
+	if conv.repeat:
+		repeat = conv.repeat
+		aux = conv.aux
+		def decompileStep(reader, font, table):
+			if repeat in table:
+				countValue = table[repeat]
+			else:
+				# conv.repeat is a propagated count
+				countValue = reader[repeat]
+			countValue += aux
+			table[name] = getConverter(reader, table).readArray(
+				reader, font, table, countValue)
+		return decompileStep
+
+	auxCode = _compileAux(conv)
+	isPropagated = conv.isPropagated
+	def decompileStep(reader, font, table):
+		if auxCode is not None and not eval(auxCode, None, table):
+			return
+		value = table[name] = getConverter(reader, table).read(reader, font, table)
+		if isPropagated:
+			reader[name] = value
+	return decompileStep
+
+
+def _buildCompileStep(conv):
+	name = conv.name
+	if conv.repeat:
+		repeat = conv.repeat
+		aux = conv.aux
+		write = conv.write
+		def compileStep(writer, font, table):
+			values = table.get(name)
+			if values is None:
+				values = []
+			countValue = len(values) - aux
+			if repeat in table:
+				CountReference(table, repeat, value=countValue)
+			else:
+				# conv.repeat is a propagated count
+				writer[repeat].setValue(countValue)
+			for i, value in enumerate(values):
+				try:
+					write(writer, font, table, value, i)
+				except Exception as e:
+					name_ = value.__class__.__name__ if value is not None else name
+					e.args = e.args + (name_+'['+str(i)+']',)
+					raise
+		return compileStep
+
+	isPropagated = conv.isPropagated
+	if conv.isCount:
+		# Special-case Count values.
+		# Assumption: a Count field will *always* precede
+		# the actual array(s).
+		# We need a default value, as it may be set later by a nested
+		# table. We will later store it here.
+		# We add a reference: by the time the data is assembled
+		# the Count value will be filled in.
+		size = conv.staticSize
+		def compileStep(writer, font, table):
+			ref = writer.writeCountReference(table, name, size)
+			table[name] = None
+			if isPropagated:
+				writer[name] = ref
+		return compileStep
+
+	if conv.isLookupType:
+		# We make sure that subtables have the same lookup type,
+		# and that the type is the same as the one set on the
+		# Lookup object, if any is set.
+		size = conv.staticSize
+		def compileStep(writer, font, table):
+			if name not in table:
+				table[name] = None
+			ref = writer.writeCountReference(table, name, size, table[name])
+			writer['LookupType'] = ref
+		return compileStep
+
+	auxCode = _compileAux(conv)
+	write = conv.write
+	def compileStep(writer, font, table):
+		if auxCode is not None and not eval(auxCode, None, table):
+			return
+		value = table.get(name) # TODO Handle defaults instead of defaulting to None!
+		try:
+			write(writer, font, table, value)
+		except Exception as e:
+			name_ = value.__class__.__name__ if value is not None else name
+			e.args = e.args + (name_,)
+			raise
+		if isPropagated:
+			writer[name] = value
+	return compileStep
+
+
+def _getRecordFields(tableClass):
+	if (tableClass is None or
+			issubclass(tableClass, FormatSwitchingBaseTable) or
+			hasattr(tableClass, 'postRead')):
+		return None
+	fields = []
+	for conv in tableClass.converters:
+		if conv.repeat or conv.aux or conv.isPropagated:
+			return None
+		if type(conv) is ValueRecord:
+			kind = "value"
+		elif type(conv) is GlyphID:
+			kind = "glyph"
+		elif type(conv) in (Table, LTable):
+			kind = "offset"
+		elif _getStructFormat(conv) is not None:
+			kind = "int"
+		else:
+			return None
+		fields.append((conv.name, kind, conv))
+	return fields
+
+
+def _buildRecordLayout(fields, valueFormats):
+	"""Return a (recordStruct, layout, simple) tuple for reading records
+	made of 'fields', given the formats of their ValueRecords. 'layout'
+	is a tuple of (name, kind, start, stop, arg) tuples, or, if 'simple'
+	is True, just the field names. Return None if a ValueRecord has
+	Device offsets."""
+	valueFormats = iter(valueFormats)
+	layout = []
+	formats = []
+	pos = 0
+	for name, kind, conv in fields:
+		if kind == "value":
+			valueFormat = next(valueFormats)
+			if any(isDevice for _, isDevice, _ in valueFormat):
+				return None
+			arg = tuple(n for n, _, _ in valueFormat)
+			formats.extend("h" if signed else "H" for _, _, signed in valueFormat)
+			size = len(arg)
+		else:
+			arg = conv
+			if kind == "int":
+				formats.append(conv.structFormat)
+			elif kind == "offset" and conv.longOffset:
+				formats.append("L")
+			else:
+				formats.append("H")
+			size = 1
+		layout.append((name, kind, pos, pos + size, arg))
+		pos += size
+	recordStruct = struct.Struct(">" + "".join(formats))
+	if all(kind == "int" for _, kind, _ in fields):
+		return recordStruct, tuple(name for name, _, _ in fields), True
+	return recordStruct, tuple(layout), False
+
+
 class _MissingItem(tuple):
 	__slots__ = ()
 
@@ -157,6 +393,7 @@ class IntValue(SimpleValue):
 		return int(attrs["value"], 0)
 
 class Long(IntValue):
+	structFormat = "l"
 	staticSize = 4
 	def read(self, reader, font, tableDict):
 		return reader.readLong()
@@ -164,6 +401,7 @@ class Long(IntValue):
 		writer.writeLong(value)
 
 class ULong(IntValue):
+	structFormat = "L"
 	staticSize = 4
 	def read(self, reader, font, tableDict):
 		return reader.readULong()
@@ -171,6 +409,7 @@ class ULong(IntValue):
 		writer.writeULong(value)
 
 class Short(IntValue):
+	structFormat = "h"
 	staticSize = 2
 	def read(self, reader, font, tableDict):
 		return reader.readShort()
@@ -178,6 +417,7 @@ class Short(IntValue):
 		writer.writeShort(value)
 
 class UShort(IntValue):
+	structFormat = "H"
 	staticSize = 2
 	def read(self, reader, font, tableDict):
 		return reader.readUShort()
@@ -185,6 +425,7 @@ class UShort(IntValue):
 		writer.writeUShort(value)
 
 class Int8(IntValue):
+	structFormat = "b"
 	staticSize = 1
 	def read(self, reader, font, tableDict):
 		return reader.readInt8()
@@ -192,6 +433,7 @@ class Int8(IntValue):
 		writer.writeInt8(value)
 
 class UInt8(IntValue):
+	structFormat = "B"
 	staticSize = 1
 	def read(self, reader, font, tableDict):
 		return reader.readUInt8()
@@ -347,6 +589,79 @@ class Struct(BaseConverter):
 		table.decompile(reader, font)
 		return table
 
+	def readArray(self, reader, font, tableDict, count):
+		if not (font.lazy and count > 8):
+			records = self.readRecordArray(reader, font, count)
+			if records is not NotImplemented:
+				return records
+		return BaseConverter.readArray(self, reader, font, tableDict, count)
+
+	def getRecordFields(self):
+		"""Return a list of (name, kind, converter) tuples describing the
+		fields of the records this converter reads, if they are made only of
+		values that can be unpacked with a struct format; return None if
+		the records need to be decompiled one field at a time."""
+		try:
+			return self._recordFields
+		except AttributeError:
+			self._recordFields = _getRecordFields(self.tableClass)
+			self._recordLayouts = {}
+			return self._recordFields
+
+	def readRecordArray(self, reader, font, count):
+		"""Read an array of fixed-size records with a single struct call,
+		and fill in the record objects' attributes in one go. Return
+		NotImplemented if the records can't be read this way."""
+		fields = self.getRecordFields()
+		if fields is None:
+			return NotImplemented
+		valueFormats = tuple(tuple(reader[conv.which].format)
+		                     for _, kind, conv in fields if kind == "value")
+		try:
+			recordLayout = self._recordLayouts[valueFormats]
+		except KeyError:
+			recordLayout = _buildRecordLayout(fields, valueFormats)
+			self._recordLayouts[valueFormats] = recordLayout
+		if recordLayout is None:
+			return NotImplemented
+		recordStruct, layout, simple = recordLayout
+		rows = reader.readStructArray(recordStruct, count)
+
+		tableClass = self.tableClass
+		records = []
+		if simple:
+			names = layout
+			for row in rows:
+				table = tableClass()
+				table.__dict__ = dict(zip(names, row))
+				records.append(table)
+			return records
+
+		from .otBase import ValueRecord
+		glyphOrder = font.getGlyphOrder()
+		for row in rows:
+			table = tableClass()
+			d = table.__dict__
+			for name, kind, start, stop, arg in layout:
+				if kind == "value":
+					if arg:
+						value = ValueRecord()
+						value.__dict__ = dict(zip(arg, row[start:stop]))
+					else:
+						value = None
+				elif kind == "glyph":
+					try:
+						value = glyphOrder[row[start]]
+					except IndexError:
+						value = font.getGlyphName(row[start])
+				elif kind == "offset":
+					value = arg.readSubTable(reader, font, row[start])
+				else:
+					value = row[start]
+				d[name] = value
+			records.append(table)
+		return records
+
 	def write(self, writer, font, tableDict, value, repeatIndex=None):
 		value.compile(writer, font)
 
@@ -423,8 +738,25 @@ class Table(Struct):
 		else:
 			writer.writeUShort(0)
 
+	def getRecordSize(self, reader):
+		return self.staticSize
+
 	def read(self, reader, font, tableDict):
 		offset = self.readOffset(reader)
+		return self.readSubTable(reader, font, offset)
+
+	def readArray(self, reader, font, tableDict, count):
+		if font.lazy and count > 8:
+			return BaseConverter.readArray(self, reader, font, tableDict, count)
+		if self.longOffset:
+			offsets = reader.readULongArray(count)
+		else:
+			offsets = reader.readUShortArray(count)
+		return [self.readSubTable(reader, font, offset) for offset in offsets]
+
+	def readSubTable(self, reader, font, offset):
+		"""Return the subtable at 'offset' from the start of the table
+		'reader' belongs to, or None for a NULL offset."""
 		if offset == 0:
 			return None
 		table = self.tableClass()
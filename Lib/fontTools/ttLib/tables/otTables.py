@@ -7,7 +7,7 @@ converter objects from otConverters.py.
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
 from fontTools.misc.textTools import safeEval
-from .otBase import BaseTable, FormatSwitchingBaseTable
+from .otBase import BaseTable, FormatSwitchingBaseTable, OTLOffsetOverflowError
 import operator
 import logging
 
@@ -712,12 +712,15 @@ def fixLookupOverFlows(ttf, overflowRecord):
 	If the offset from a lookup to subtable overflowed, then we must promote it
 		to an Extension Lookup type.
 	"""
-	ok = 0
+	return int(_fixLookupOverFlow(ttf, overflowRecord) is not None)
+
+def _fixLookupOverFlow(ttf, overflowRecord):
+	# Return the index of the lookup promoted to an Extension, or None.
 	lookupIndex = overflowRecord.LookupListIndex
 	if (overflowRecord.SubTableIndex is None):
 		lookupIndex = lookupIndex - 1
 	if lookupIndex < 0:
-		return ok
+		return None
 	if overflowRecord.tableType == 'GSUB':
 		extType = 7
 	elif overflowRecord.tableType == 'GPOS':
@@ -729,7 +732,7 @@ def fixLookupOverFlows(ttf, overflowRecord):
 	while lookup.SubTable[0].__class__.LookupType == extType:
 		lookupIndex = lookupIndex -1
 		if lookupIndex < 0:
-			return ok
+			return None
 		lookup = lookups[lookupIndex]
 
 	lookup.LookupType = extType
@@ -740,8 +743,7 @@ def fixLookupOverFlows(ttf, overflowRecord):
 		extSubTable.Format = 1
 		extSubTable.ExtSubTable = subTable
 		lookup.SubTable[si] = extSubTable
-	ok = 1
-	return ok
+	return lookupIndex
 
 def splitAlternateSubst(oldSubTable, newSubTable, overflowRecord):
 	ok = 1
@@ -938,6 +940,48 @@ def fixSubTableOverFlows(ttf, overflowRecord):
 	ok = splitFunc(subtable, newSubTable, overflowRecord)
 	return ok
 
+def fixOverFlows(ttf, overflowRecords):
+	"""Fix all the offset overflows found in one layout pass of a GSUB or
+	GPOS table, and return the indices of the lookups that were modified.
+
+	If any offset to a lookup, or from a lookup to a subtable, overflowed,
+	the lookups involved are promoted to Extension lookups, and nothing
+	else is done, as that moves all their subtables around. Otherwise,
+	each subtable with an overflow inside is fixed as by
+	fixSubTableOverFlows. Raise OTLOffsetOverflowError if an overflow
+	can't be fixed.
+	"""
+	lookupRecords = {}
+	subTableRecords = {}
+	for overflowRecord in overflowRecords:
+		lookupIndex = overflowRecord.LookupListIndex
+		if lookupIndex is None:
+			raise OTLOffsetOverflowError(overflowRecord)
+		if overflowRecord.itemName is None:
+			if overflowRecord.SubTableIndex is None:
+				lookupIndex = lookupIndex - 1
+			lookupRecords.setdefault(lookupIndex, overflowRecord)
+		else:
+			key = (lookupIndex, overflowRecord.SubTableIndex)
+			subTableRecords.setdefault(key, overflowRecord)
+
+	modified = set()
+	if lookupRecords:
+		for lookupIndex, overflowRecord in sorted(lookupRecords.items()):
+			lookupIndex = _fixLookupOverFlow(ttf, overflowRecord)
+			if lookupIndex is None:
+				raise OTLOffsetOverflowError(overflowRecord)
+			modified.add(lookupIndex)
+		return modified
+
+	# Split the last subtables first, so the indices of the ones that
+	# come before don't change.
+	for key, overflowRecord in sorted(subTableRecords.items(), reverse=True):
+		if not fixSubTableOverFlows(ttf, overflowRecord):
+			raise OTLOffsetOverflowError(overflowRecord)
+		modified.add(key[0])
+	return modified
+
 # End of OverFlow logic
 
 
@@ -1007,7 +1051,7 @@ def _buildClasses():
 		featureParamTypes['cv%02d' % i] = FeatureParamsCharacterVariants
 
 	# add converters to classes
-	from .otConverters import buildConverters
+	from .otConverters import buildConverters, buildConverterPrograms
 	for name, table in otData:
 		m = formatPat.match(name)
 		if m:
@@ -1018,13 +1062,18 @@ def _buildClasses():
 			if not hasattr(cls, "converters"):
 				cls.converters = {}
 				cls.convertersByName = {}
+				cls.decompileProgram = {}
+				cls.compileProgram = {}
 			converters, convertersByName = buildConverters(table[1:], namespace)
 			cls.converters[format] = converters
 			cls.convertersByName[format] = convertersByName
+			cls.decompileProgram[format], cls.compileProgram[format] = \
+				buildConverterPrograms(converters)
 			# XXX Add staticSize?
 		else:
 			cls = namespace[name]
 			cls.converters, cls.convertersByName = buildConverters(table, namespace)
+			cls.decompileProgram, cls.compileProgram = buildConverterPrograms(cls.converters)
 			# XXX Add staticSize?
 
 
@@ -25,12 +25,19 @@ try:
 except ImportError:
 	pass
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 
 class WOFF2Reader(SFNTReader):
 
 	flavor = "woff2"
 
-	def __init__(self, file, checkChecksums=1, fontNumber=-1):
+	def __init__(self, file, checkChecksums=1, fontNumber=-1, useMmap=False):
+		# 'useMmap' is ignored: all the table data are inside a single
+		# Brotli-compressed stream, which must be decompressed in memory.
 		if not haveBrotli:
 			log.error(
 				'The WOFF2 decoder requires the Brotli Python extension, available at: '
@@ -38,6 +45,7 @@ class WOFF2Reader(SFNTReader):
 			raise ImportError("No module named brotli")
 
 		self.file = file
+		self._mmap = None
 
 		signature = Tag(self.file.read(4))
 		if signature != b"wOF2":
@@ -110,10 +118,9 @@ class WOFF2Reader(SFNTReader):
 		"""
 		self.ttFont['loca'] = WOFF2LocaTable()
 		glyfTable = self.ttFont['glyf'] = WOFF2GlyfTable()
-		glyfTable.reconstruct(data, self.ttFont)
 		if padding:
 			glyfTable.padding = padding
-		data = glyfTable.compile(self.ttFont)
+		data = glyfTable.reconstructData(data, self.ttFont)
 		return data
 
 	def _reconstructLoca(self):
@@ -175,7 +182,10 @@ class WOFF2Writer(SFNTWriter):
 		entry.tag = Tag(tag)
 		entry.flags = getKnownTagIndex(entry.tag)
 		# WOFF2 table data are written to disk only on close(), after all tags
-		# have been specified
+		# have been specified. Tables passed through from a memory-mapped
+		# reader may still be memoryviews, but these need to be decompiled.
+		if isinstance(data, memoryview):
+			data = data.tobytes()
 		entry.data = data
 
 		self.tables[tag] = entry
@@ -591,6 +601,13 @@ class WOFF2LocaTable(getTableClass('loca')):
 		return data
 
 
+# bytearray.translate() tables mapping the flags of the WOFF2 triplet
+# encoding to the size of their triplet data, and to the "on curve" bit
+_tripletSizeTable = bytes(bytearray(
+	([1] * 84 + [2] * 36 + [3] * 4 + [4] * 4) * 2))
+_onCurveTable = bytes(bytearray(int(not flag >> 7) for flag in range(256)))
+
+
 class WOFF2GlyfTable(getTableClass('glyf')):
 	"""Decoder/Encoder for WOFF2 'glyf' table transform."""
 
@@ -603,17 +620,154 @@ class WOFF2GlyfTable(getTableClass('glyf')):
 
 	def reconstruct(self, data, ttFont):
 		""" Decompile transformed 'glyf' data. """
+		self._decompileSubStreams(data, ttFont)
+		for stream in self.subStreams[1:]:
+			setattr(self, stream, getattr(self, stream).tobytes())
+
+		# With NumPy, the triplets of all the simple glyphs are collected
+		# first, and decoded together at the end
+		self._pendingTriplets = [] if numpy is not None else None
+		glyphs = self.glyphs = {}
+		for glyphID, glyphName in enumerate(self.glyphOrder):
+			glyph = self._decodeGlyph(glyphID)
+			glyphs[glyphName] = glyph
+		if self._pendingTriplets:
+			self._decodePendingTriplets()
+		del self._pendingTriplets
+
+	def reconstructData(self, data, ttFont):
+		""" Return the 'glyf' table data reconstructed from transformed 'glyf'
+		data, and set the locations of the 'loca' table, if any.
+
+		Unlike reconstruct() followed by compile(), the glyph data are written
+		directly from the substreams, without building Glyph objects.
+		The bounding boxes of simple glyphs are recalculated if they are not
+		in the bboxStream, or if ttFont.recalcBBoxes is true. Composite glyphs
+		always keep the bounding box from the bboxStream, where WOFF2 requires
+		it: unlike compile(), this does not recalculate them from the
+		components.
+		"""
+		self._decompileSubStreams(data, ttFont)
+		glyfModule = getTableModule('glyf')
+		nContourStream = self.nContourStream
+		nPointsStream = self.nPointsStream
+		flagStream = self.flagStream
+		glyphStream = self.glyphStream
+		compositeStream = self.compositeStream
+		bboxStream = self.bboxStream
+		instructionStream = self.instructionStream
+		bboxBitmap = self.bboxBitmap
+		nPointsOffset = flagOffset = glyphOffset = compositeOffset = 0
+		bboxOffset = instructionOffset = 0
+
+		dataList = [b""] * self.numGlyphs
+		# the outlines of the simple glyphs are compiled together at the end
+		pending = []
+		for glyphID in range(self.numGlyphs):
+			numberOfContours = nContourStream[glyphID]
+			if numberOfContours == 0:
+				continue
+			if bboxBitmap[glyphID >> 3] & (0x80 >> (glyphID & 7)):
+				bbox = bboxStream[bboxOffset:bboxOffset+8].tobytes()
+				if len(bbox) != 8:
+					raise TTLibError("not enough 'bboxStream' data")
+				bboxOffset += 8
+			elif numberOfContours < 0:
+				raise TTLibError('no bbox values for composite glyph %d' % glyphID)
+			else:
+				bbox = None
+			if numberOfContours < 0:
+				start = compositeOffset
+				haveInstructions = 0
+				flags = glyfModule.MORE_COMPONENTS
+				while flags & glyfModule.MORE_COMPONENTS:
+					if compositeOffset + 4 > len(compositeStream):
+						raise TTLibError("not enough 'compositeStream' data")
+					flags, = struct.unpack(">H", compositeStream[compositeOffset:compositeOffset+2])
+					haveInstructions |= flags & glyfModule.WE_HAVE_INSTRUCTIONS
+					compositeOffset += _componentSize(flags)
+				components = compositeStream[start:compositeOffset].tobytes()
+				if len(components) != compositeOffset - start:
+					raise TTLibError("not enough 'compositeStream' data")
+				glyphData = [struct.pack(">h", numberOfContours), bbox, components]
+				if haveInstructions:
+					instructionLength, glyphOffset = _read255UShort(glyphStream, glyphOffset)
+					glyphData.append(struct.pack(">h", instructionLength))
+					glyphData.append(instructionStream[instructionOffset:instructionOffset+instructionLength].tobytes())
+					instructionOffset += instructionLength
+				dataList[glyphID] = bytesjoin(glyphData)
+				continue
+
+			endPtsOfContours = []
+			endPoint = -1
+			for i in range(numberOfContours):
+				ptsOfContour, nPointsOffset = _read255UShort(nPointsStream, nPointsOffset)
+				endPoint += ptsOfContour
+				endPtsOfContours.append(endPoint)
+			nPoints = endPoint + 1
+			if flagOffset + nPoints > len(flagStream):
+				raise TTLibError("not enough 'flagStream' data")
+			flagsData = flagStream[flagOffset:flagOffset+nPoints].tobytes()
+			flagOffset += nPoints
+			nBytes = sum(bytearray(flagsData).translate(_tripletSizeTable))
+			if glyphOffset + nBytes > len(glyphStream):
+				raise TTLibError("not enough 'glyphStream' data")
+			tripletData = glyphStream[glyphOffset:glyphOffset+nBytes].tobytes()
+			glyphOffset += nBytes
+			instructionLength, glyphOffset = _read255UShort(glyphStream, glyphOffset)
+			instructions = instructionStream[instructionOffset:instructionOffset+instructionLength].tobytes()
+			instructionOffset += instructionLength
+			glyphData = [
+				struct.pack(">%dH" % numberOfContours, *endPtsOfContours),
+				struct.pack(">h", instructionLength), instructions]
+			pending.append((glyphID, numberOfContours, bbox, glyphData, flagsData, tripletData))
+
+		if pending:
+			if numpy is not None:
+				outlines = _compileTripletsArrays(pending)
+			else:
+				outlines = _compileTriplets(pending)
+			for (glyphID, numberOfContours, bbox, glyphData, _, _), (outline, bounds) in zip(pending, outlines):
+				if bbox is None or ttFont.recalcBBoxes:
+					bbox = struct.pack(">4h", *bounds)
+				dataList[glyphID] = bytesjoin(
+					[struct.pack(">h", numberOfContours), bbox] + glyphData + outline)
+
+		padding = self.padding
+		assert padding in (0, 1, 2, 4)
+		if padding > 1:
+			dataList = [pad(glyphData, size=padding) for glyphData in dataList]
+		locations = [0]
+		for glyphData in dataList:
+			locations.append(locations[-1] + len(glyphData))
+		if padding == 1 and locations[-1] < 0x20000:
+			# Pad the odd-lengthed glyphs, if that allows short loca offsets
+			indices = [i for i, glyphData in enumerate(dataList) if len(glyphData) % 2 == 1]
+			if indices and locations[-1] + len(indices) < 0x20000:
+				for i in indices:
+					dataList[i] += b'\0'
+				locations = [0]
+				for glyphData in dataList:
+					locations.append(locations[-1] + len(glyphData))
+		if 'loca' in ttFont:
+			ttFont['loca'].set(locations)
+		return bytesjoin(dataList)
+
+	def _decompileSubStreams(self, data, ttFont):
+		""" Unpack the header of the transformed 'glyf' data, and set the
+		substreams as memoryviews over 'data'.
+		"""
 		inputDataSize = len(data)
 
 		if inputDataSize < woff2GlyfTableFormatSize:
 			raise TTLibError("not enough 'glyf' data")
-		dummy, data = sstruct.unpack2(woff2GlyfTableFormat, data, self)
+		sstruct.unpack(woff2GlyfTableFormat, data[:woff2GlyfTableFormatSize], self)
 		offset = woff2GlyfTableFormatSize
 
+		view = memoryview(data)
 		for stream in self.subStreams:
 			size = getattr(self, stream + 'Size')
-			setattr(self, stream, data[:size])
-			data = data[size:]
+			setattr(self, stream, view[offset:offset+size])
 			offset += size
 
 		if offset != inputDataSize:
@@ -622,11 +776,11 @@ class WOFF2GlyfTable(getTableClass('glyf')):
 				% (offset, inputDataSize))
 
 		bboxBitmapSize = ((self.numGlyphs + 31) >> 5) << 2
-		bboxBitmap = self.bboxStream[:bboxBitmapSize]
+		bboxBitmap = self.bboxStream[:bboxBitmapSize].tobytes()
 		self.bboxBitmap = array.array('B', bboxBitmap)
 		self.bboxStream = self.bboxStream[bboxBitmapSize:]
 
-		self.nContourStream = array.array("h", self.nContourStream)
+		self.nContourStream = array.array("h", self.nContourStream.tobytes())
 		if sys.byteorder != "big":
 			self.nContourStream.byteswap()
 		assert len(self.nContourStream) == self.numGlyphs
@@ -646,11 +800,6 @@ class WOFF2GlyfTable(getTableClass('glyf')):
 					"incorrect glyphOrder: expected %d glyphs, found %d" %
 					(len(self.glyphOrder), self.numGlyphs))
 
-		glyphs = self.glyphs = {}
-		for glyphID, glyphName in enumerate(self.glyphOrder):
-			glyph = self._decodeGlyph(glyphID)
-			glyphs[glyphName] = glyph
-
 	def transform(self, ttFont):
 		""" Return transformed 'glyf' data """
 		self.numGlyphs = len(self.glyphs)
@@ -741,79 +890,54 @@ class WOFF2GlyfTable(getTableClass('glyf')):
 			raise TTLibError('no bbox values for composite glyph %d' % glyphID)
 		if haveBBox:
 			dummy, self.bboxStream = sstruct.unpack2(bboxFormat, self.bboxStream, glyph)
-		else:
+		elif glyph.isComposite() or hasattr(glyph, "coordinates"):
 			glyph.recalcBounds(self)
+		# else the bounds are computed by _decodePendingTriplets
 
 	def _decodeTriplets(self, glyph):
-
-		def withSign(flag, baseval):
-			assert 0 <= baseval and baseval < 65536, 'integer overflow'
-			return baseval if flag & 1 else -baseval
-
 		nPoints = glyph.endPtsOfContours[-1] + 1
 		flagSize = nPoints
 		if flagSize > len(self.flagStream):
 			raise TTLibError("not enough 'flagStream' data")
 		flagsData = self.flagStream[:flagSize]
 		self.flagStream = self.flagStream[flagSize:]
-		flags = array.array('B', flagsData)
-
-		triplets = array.array('B', self.glyphStream)
-		nTriplets = len(triplets)
-		assert nPoints <= nTriplets
+		if getattr(self, "_pendingTriplets", None) is not None:
+			nBytes = sum(bytearray(flagsData).translate(_tripletSizeTable))
+			if nBytes > len(self.glyphStream):
+				raise TTLibError("not enough 'glyphStream' data")
+			self._pendingTriplets.append((glyph, flagsData, self.glyphStream[:nBytes]))
+			self.glyphStream = self.glyphStream[nBytes:]
+			return
 
+		deltas, bytesConsumed = _unpackTriplets(flagsData, self.glyphStream)
 		x = 0
 		y = 0
 		glyph.coordinates = getTableModule('glyf').GlyphCoordinates.zeros(nPoints)
-		glyph.flags = array.array("B")
-		tripletIndex = 0
-		for i in range(nPoints):
-			flag = flags[i]
-			onCurve = not bool(flag >> 7)
-			flag &= 0x7f
-			if flag < 84:
-				nBytes = 1
-			elif flag < 120:
-				nBytes = 2
-			elif flag < 124:
-				nBytes = 3
-			else:
-				nBytes = 4
-			assert ((tripletIndex + nBytes) <= nTriplets)
-			if flag < 10:
-				dx = 0
-				dy = withSign(flag, ((flag & 14) << 7) + triplets[tripletIndex])
-			elif flag < 20:
-				dx = withSign(flag, (((flag - 10) & 14) << 7) + triplets[tripletIndex])
-				dy = 0
-			elif flag < 84:
-				b0 = flag - 20
-				b1 = triplets[tripletIndex]
-				dx = withSign(flag, 1 + (b0 & 0x30) + (b1 >> 4))
-				dy = withSign(flag >> 1, 1 + ((b0 & 0x0c) << 2) + (b1 & 0x0f))
-			elif flag < 120:
-				b0 = flag - 84
-				dx = withSign(flag, 1 + ((b0 // 12) << 8) + triplets[tripletIndex])
-				dy = withSign(flag >> 1,
-					1 + (((b0 % 12) >> 2) << 8) + triplets[tripletIndex + 1])
-			elif flag < 124:
-				b2 = triplets[tripletIndex + 1]
-				dx = withSign(flag, (triplets[tripletIndex] << 4) + (b2 >> 4))
-				dy = withSign(flag >> 1,
-					((b2 & 0x0f) << 8) + triplets[tripletIndex + 2])
-			else:
-				dx = withSign(flag,
-					(triplets[tripletIndex] << 8) + triplets[tripletIndex + 1])
-				dy = withSign(flag >> 1,
-					(triplets[tripletIndex + 2] << 8) + triplets[tripletIndex + 3])
-			tripletIndex += nBytes
+		for i, (dx, dy) in enumerate(deltas):
 			x += dx
 			y += dy
 			glyph.coordinates[i] = (x, y)
-			glyph.flags.append(int(onCurve))
-		bytesConsumed = tripletIndex
+		glyph.flags = array.array("B", bytes(bytearray(flagsData).translate(_onCurveTable)))
 		self.glyphStream = self.glyphStream[bytesConsumed:]
 
+	def _decodePendingTriplets(self):
+		"""Decode the triplets collected by _decodeTriplets for all the
+		simple glyphs at once, using NumPy."""
+		pending = self._pendingTriplets
+		dx, dy = _unpackTripletsArrays(
+			bytesjoin([flagsData for _, flagsData, _ in pending]),
+			bytesjoin([tripletData for _, _, tripletData in pending]))
+
+		glyfModule = getTableModule('glyf')
+		counts = [len(flagsData) for _, flagsData, _ in pending]
+		coordinates = glyfModule._coordinatesFromDeltas(
+			numpy.column_stack((dx, dy)), counts)
+		for (glyph, flagsData, _), coords in zip(pending, coordinates):
+			glyph.coordinates = coords
+			glyph.flags = array.array("B", bytes(bytearray(flagsData).translate(_onCurveTable)))
+			if not hasattr(glyph, "xMin"):
+				glyph.recalcBounds(self)
+
 	def _encodeGlyph(self, glyphID):
 		glyphName = self.getGlyphName(glyphID)
 		glyph = self[glyphName]
@@ -911,6 +1035,253 @@ class WOFF2GlyfTable(getTableClass('glyf')):
 		self.glyphStream += triplets.tostring()
 
 
+def _unpackTriplets(flagsData, tripletData):
+	"""Decode the point deltas of a simple glyph from its WOFF2 flags and
+	triplets. Return the list of (dx, dy) deltas, and the number of triplet
+	bytes consumed.
+	"""
+
+	def withSign(flag, baseval):
+		assert 0 <= baseval and baseval < 65536, 'integer overflow'
+		return baseval if flag & 1 else -baseval
+
+	flags = array.array('B', flagsData)
+	triplets = array.array('B', tripletData)
+	nTriplets = len(triplets)
+	assert len(flags) <= nTriplets
+
+	deltas = []
+	tripletIndex = 0
+	for flag in flags:
+		flag &= 0x7f
+		if flag < 84:
+			nBytes = 1
+		elif flag < 120:
+			nBytes = 2
+		elif flag < 124:
+			nBytes = 3
+		else:
+			nBytes = 4
+		assert ((tripletIndex + nBytes) <= nTriplets)
+		if flag < 10:
+			dx = 0
+			dy = withSign(flag, ((flag & 14) << 7) + triplets[tripletIndex])
+		elif flag < 20:
+			dx = withSign(flag, (((flag - 10) & 14) << 7) + triplets[tripletIndex])
+			dy = 0
+		elif flag < 84:
+			b0 = flag - 20
+			b1 = triplets[tripletIndex]
+			dx = withSign(flag, 1 + (b0 & 0x30) + (b1 >> 4))
+			dy = withSign(flag >> 1, 1 + ((b0 & 0x0c) << 2) + (b1 & 0x0f))
+		elif flag < 120:
+			b0 = flag - 84
+			dx = withSign(flag, 1 + ((b0 // 12) << 8) + triplets[tripletIndex])
+			dy = withSign(flag >> 1,
+				1 + (((b0 % 12) >> 2) << 8) + triplets[tripletIndex + 1])
+		elif flag < 124:
+			b2 = triplets[tripletIndex + 1]
+			dx = withSign(flag, (triplets[tripletIndex] << 4) + (b2 >> 4))
+			dy = withSign(flag >> 1,
+				((b2 & 0x0f) << 8) + triplets[tripletIndex + 2])
+		else:
+			dx = withSign(flag,
+				(triplets[tripletIndex] << 8) + triplets[tripletIndex + 1])
+			dy = withSign(flag >> 1,
+				(triplets[tripletIndex + 2] << 8) + triplets[tripletIndex + 3])
+		tripletIndex += nBytes
+		deltas.append((dx, dy))
+	return deltas, tripletIndex
+
+
+def _unpackTripletsArrays(flagsData, tripletData):
+	"""Like _unpackTriplets, but decode the flags and triplets of any number
+	of points at once with NumPy. Return the arrays of x and y deltas."""
+	flags = numpy.frombuffer(flagsData, dtype=numpy.uint8)
+	# pad, so that the bytes following a short last triplet can be read
+	triplets = numpy.frombuffer(
+		bytesjoin([tripletData, b"\0" * 3]), dtype=numpy.uint8).astype(numpy.int64)
+	f = (flags & 0x7f).astype(numpy.int64)
+	sizes = numpy.frombuffer(_tripletSizeTable, dtype=numpy.uint8)[f]
+	positions = numpy.cumsum(sizes) - sizes
+	b0 = triplets[positions]
+	b1 = triplets[positions + 1]
+	b2 = triplets[positions + 2]
+	b3 = triplets[positions + 3]
+
+	dx = numpy.zeros(len(f), dtype=numpy.int64)
+	dy = numpy.zeros(len(f), dtype=numpy.int64)
+	m = f < 10
+	dy[m] = ((f[m] & 14) << 7) + b0[m]
+	m = (10 <= f) & (f < 20)
+	dx[m] = (((f[m] - 10) & 14) << 7) + b0[m]
+	m = (20 <= f) & (f < 84)
+	b = f[m] - 20
+	dx[m] = 1 + (b & 0x30) + (b0[m] >> 4)
+	dy[m] = 1 + ((b & 0x0c) << 2) + (b0[m] & 0x0f)
+	m = (84 <= f) & (f < 120)
+	b = f[m] - 84
+	dx[m] = 1 + ((b // 12) << 8) + b0[m]
+	dy[m] = 1 + (((b % 12) >> 2) << 8) + b1[m]
+	m = (120 <= f) & (f < 124)
+	dx[m] = (b0[m] << 4) + (b1[m] >> 4)
+	dy[m] = ((b1[m] & 0x0f) << 8) + b2[m]
+	m = 124 <= f
+	dx[m] = (b0[m] << 8) + b1[m]
+	dy[m] = (b2[m] << 8) + b3[m]
+	# the sign of the only delta of flags < 20 is in bit 0; otherwise
+	# bit 0 has the sign of x, and bit 1 the sign of y
+	dx[(f & 1) == 0] *= -1
+	dy[numpy.where(f < 10, f & 1, (f >> 1) & 1) == 0] *= -1
+	return dx, dy
+
+
+def _componentSize(flags):
+	"""Return the size of a glyph component record with the given flags."""
+	glyfModule = getTableModule('glyf')
+	size = 8 if flags & glyfModule.ARG_1_AND_2_ARE_WORDS else 6
+	if flags & glyfModule.WE_HAVE_A_SCALE:
+		size += 2
+	elif flags & glyfModule.WE_HAVE_AN_X_AND_Y_SCALE:
+		size += 4
+	elif flags & glyfModule.WE_HAVE_A_TWO_BY_TWO:
+		size += 8
+	return size
+
+
+def _compileTriplets(pending):
+	"""Compile the 'glyf' flags and coordinates of simple glyphs from their
+	WOFF2 flags and triplets. 'pending' is a list of tuples whose last two
+	items are the flags and the triplet data of a glyph. Return a list of
+	(outline, bounds) tuples, where outline is a list of byte strings.
+	"""
+	compileDeltas = getTableModule('glyf').Glyph().compileDeltasGreedy
+	result = []
+	for item in pending:
+		flagsData, tripletData = item[-2:]
+		deltas, _ = _unpackTriplets(flagsData, tripletData)
+		flags = bytearray(flagsData).translate(_onCurveTable)
+		xMin = yMin = 0x7FFF
+		xMax = yMax = -0x8000
+		x = y = 0
+		for dx, dy in deltas:
+			x += dx
+			y += dy
+			xMin, xMax = min(xMin, x), max(xMax, x)
+			yMin, yMax = min(yMin, y), max(yMax, y)
+		bounds = (xMin, yMin, xMax, yMax) if deltas else (0, 0, 0, 0)
+		result.append((list(compileDeltas(flags, deltas)), bounds))
+	return result
+
+
+def _compileTripletsArrays(pending):
+	"""Like _compileTriplets, but compile all the glyphs at once with NumPy.
+	The output is the same as that of Glyph.compileDeltasGreedy.
+	"""
+	glyfModule = getTableModule('glyf')
+	counts = numpy.array([len(item[-2]) for item in pending], dtype=numpy.int64)
+	dx, dy = _unpackTripletsArrays(
+		bytesjoin([item[-2] for item in pending]),
+		bytesjoin([item[-1] for item in pending]))
+	n = len(dx)
+	ends = numpy.cumsum(counts)
+	starts = ends - counts
+	nonEmpty = counts > 0
+
+	# absolute coordinates, for the bounds
+	absolute = numpy.cumsum(numpy.column_stack((dx, dy)), axis=0)
+	totals = numpy.zeros((len(counts), 2), dtype=numpy.int64)
+	after = starts > 0
+	totals[after] = absolute[starts[after] - 1]
+	absolute -= numpy.repeat(totals, counts, axis=0)
+	if n and (min(absolute.min(), dx.min(), dy.min()) < -0x8000 or
+	          max(absolute.max(), dx.max(), dy.max()) > 0x7FFF):
+		raise OverflowError("signed short integer is out of range")
+	bounds = numpy.zeros((len(counts), 4), dtype=numpy.int64)
+	if n:
+		indices = starts[nonEmpty]
+		bounds[nonEmpty, :2] = numpy.minimum.reduceat(absolute, indices, axis=0)
+		bounds[nonEmpty, 2:] = numpy.maximum.reduceat(absolute, indices, axis=0)
+
+	# coordinates: none if zero, one unsigned byte if short, else a short
+	def compileCoordinates(d, shortFlag, sameFlag):
+		magnitude = numpy.abs(d)
+		zero = d == 0
+		short = ~zero & (magnitude <= 255)
+		wide = ~zero & ~short
+		flags = numpy.where(zero, sameFlag, 0) | numpy.where(short, shortFlag, 0)
+		flags |= numpy.where(short & (d > 0), sameFlag, 0)
+		sizes = short + 2 * wide
+		offsets = numpy.concatenate(([0], numpy.cumsum(sizes)))
+		buf = numpy.zeros(offsets[-1], dtype=numpy.uint8)
+		buf[offsets[:-1][short]] = magnitude[short]
+		value = d[wide] & 0xFFFF
+		buf[offsets[:-1][wide]] = value >> 8
+		buf[offsets[:-1][wide] + 1] = value & 0xFF
+		return flags, buf.tobytes(), offsets
+
+	flagsData = bytesjoin([item[-2] for item in pending])
+	onCurve = numpy.frombuffer(
+		bytearray(flagsData).translate(_onCurveTable), dtype=numpy.uint8).astype(numpy.int64)
+	xFlags, xData, xOffsets = compileCoordinates(
+		dx, glyfModule.flagXShort, glyfModule.flagXsame)
+	yFlags, yData, yOffsets = compileCoordinates(
+		dy, glyfModule.flagYShort, glyfModule.flagYsame)
+	flags = onCurve | xFlags | yFlags
+
+	# repeated flags: a run of equal flags is split in chunks of up to 256;
+	# chunks of one or two flags are written as such, longer chunks as the
+	# flag with flagRepeat set, followed by the repeat count
+	index = numpy.arange(n)
+	runStarts = numpy.ones(n, dtype=bool)
+	runStarts[1:] = flags[1:] != flags[:-1]
+	runStarts[starts[nonEmpty]] = True
+	runStart = numpy.maximum.accumulate(numpy.where(runStarts, index, 0))
+	chunkStarts = numpy.nonzero((index - runStart) % 256 == 0)[0]
+	chunkSizes = numpy.diff(numpy.concatenate((chunkStarts, [n])))
+	chunkFlags = flags[chunkStarts]
+	outSizes = numpy.where(chunkSizes == 1, 1, 2)
+	outOffsets = numpy.concatenate(([0], numpy.cumsum(outSizes)))
+	buf = numpy.zeros(outOffsets[-1], dtype=numpy.uint8)
+	buf[outOffsets[:-1]] = chunkFlags | numpy.where(chunkSizes > 2, glyfModule.flagRepeat, 0)
+	m = chunkSizes > 1
+	buf[outOffsets[:-1][m] + 1] = numpy.where(chunkSizes == 2, chunkFlags, chunkSizes - 1)[m]
+	compressedFlags = buf.tobytes()
+	flagOffsets = outOffsets[numpy.searchsorted(chunkStarts, numpy.concatenate((starts, [n])))]
+
+	result = []
+	flagOffsets = flagOffsets.tolist()
+	xOffsets = xOffsets[numpy.concatenate((starts, [n]))].tolist()
+	yOffsets = yOffsets[numpy.concatenate((starts, [n]))].tolist()
+	for i, glyphBounds in enumerate(bounds.tolist()):
+		outline = [
+			compressedFlags[flagOffsets[i]:flagOffsets[i+1]],
+			xData[xOffsets[i]:xOffsets[i+1]],
+			yData[yOffsets[i]:yOffsets[i+1]]]
+		result.append((outline, glyphBounds))
+	return result
+
+
+def _read255UShort(data, offset):
+	"""Like unpack255UShort, but read from 'data' at 'offset', and return
+	the decoded integer and the offset of the following byte."""
+	if offset >= len(data):
+		raise TTLibError('not enough data to unpack 255UInt16')
+	code = byteord(data[offset])
+	offset += 1
+	if code < 253:
+		return code, offset
+	if code == 253:
+		if offset + 2 > len(data):
+			raise TTLibError('not enough data to unpack 255UInt16')
+		result, = struct.unpack(">H", data[offset:offset+2])
+		return result, offset + 2
+	if offset >= len(data):
+		raise TTLibError('not enough data to unpack 255UInt16')
+	result = byteord(data[offset]) + (506 if code == 254 else 253)
+	return result, offset + 1
+
+
 class WOFF2FlavorData(WOFFFlavorData):
 
 	Flavor = 'woff2'
@@ -257,7 +257,8 @@ def ttDump(input, output, options):
 			splitTables=options.splitTables,
 			disassembleInstructions=options.disassembleInstructions,
 			bitmapGlyphDataFormat=options.bitmapGlyphDataFormat,
-			newlinestr=options.newlinestr)
+			newlinestr=options.newlinestr,
+			streaming=True)
 	ttf.close()
 
 
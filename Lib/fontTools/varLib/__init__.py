@@ -21,7 +21,7 @@ API *will* change in near future.
 from __future__ import print_function, division, absolute_import
 from __future__ import unicode_literals
 from fontTools.misc.py23 import *
-from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib import TTFont, newTable, _getForkContext
 from fontTools.ttLib.tables._n_a_m_e import NameRecord
 from fontTools.ttLib.tables._f_v_a_r import Axis, NamedInstance
 from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
@@ -29,6 +29,7 @@ from fontTools.ttLib.tables.TupleVariation import TupleVariation
 from fontTools.ttLib.tables import otTables as ot
 from fontTools.varLib import builder, designspace, models
 from fontTools.varLib.merger import VariationMerger, _all_equal
+from fontTools.varLib.iup import iup_delta_optimize
 from collections import OrderedDict
 import os.path
 import logging
@@ -202,34 +203,65 @@ def _SetCoordinates(font, glyphName, coord):
 	font["hmtx"].metrics[glyphName] = horizontalAdvanceWidth, leftSideBearing
 
 
-def _optimize_contour(delta, coords, tolerance=0.):
-	n = len(delta)
-	if all(abs(x) <= tolerance >= abs(y) for x,y in delta):
-		return [None] * n
-	if n == 1:
-		return delta
-	d0 = delta[0]
-	if all(d0 == d for d in delta):
-		return [d0] + [None] * (n-1)
+def _get_glyph_variations(glyph, model, master_ttfs, tolerance, optimize):
+	"""Return the list of TupleVariations of glyph, or None if its masters
+	are incompatible."""
 
-	# TODO
+	allData = [_GetCoordinates(m, glyph) for m in master_ttfs]
+	allCoords = [d[0] for d in allData]
+	allControls = [d[1] for d in allData]
+	control = allControls[0]
+	if (any(c != control for c in allControls)):
+		return None
+	del allControls
 
-	return delta
+	variations = []
+	deltas = model.getDeltas(allCoords)
+	supports = model.supports
+	assert len(deltas) == len(supports)
 
-def _optimize_delta(delta, coords, ends, tolerance=0.):
-	assert sorted(ends) == ends and len(coords) == (ends[-1]+1 if ends else 0) + 4
-	n = len(coords)
-	ends = ends + [n-4, n-3, n-2, n-1]
-	out = []
-	start = 0
-	for end in ends:
-		contour = _optimize_contour(delta[start:end+1], coords[start:end+1], tolerance)
-		out.extend(contour)
-		start = end+1
+	# Prepare for IUP optimization
+	origCoords = deltas[0]
+	endPts = control[1] if control[0] >= 1 else list(range(len(control[1])))
 
-	return out
+	for i,(delta,support) in enumerate(zip(deltas[1:], supports[1:])):
+		if all(abs(v) <= tolerance for v in delta.array):
+			continue
+		var = TupleVariation(support, delta)
+		if optimize:
+			delta_opt = iup_delta_optimize(delta, origCoords, endPts, tolerance=tolerance)
+
+			if None in delta_opt:
+				# Use "optimized" version only if smaller...
+				var_opt = TupleVariation(support, delta_opt)
+
+				axis_tags = sorted(support.keys()) # Shouldn't matter that this is different from fvar...?
+				tupleData, auxData = var.compile(axis_tags, [], None)
+				unoptimized_len = len(tupleData) + len(auxData)
+				tupleData, auxData = var_opt.compile(axis_tags, [], None)
+				optimized_len = len(tupleData) + len(auxData)
+
+				if optimized_len < unoptimized_len:
+					var = var_opt
+
+		variations.append(var)
+
+	return variations
 
-def _add_gvar(font, model, master_ttfs, tolerance=.5, optimize=True):
+# The arguments of _get_glyph_variations while _add_gvar builds the
+# variations in worker processes; these are forked after it is set.
+_gvarWorkerArgs = None
+
+def _get_worker_glyph_variations(glyph):
+	return _get_glyph_variations(glyph, *_gvarWorkerArgs)
+
+def _add_gvar(font, model, master_ttfs, tolerance=.5, optimize=True, workers=None):
+	"""If 'optimize' is True, the deltas are IUP-optimized and the tuples of
+	a glyph may share their point numbers.
+
+	If 'workers' is greater than 1, the glyphs are shared out between
+	that many worker processes, forked once the masters are decompiled."""
+	global _gvarWorkerArgs
 
 	assert tolerance >= 0
 
@@ -239,60 +271,50 @@ def _add_gvar(font, model, master_ttfs, tolerance=.5, optimize=True):
 	gvar.version = 1
 	gvar.reserved = 0
 	gvar.variations = {}
+	gvar.useSharedPoints = optimize
+
+	glyphOrder = font.getGlyphOrder()
+	args = (model, master_ttfs, tolerance, optimize)
+	if workers is not None and workers > 1 and len(glyphOrder) > 1 and _getForkContext() is not None:
+		# Decompile the masters once, for all the workers to share
+		for m in master_ttfs:
+			m['hmtx']
+			glyf = m['glyf']
+			glyf.expandGlyphs(glyf.glyphs.values())
+		workers = min(workers, len(glyphOrder))
+		log.debug("building gvar in %d worker processes", workers)
+		_gvarWorkerArgs = args
+		try:
+			pool = _getForkContext().Pool(workers)
+			try:
+				chunksize = max(1, len(glyphOrder) // (workers * 16))
+				results = pool.imap(_get_worker_glyph_variations, glyphOrder, chunksize)
+				allVariations = list(results)
+			finally:
+				pool.close()
+				pool.join()
+		finally:
+			_gvarWorkerArgs = None
+	else:
+		allVariations = (_get_glyph_variations(glyph, *args) for glyph in glyphOrder)
 
-	for glyph in font.getGlyphOrder():
-
-		allData = [_GetCoordinates(m, glyph) for m in master_ttfs]
-		allCoords = [d[0] for d in allData]
-		allControls = [d[1] for d in allData]
-		control = allControls[0]
-		if (any(c != control for c in allControls)):
+	for glyph, variations in zip(glyphOrder, allVariations):
+		if variations is None:
 			log.warning("glyph %s has incompatible masters; skipping" % glyph)
 			continue
-		del allControls
-
-		# Update gvar
-		gvar.variations[glyph] = []
-		deltas = model.getDeltas(allCoords)
-		supports = model.supports
-		assert len(deltas) == len(supports)
-
-		# Prepare for IUP optimization
-		origCoords = deltas[0]
-		endPts = control[1] if control[0] >= 1 else list(range(len(control[1])))
-
-		for i,(delta,support) in enumerate(zip(deltas[1:], supports[1:])):
-			if all(abs(v) <= tolerance for v in delta.array):
-				continue
-			var = TupleVariation(support, delta)
-			if optimize:
-				delta_opt = _optimize_delta(delta, origCoords, endPts, tolerance=tolerance)
-
-				if None in delta_opt:
-					# Use "optimized" version only if smaller...
-					var_opt = TupleVariation(support, delta_opt)
-
-					axis_tags = sorted(support.keys()) # Shouldn't matter that this is different from fvar...?
-					tupleData, auxData = var.compile(axis_tags, [], None)
-					unoptimized_len = len(tupleData) + len(auxData)
-					tupleData, auxData = var_opt.compile(axis_tags, [], None)
-					optimized_len = len(tupleData) + len(auxData)
-
-					if optimized_len < unoptimized_len:
-						var = var_opt
-
-			gvar.variations[glyph].append(var)
+		gvar.variations[glyph] = variations
 
 def _add_HVAR(font, model, master_ttfs, axisTags):
 
 	log.info("Generating HVAR")
 
-	hAdvanceDeltas = {}
+	glyphOrder = font.getGlyphOrder()
 	metricses = [m["hmtx"].metrics for m in master_ttfs]
-	for glyph in font.getGlyphOrder():
-		hAdvances = [metrics[glyph][0] for metrics in metricses]
+	hAdvancesList = [[metrics[glyph][0] for metrics in metricses] for glyph in glyphOrder]
+	hAdvanceDeltas = {}
+	for glyph, deltas in zip(glyphOrder, model.getDeltasBatch(hAdvancesList)):
 		# TODO move round somewhere else?
-		hAdvanceDeltas[glyph] = tuple(round(d) for d in model.getDeltas(hAdvances)[1:])
+		hAdvanceDeltas[glyph] = tuple(int(round(d)) for d in deltas[1:])
 
 	# We only support the direct mapping right now.
 
@@ -592,13 +614,21 @@ def load_designspace(designspace_filename):
 	return axes, internal_axis_supports, base_idx, normalized_master_locs, masters, instances
 
 
-def build(designspace_filename, master_finder=lambda s:s):
+def build(designspace_filename, master_finder=lambda s:s, workers=None, optimize=True):
 	"""
 	Build variation font from a designspace file.
 
 	If master_finder is set, it should be a callable that takes master
 	filename as found in designspace file and map it to master font
 	binary as to be opened (eg. .ttf or .otf).
+
+	If workers is greater than 1, the 'gvar' variations are built in that
+	many worker processes.
+
+	If optimize is True, the 'gvar' table is made smaller by IUP-optimizing
+	the deltas and sharing point numbers between the tuples of a glyph. Set
+	it to False to build fonts that work with CoreText in macOS 10.9.5 up to
+	10.12, which breaks variations that use shared point numbers.
 	"""
 
 	axes, internal_axis_supports, base_idx, normalized_master_locs, masters, instances = load_designspace(designspace_filename)
@@ -628,7 +658,7 @@ def build(designspace_filename, master_finder=lambda s:s):
 	log.info("Building variations tables")
 	_add_MVAR(vf, model, master_fonts, axisTags)
 	if 'glyf' in vf:
-		_add_gvar(vf, model, master_fonts)
+		_add_gvar(vf, model, master_fonts, optimize=optimize, workers=workers)
 	_add_HVAR(vf, model, master_fonts, axisTags)
 	_merge_OTL(vf, model, master_fonts, axisTags)
 
@@ -641,6 +671,10 @@ def main(args=None):
 
 	parser = ArgumentParser(prog='varLib')
 	parser.add_argument('designspace')
+	parser.add_argument('-j', '--workers', type=int, default=None,
+		help='Number of worker processes to build the glyph variations.')
+	parser.add_argument('--no-optimize', dest='optimize', action='store_false',
+		help='Neither IUP-optimize the glyph variations nor share their point numbers.')
 	options = parser.parse_args(args)
 
 	# TODO: allow user to configure logging via command-line options
@@ -650,7 +684,8 @@ def main(args=None):
 	finder = lambda s: s.replace('master_ufo', 'master_ttf_interpolatable').replace('.ufo', '.ttf')
 	outfile = os.path.splitext(designspace_filename)[0] + '-VF.ttf'
 
-	vf, model, master_ttfs = build(designspace_filename, finder)
+	vf, model, master_ttfs = build(designspace_filename, finder, workers=options.workers,
+		optimize=options.optimize)
 
 	log.info("Saving variation font %s", outfile)
 	vf.save(outfile)
@@ -92,8 +92,11 @@ class OnlineVarStoreBuilder(object):
 		self._regionMap = {}
 		self._regionList = buildVarRegionList([], axisTags)
 		self._store = buildVarStore(self._regionList, [])
+		self._model = None
+		self._pending = []
 
 	def setModel(self, model):
+		self._flush()
 		self._model = model
 
 		regionMap = self._regionMap
@@ -115,6 +118,7 @@ class OnlineVarStoreBuilder(object):
 		self._store.VarData.append(data)
 
 	def finish(self, optimize=True):
+		self._flush()
 		self._regionList.RegionCount = len(self._regionList.Region)
 		self._store.VarDataCount = len(self._store.VarData)
 		for data in self._store.VarData:
@@ -123,13 +127,22 @@ class OnlineVarStoreBuilder(object):
 		return self._store
 
 	def storeMasters(self, master_values):
-		deltas = [int(round(d)) for d in self._model.getDeltas(master_values)]
-		base = deltas.pop(0)
-		inner = len(self._data.Item)
-		self._data.Item.append(deltas)
+		# The base delta is the value of the base master; the other deltas
+		# are computed in batches by _flush(), for all the stored values.
+		base = int(round(master_values[self._model.reverseMapping[0]]))
+		inner = len(self._data.Item) + len(self._pending)
+		self._pending.append(master_values)
 		# TODO Check for full data array?
 		return base, (self._outer << 16) + inner
 
+	def _flush(self):
+		if not self._pending:
+			return
+		items = self._data.Item
+		for deltas in self._model.getDeltasBatch(self._pending):
+			items.append([int(round(d)) for d in deltas[1:]])
+		self._pending = []
+
 
 
 # Variation helpers
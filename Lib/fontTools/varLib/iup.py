@@ -0,0 +1,310 @@
+"""Interpolation of untouched points (IUP), as done for 'gvar' deltas.
+
+iup_delta() fills in the deltas that a 'gvar' variation leaves out, and
+iup_delta_optimize() finds the deltas that a variation can leave out.
+"""
+from __future__ import print_function, division, absolute_import
+from fontTools.misc.py23 import *
+
+__all__ = ['iup_segment', 'iup_contour', 'iup_delta',
+	'iup_contour_optimize', 'iup_delta_optimize']
+
+
+def iup_segment(coords, rc1, rd1, rc2, rd2):
+	# rc1 = reference coord 1
+	# rd1 = reference delta 1
+	out_arrays = [None, None]
+	for j in 0,1:
+		out_arrays[j] = out = []
+		x1, x2, d1, d2 = rc1[j], rc2[j], rd1[j], rd2[j]
+
+
+		if x1 == x2:
+			n = len(coords)
+			if d1 == d2:
+				out.extend([d1]*n)
+			else:
+				out.extend([0]*n)
+			continue
+
+		if x1 > x2:
+			x1, x2 = x2, x1
+			d1, d2 = d2, d1
+
+		# x1 < x2
+		scale = (d2 - d1) / (x2 - x1)
+		for pair in coords:
+			x = pair[j]
+
+			if x <= x1:
+				d = d1
+			elif x >= x2:
+				d = d2
+			else:
+				# Interpolate
+				d = d1 + (x - x1) * scale
+
+			out.append(d)
+
+	return zip(*out_arrays)
+
+def iup_contour(delta, coords):
+	assert len(delta) == len(coords)
+	if None not in delta:
+		return delta
+
+	n = len(delta)
+	# indices of points with explicit deltas
+	indices = [i for i,v in enumerate(delta) if v is not None]
+	if not indices:
+		# All deltas are None.  Return 0,0 for all.
+		return [(0,0)]*n
+
+	out = []
+	it = iter(indices)
+	start = next(it)
+	if start != 0:
+		# Initial segment that wraps around
+		i1, i2, ri1, ri2 = 0, start, start, indices[-1]
+		out.extend(iup_segment(coords[i1:i2], coords[ri1], delta[ri1], coords[ri2], delta[ri2]))
+	out.append(delta[start])
+	for end in it:
+		if end - start > 1:
+			i1, i2, ri1, ri2 = start+1, end, start, end
+			out.extend(iup_segment(coords[i1:i2], coords[ri1], delta[ri1], coords[ri2], delta[ri2]))
+		out.append(delta[end])
+		start = end
+	if start != n-1:
+		# Final segment that wraps around
+		i1, i2, ri1, ri2 = start+1, n, start, indices[0]
+		out.extend(iup_segment(coords[i1:i2], coords[ri1], delta[ri1], coords[ri2], delta[ri2]))
+
+	assert len(delta) == len(out), (len(delta), len(out))
+	return out
+
+def iup_delta(delta, coords, ends):
+	assert sorted(ends) == ends and len(coords) == (ends[-1]+1 if ends else 0) + 4
+	n = len(coords)
+	ends = ends + [n-4, n-3, n-2, n-1]
+	out = []
+	start = 0
+	for end in ends:
+		end += 1
+		contour = iup_contour(delta[start:end], coords[start:end])
+		out.extend(contour)
+		start = end
+
+	return out
+
+
+# Optimizer
+
+def _can_iup_in_between(delta, coords, i, j, tolerance):
+	"""Return True if the deltas of the points strictly between i and j
+	are all interpolated from points i and j within tolerance. 'i' may be
+	-1, for the last point of the lists."""
+	assert j - i >= 2
+	# Same math as iup_segment(), but stopping at the first point that is
+	# too far off, since most of the spans tried by the search fail.
+	rc1, rd1, rc2, rd2 = coords[i], delta[i], coords[j], delta[j]
+	params = []
+	for k in 0,1:
+		x1, x2, d1, d2 = rc1[k], rc2[k], rd1[k], rd2[k]
+		if x1 > x2:
+			x1, x2 = x2, x1
+			d1, d2 = d2, d1
+		if x1 == x2:
+			scale = None
+			if d1 != d2:
+				d1 = d2 = 0
+		else:
+			scale = (d2 - d1) / (x2 - x1)
+		params.append((x1, x2, d1, d2, scale))
+	(x1, x2, dx1, dx2, xScale), (y1, y2, dy1, dy2, yScale) = params
+	for (x, y), (dx, dy) in zip(coords[i+1:j], delta[i+1:j]):
+		if x <= x1 or xScale is None:
+			px = dx1
+		elif x >= x2:
+			px = dx2
+		else:
+			px = dx1 + (x - x1) * xScale
+		if y <= y1 or yScale is None:
+			py = dy1
+		elif y >= y2:
+			py = dy2
+		else:
+			py = dy1 + (y - y1) * yScale
+		if abs(complex(dx - px, dy - py)) > tolerance:
+			return False
+	return True
+
+def _iup_contour_bound_forced_set(delta, coords, tolerance=0):
+	"""Return the indices of points of a contour that must have an
+	explicit delta, whatever the other explicit points are.
+
+	On each axis, the deltas that IUP produces for the points between two
+	explicit points, and for these two points, are a monotonic function of
+	the point coordinates. So the delta of an interpolated point must fit
+	with the deltas of its two neighbours, which are at most 'tolerance'
+	away from the values of that function. This set is only used to prune
+	the search, so it may miss some forced points, but it never contains
+	a point that could be interpolated (except in the degenerate case of
+	two explicit points with the same coordinate and different deltas,
+	which IUP turns into zero deltas).
+	"""
+	assert len(delta) == len(coords)
+	n = len(delta)
+	margin = 2 * tolerance
+	forced = set()
+	for i in range(n):
+		ld, lc = delta[i-1], coords[i-1]
+		d, c = delta[i], coords[i]
+		nd, nc = delta[(i+1) % n], coords[(i+1) % n]
+		for j in 0,1:
+			cj, dj = c[j], d[j]
+			if lc[j] <= nc[j]:
+				c1, c2, d1, d2 = lc[j], nc[j], ld[j], nd[j]
+			else:
+				c1, c2, d1, d2 = nc[j], lc[j], nd[j], ld[j]
+			if c1 <= cj <= c2:
+				# The delta must be in between the neighbours' deltas
+				force = not (min(d1, d2) - margin <= dj <= max(d1, d2) + margin)
+			elif c1 == c2:
+				force = False
+			elif d1 + margin < d2:
+				# The function is increasing
+				force = dj > d1 + margin if cj < c1 else dj < d2 - margin
+			elif d2 + margin < d1:
+				# The function is decreasing
+				force = dj < d1 - margin if cj < c1 else dj > d2 + margin
+			else:
+				force = False
+			if force:
+				forced.add(i)
+				break
+	return forced
+
+def _iup_contour_optimize_dp(delta, coords, forced=set(), tolerance=0, lookback=None):
+	"""For each index i, find the cheapest encoding of points 0 to i where
+	point i is explicit, by trying all the previous explicit points j
+	whose interpolation fills in the points between j and i. Index -1
+	stands for the last point of the lists, which is also explicit.
+
+	Interpolation can't skip over a forced point, so the search for j
+	stops at the first forced point. Return the chain of previous
+	explicit points, and the costs, by index.
+	"""
+	n = len(delta)
+	if lookback is None:
+		lookback = n
+	costs = {-1: 0}
+	chain = {-1: None}
+	for i in range(n):
+		best_cost = costs[i-1] + 1
+		costs[i] = best_cost
+		chain[i] = i - 1
+
+		if i - 1 in forced:
+			continue
+
+		for j in range(i-2, max(i-lookback, -2), -1):
+			cost = costs[j] + 1
+			if cost < best_cost and _can_iup_in_between(delta, coords, j, i, tolerance):
+				costs[i] = best_cost = cost
+				chain[i] = j
+			if j in forced:
+				break
+
+	return chain, costs
+
+def _rot_list(l, k):
+	"""Rotate list by k items forward: the item at position 0 will be
+	at position k in the returned list. Negative k is allowed."""
+	n = len(l)
+	k %= n
+	if not k: return l
+	return l[n-k:] + l[:n-k]
+
+def _rot_set(s, k, n):
+	k %= n
+	if not k: return s
+	return {(v + k) % n for v in s}
+
+def iup_contour_optimize(delta, coords, tolerance=0.):
+	"""Return a copy of 'delta' where the deltas of as many points as
+	possible are replaced with None, such that iup_contour() reproduces
+	all the original deltas within 'tolerance'.
+	"""
+	n = len(delta)
+
+	# If all deltas are within tolerance of zero, encode nothing
+	if all(abs(complex(*p)) <= tolerance for p in delta):
+		return [None] * n
+
+	if n == 1:
+		return delta
+
+	# If all deltas are the same, encode just the first one
+	d0 = delta[0]
+	if all(d0 == d for d in delta):
+		return [d0] + [None] * (n-1)
+
+	# Else, solve the general problem with dynamic programming. The DP
+	# finds the best solution where the last point is explicit; the
+	# contour is rotated or repeated to lift this constraint.
+	forced = _iup_contour_bound_forced_set(delta, coords, tolerance)
+	if forced:
+		# Rotate the contour so that its last point is a forced point
+		k = (n-1) - max(forced)
+		assert k >= 0
+		delta = _rot_list(delta, k)
+		coords = _rot_list(coords, k)
+		forced = _rot_set(forced, k, n)
+
+		chain, costs = _iup_contour_optimize_dp(delta, coords, forced, tolerance)
+
+		solution = set()
+		i = n - 1
+		while i is not None:
+			solution.add(i)
+			i = chain[i]
+		solution.discard(-1)
+		assert forced <= solution, (forced, solution)
+		delta = [delta[i] if i in solution else None for i in range(n)]
+
+		delta = _rot_list(delta, -k)
+	else:
+		# Repeat the contour, solve the linear problem over the two
+		# copies, and look for the cheapest solution spanning a full turn
+		# of the contour.
+		chain, costs = _iup_contour_optimize_dp(delta+delta, coords+coords, forced, tolerance, n+1)
+		best_sol, best_cost = None, n+1
+
+		for start in range(n-1, 2*n-1):
+			solution = set()
+			i = start
+			while i > start - n:
+				solution.add(i % n)
+				i = chain[i]
+			if i == start - n:
+				cost = costs[start] - costs[start - n]
+				if cost <= best_cost:
+					best_sol, best_cost = solution, cost
+
+		delta = [delta[i] if i in best_sol else None for i in range(n)]
+
+	return delta
+
+def iup_delta_optimize(delta, coords, ends, tolerance=0.):
+	assert sorted(ends) == ends and len(coords) == (ends[-1]+1 if ends else 0) + 4
+	n = len(coords)
+	ends = ends + [n-4, n-3, n-2, n-1]
+	out = []
+	start = 0
+	for end in ends:
+		contour = iup_contour_optimize(delta[start:end+1], coords[start:end+1], tolerance)
+		assert len(contour) == end - start + 1
+		out.extend(contour)
+		start = end+1
+
+	return out
@@ -1,8 +1,13 @@
 """Variation fonts interpolation models."""
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
-__all__ = ['normalizeValue', 'normalizeLocation', 'supportScalar', 'VariationModel']
+__all__ = ['normalizeValue', 'normalizeLocation', 'supportScalar',
+	'piecewiseLinearMap', 'VariationModel']
 
 def normalizeValue(v, triple):
 	"""Normalizes value based on a min/default/max triple.
@@ -98,6 +103,38 @@ def supportScalar(location, support):
 	return scalar
 
 
+def piecewiseLinearMap(v, mapping):
+	"""Maps value through the piecewise-linear function given as a
+	{from: to} mapping, like the segment maps of the 'avar' table.
+	Values outside the mapping's domain are shifted with the nearest end.
+	>>> piecewiseLinearMap(.5, {-1:-1, 0:0, 1:1})
+	0.5
+	>>> piecewiseLinearMap(.75, {-1:-1, 0:0, .5:.25, 1:1})
+	0.625
+	>>> piecewiseLinearMap(-.7, {-1:-1, 0:0, 1:1})
+	-0.7
+	>>> piecewiseLinearMap(.3, {})
+	0.3
+	"""
+	keys = mapping.keys()
+	if not keys:
+		return v
+	if v in keys:
+		return mapping[v]
+	k = min(keys)
+	if v < k:
+		return v + mapping[k] - k
+	k = max(keys)
+	if v > k:
+		return v + mapping[k] - k
+	# Interpolate
+	a = max(k for k in keys if k < v)
+	b = min(k for k in keys if k > v)
+	va = mapping[a]
+	vb = mapping[b]
+	return va + (vb - va) * (v - a) / (b - a)
+
+
 class VariationModel(object):
 
 	"""
@@ -264,9 +301,34 @@ class VariationModel(object):
 			out.append(delta)
 		return out
 
+	def getDeltasBatch(self, masterValuesList):
+		"""Like getDeltas(), for each list of master values, which must be
+		numbers, of masterValuesList.
+
+		With NumPy, the deltas of all the lists are computed at once, one
+		master at a time, with the same operations as getDeltas(); so the
+		results are the same, only as floats.
+		"""
+		if numpy is None or not masterValuesList:
+			return [self.getDeltas(masterValues) for masterValues in masterValuesList]
+		values = numpy.array(masterValuesList, dtype=numpy.float64)
+		assert values.shape[1:] == (len(self.deltaWeights),)
+		mapping = self.reverseMapping
+		out = numpy.empty_like(values)
+		for i,weights in enumerate(self.deltaWeights):
+			delta = values[:, mapping[i]].copy()
+			for j,weight in weights.items():
+				delta -= out[:, j] * weight
+			out[:, i] = delta
+		return out.tolist()
+
 	def getScalars(self, loc):
 		return [supportScalar(loc, support) for support in self.supports]
 
+	def getScalarsMatrix(self, locs):
+		"""Return the scalars of each of the locations, as a list of rows."""
+		return [self.getScalars(loc) for loc in locs]
+
 	@staticmethod
 	def interpolateFromDeltasAndScalars(deltas, scalars):
 		v = None
@@ -292,6 +354,32 @@ class VariationModel(object):
 		deltas = self.getDeltas(masterValues)
 		return self.interpolateFromDeltasAndScalars(deltas, scalars)
 
+	def interpolateFromDeltasBatch(self, locs, deltasList):
+		"""Return, for each of the locations, the list of the values
+		interpolated from each list of deltas of deltasList, which must be
+		numbers. With NumPy, this is the product of the scalars matrix of
+		the locations with the matrix of the deltas.
+		>>> model = VariationModel([{}, {'wght': 1}])
+		>>> model.interpolateFromDeltasBatch([{'wght': .5}, {}], [[10, 20], [0, 4]])
+		[[20.0, 2.0], [10.0, 0.0]]
+		"""
+		scalarsMatrix = self.getScalarsMatrix(locs)
+		if numpy is None or not deltasList or not scalarsMatrix:
+			return [[float(self.interpolateFromDeltasAndScalars(deltas, scalars))
+				 for deltas in deltasList]
+				for scalars in scalarsMatrix]
+		deltas = numpy.array(deltasList, dtype=numpy.float64)
+		return numpy.dot(numpy.array(scalarsMatrix), deltas.T).tolist()
+
+	def interpolateFromMastersBatch(self, locs, masterValuesList):
+		"""Like interpolateFromDeltasBatch(), from lists of master values.
+		>>> model = VariationModel([{}, {'wght': 1}])
+		>>> model.interpolateFromMastersBatch([{'wght': .5}], [[10, 30], [0, 4]])
+		[[20.0, 2.0]]
+		"""
+		deltasList = self.getDeltasBatch(masterValuesList)
+		return self.interpolateFromDeltasBatch(locs, deltasList)
+
 
 if __name__ == "__main__":
 	import doctest, sys
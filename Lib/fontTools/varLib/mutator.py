@@ -2,163 +2,403 @@
 Instantiate a variation font.  Run, eg:
 
 $ python mutator.py ./NotoSansArabic-VF.ttf wght=140 wdth=85
+
+or, to instantiate all the named instances of the font:
+
+$ python mutator.py ./NotoSansArabic-VF.ttf --named-instances -j 4
 """
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
-from fontTools.ttLib import TTFont
+from fontTools.misc.fixedTools import floatToFixed
+from fontTools.ttLib import TTFont, _getForkContext
 from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
-from fontTools.varLib import _GetCoordinates, _SetCoordinates
-from fontTools.varLib.models import VariationModel, supportScalar, normalizeLocation
+from fontTools.varLib import _GetCoordinates, _SetCoordinates, _MVAR_entries
+from fontTools.varLib.models import supportScalar, normalizeLocation, piecewiseLinearMap
+from fontTools.varLib.varStore import VarStoreInstancer
+from fontTools.varLib.iup import iup_delta
+from copy import copy, deepcopy
+import logging
 import os.path
 
+log = logging.getLogger("fontTools.varlib.mutator")
 
-def _iup_segment(coords, rc1, rd1, rc2, rd2):
-	# rc1 = reference coord 1
-	# rd1 = reference delta 1
-	out_arrays = [None, None]
-	for j in 0,1:
-		out_arrays[j] = out = []
-		x1, x2, d1, d2 = rc1[j], rc2[j], rd1[j], rd2[j]
 
+class _TupleScalars(object):
 
-		if x1 == x2:
-			n = len(coords)
-			if d1 == d2:
-				out.extend([d1]*n)
-			else:
-				out.extend([0]*n)
-			continue
-
-		if x1 > x2:
-			x1, x2 = x2, x1
-			d1, d2 = d2, d1
-
-		# x1 < x2
-		scale = (d2 - d1) / (x2 - x1)
-		for pair in coords:
-			x = pair[j]
-
-			if x <= x1:
-				d = d1
-			elif x >= x2:
-				d = d2
+	"""Caches the scalars of 'gvar'/'cvar' tuples by their axes, which
+	are shared by most glyphs."""
+
+	def __init__(self, location):
+		self.location = location
+		self._cache = {}
+
+	def __call__(self, axes):
+		key = tuple(sorted(axes.items()))
+		try:
+			return self._cache[key]
+		except KeyError:
+			scalar = self._cache[key] = supportScalar(self.location, axes)
+			return scalar
+
+
+def _getComponentDepths(glyf, glyphnames):
+	depths = {}
+	def depth(name):
+		d = depths.get(name)
+		if d is None:
+			glyph = glyf[name]
+			if glyph.isComposite():
+				depths[name] = 0 # guard against cycles
+				d = 1 + max(depth(c.glyphName) for c in glyph.components)
 			else:
-				# Interpolate
-				d = d1 + (x - x1) * scale
+				d = 0
+			depths[name] = d
+		return d
+	for name in glyphnames:
+		depth(name)
+	return depths
+
+
+def normalizeVariableFontLocation(varfont, location):
+	"""Normalizes a user-space location with the axes of the 'fvar' table,
+	maps it through the 'avar' table if any, and rounds it to F2Dot14.
+	"""
+	fvar = varfont['fvar']
+	axes = {a.axisTag:(a.minValue,a.defaultValue,a.maxValue) for a in fvar.axes}
+	loc = normalizeLocation(location, axes)
+	if 'avar' in varfont:
+		maps = varfont['avar'].segments
+		loc = {k:piecewiseLinearMap(v, maps.get(k, {})) for k,v in loc.items()}
+	# Quantize to F2Dot14, like the implementations do
+	return {k:floatToFixed(v, 14) / (1 << 14) for k,v in loc.items()}
+
+
+_VARIATION_TABLES = ('avar','cvar','fvar','gvar','HVAR','MVAR','VVAR','STAT')
+
+
+class _Instancer(object):
+
+	"""Applies the variation tables of a variable font to fonts that hold
+	its default tables: the variable font itself, or copies of it.
 
-			out.append(d)
+	The deltas that 'gvar' leaves to IUP depend only on the default
+	outlines, so they are computed once and shared by all the instances.
+	"""
 
-	return zip(*out_arrays)
+	def __init__(self, varfont):
+		self.fvarAxes = varfont['fvar'].axes
+		self.tables = {tag: varfont[tag]
+			       for tag in ('gvar', 'cvar', 'HVAR', 'MVAR') if tag in varfont}
+		self._deltas = {}
 
-def _iup_contour(delta, coords):
-	assert len(delta) == len(coords)
-	if None not in delta:
+	def instantiate(self, font, loc):
+		# The 'HVAR' deltas apply to the default advance widths, that the
+		# phantom points of 'gvar' change.
+		advances = self._getHVARAdvances(font, loc) if 'HVAR' in self.tables else None
+
+		if 'gvar' in self.tables:
+			log.info("Mutating glyf/gvar tables")
+			self._instantiateGvar(font, loc)
+
+		if 'cvar' in self.tables:
+			log.info("Mutating cvt/cvar tables")
+			self._instantiateCvar(font, loc)
+
+		if advances:
+			log.info("Mutating hmtx/HVAR tables")
+			hmtx = font['hmtx'].metrics
+			for glyphname, advance in advances.items():
+				hmtx[glyphname] = advance, hmtx[glyphname][1]
+
+		if 'MVAR' in self.tables:
+			log.info("Mutating MVAR table")
+			self._instantiateMVAR(font, loc)
+
+		log.info("Removing variable tables")
+		for tag in _VARIATION_TABLES:
+			if tag in font:
+				del font[tag]
+
+	def _getDelta(self, glyphname, i, var, origCoords, control):
+		key = (glyphname, i)
+		delta = self._deltas.get(key)
+		if delta is None:
+			delta = var.coordinates
+			if None in delta:
+				endPts = control[1] if control[0] >= 1 else list(range(len(control[1])))
+				delta = iup_delta(delta, origCoords, endPts)
+			delta = self._deltas[key] = GlyphCoordinates(delta)
 		return delta
 
-	n = len(delta)
-	# indices of points with explicit deltas
-	indices = [i for i,v in enumerate(delta) if v is not None]
-	if not indices:
-		# All deltas are None.  Return 0,0 for all.
-		return [(0,0)]*n
-
-	out = []
-	it = iter(indices)
-	start = next(it)
-	if start != 0:
-		# Initial segment that wraps around
-		i1, i2, ri1, ri2 = 0, start, start, indices[-1]
-		out.extend(_iup_segment(coords[i1:i2], coords[ri1], delta[ri1], coords[ri2], delta[ri2]))
-	out.append(delta[start])
-	for end in it:
-		if end - start > 1:
-			i1, i2, ri1, ri2 = start+1, end, start, end
-			out.extend(_iup_segment(coords[i1:i2], coords[ri1], delta[ri1], coords[ri2], delta[ri2]))
-		out.append(delta[end])
-		start = end
-	if start != n-1:
-		# Final segment that wraps around
-		i1, i2, ri1, ri2 = start+1, n, start, indices[0]
-		out.extend(_iup_segment(coords[i1:i2], coords[ri1], delta[ri1], coords[ri2], delta[ri2]))
-
-	assert len(delta) == len(out), (len(delta), len(out))
-	return out
-
-def _iup_delta(delta, coords, ends):
-	assert sorted(ends) == ends and len(coords) == (ends[-1]+1 if ends else 0) + 4
-	n = len(coords)
-	ends = ends + [n-4, n-3, n-2, n-1]
-	out = []
-	start = 0
-	for end in ends:
-		end += 1
-		contour = _iup_contour(delta[start:end], coords[start:end])
-		out.extend(contour)
-		start = end
-
-	return out
+	def computeDeltas(self, font):
+		"""Decode the variations of all the glyphs and compute the deltas
+		of all their tuples, from the default outlines of font. Processes
+		forked afterwards share them instead of each computing its own."""
+		if 'gvar' not in self.tables:
+			return
+		for glyphname, variations in self.tables['gvar'].variations.items():
+			if not variations: continue
+			origCoords, control = _GetCoordinates(font, glyphname)
+			for i, var in enumerate(variations):
+				self._getDelta(glyphname, i, var, origCoords, control)
+
+	def _instantiateGvar(self, font, loc):
+		gvar = self.tables['gvar']
+		glyf = font['glyf']
+		scalarFor = _TupleScalars(loc)
+		# Composite glyph bounds depend on their components, so instantiate
+		# glyphs by increasing component depth.
+		depths = _getComponentDepths(glyf, gvar.variations.keys())
+		glyphnames = sorted(gvar.variations.keys(), key=lambda name: (depths[name], name))
+		for glyphname in glyphnames:
+			origCoords, control, coordinates = None, None, None
+			for i, var in enumerate(gvar.variations[glyphname]):
+				scalar = scalarFor(var.axes)
+				if not scalar: continue
+				if origCoords is None:
+					origCoords,control = _GetCoordinates(font, glyphname)
+					coordinates = origCoords.copy()
+				coordinates += self._getDelta(glyphname, i, var, origCoords, control) * scalar
+			if coordinates is None and glyf[glyphname].isComposite():
+				# Its components may have moved, which changes its bounds
+				# and left side bearing.
+				coordinates, _ = _GetCoordinates(font, glyphname)
+			if coordinates is not None:
+				_SetCoordinates(font, glyphname, coordinates)
+
+	def _instantiateCvar(self, font, loc):
+		cvar = self.tables['cvar']
+		cvt = font['cvt ']
+		scalarFor = _TupleScalars(loc)
+		deltas = {}
+		for var in cvar.variations:
+			scalar = scalarFor(var.axes)
+			if not scalar: continue
+			for i, c in enumerate(var.coordinates):
+				if c is not None:
+					deltas[i] = deltas.get(i, 0) + scalar * c
+		for i, delta in deltas.items():
+			cvt[i] += int(round(delta))
+
+	def _getHVARAdvances(self, font, loc):
+		"""Return the advance widths at location, from the default advance
+		widths and the 'HVAR' deltas."""
+		hvar = self.tables['HVAR'].table
+		hmtx = font['hmtx'].metrics
+		varStore = hvar.VarStore
+		varStoreInstancer = VarStoreInstancer(varStore, self.fvarAxes, loc)
+		advMapping = hvar.AdvWidthMap.mapping if hvar.AdvWidthMap else None
+		advances = {}
+		for glyphID, glyphname in enumerate(font.getGlyphOrder()):
+			if advMapping is None:
+				# Direct mapping, with the inner index being the glyph ID
+				varidx = glyphID
+			elif advMapping:
+				varidx = advMapping[min(glyphID, len(advMapping) - 1)]
+			else:
+				continue
+			major, minor = varidx >> 16, varidx & 0xFFFF
+			if major >= len(varStore.VarData) or minor >= len(varStore.VarData[major].Item):
+				continue
+			advance = hmtx[glyphname][0]
+			advances[glyphname] = max(0, advance + int(round(varStoreInstancer[varidx])))
+		return advances
+
+	def _instantiateMVAR(self, font, loc):
+		mvar = self.tables['MVAR'].table
+		varStoreInstancer = VarStoreInstancer(mvar.VarStore, self.fvarAxes, loc)
+		for rec in getattr(mvar, 'ValueRecord', []):
+			if rec.ValueTag not in _MVAR_entries:
+				continue
+			tableTag, itemName = _MVAR_entries[rec.ValueTag]
+			if tableTag not in font:
+				continue
+			delta = int(round(varStoreInstancer[rec.VarIdx]))
+			if not delta: continue
+			table = font[tableTag]
+			setattr(table, itemName, getattr(table, itemName) + delta)
+
+
+def instantiateVariableFont(varfont, location, inplace=False):
+	"""Generate a static instance from a variable TTFont and a dictionary
+	defining the desired location along the variable font's axes.
+	The location values must be specified as user-space coordinates, e.g.:
+
+		{'wght': 400, 'wdth': 100}
+
+	Axes that are not specified are set to their default value.
+
+	The glyph outlines and metrics ('gvar'), the control values ('cvar'),
+	the advance widths ('HVAR') and the font-wide metrics ('MVAR') are
+	interpolated, and the variation tables are dropped.
+
+	If inplace is True, the variable font is modified and returned;
+	else a copy is instantiated and the variable font is left untouched.
+	"""
+	if not inplace:
+		# make a deep copy to not modify the original font
+		varfont = deepcopy(varfont)
+
+	loc = normalizeVariableFontLocation(varfont, location)
+	log.info("Normalized location: %s", loc)
+
+	_Instancer(varfont).instantiate(varfont, loc)
+
+	return varfont
+
+
+def _getDefaultFont(varfont):
+	"""Return a font sharing the fully decompiled default tables of
+	varfont, without its variation tables, to make the instances from."""
+	for tag in varfont.keys():
+		varfont[tag]
+	if 'glyf' in varfont:
+		glyf = varfont['glyf']
+		glyf.expandGlyphs(glyf.glyphs.values())
+	if 'cmap' in varfont:
+		for subtable in varfont['cmap'].tables:
+			if subtable.data is not None:
+				subtable.decompile(None, None)
+				subtable.data = None
+			# Don't make the instances copy varfont along with it
+			subtable.ttFont = None
+	font = copy(varfont)
+	font.tables = {tag: table for tag, table in varfont.tables.items()
+		       if tag not in _VARIATION_TABLES}
+	# All the tables are loaded; don't share the file with the instances.
+	font.reader = None
+	font.lazy = False
+	return font
+
+
+def instantiateVariableFonts(varfont, locations):
+	"""Generate a static instance of varfont for each of the user-space
+	locations, like instantiateVariableFont() does, and yield them in turn.
+
+	The variable font is decompiled only once, and is left untouched.
+	"""
+	locs = [normalizeVariableFontLocation(varfont, location) for location in locations]
+	instancer = _Instancer(varfont)
+	defaultFont = _getDefaultFont(varfont)
+	for loc in locs:
+		log.info("Normalized location: %s", loc)
+		font = deepcopy(defaultFont)
+		instancer.instantiate(font, loc)
+		yield font
+
+
+# The instancer and default font of saveVariableFontInstances; worker
+# processes are forked after they are set, so they can make the instances.
+_workerInstancer = None
+_workerFont = None
+
+def _saveWorkerInstance(args):
+	loc, outfile = args
+	font = deepcopy(_workerFont)
+	_workerInstancer.instantiate(font, loc)
+	font.save(outfile)
+	return outfile
+
+
+def saveVariableFontInstances(varfont, instances, workers=None):
+	"""Save static instances of varfont. 'instances' is a list of
+	(location, file) pairs, with user-space locations.
+
+	If 'workers' is greater than 1, the instances are made in that many
+	worker processes, forked once the variable font is decompiled and
+	the 'gvar' deltas are computed.
+	"""
+	global _workerInstancer, _workerFont
+
+	instances = list(instances)
+	locations = [location for location, _ in instances]
+	outfiles = [outfile for _, outfile in instances]
+	if workers is None or workers <= 1 or len(instances) <= 1 or _getForkContext() is None:
+		for font, outfile in zip(instantiateVariableFonts(varfont, locations), outfiles):
+			log.info("Saving instance font %s", outfile)
+			font.save(outfile)
+		return
+
+	locs = [normalizeVariableFontLocation(varfont, location) for location in locations]
+	_workerInstancer = _Instancer(varfont)
+	_workerFont = _getDefaultFont(varfont)
+	_workerInstancer.computeDeltas(_workerFont)
+	try:
+		pool = _getForkContext().Pool(min(workers, len(instances)))
+		try:
+			for outfile in pool.imap(_saveWorkerInstance, zip(locs, outfiles)):
+				log.info("Saved instance font %s", outfile)
+		finally:
+			pool.close()
+			pool.join()
+	finally:
+		_workerInstancer = _workerFont = None
+
+
+def _getNamedInstances(varfont, varfilename, outdir):
+	"""Return the (location, file) pairs of the named instances of varfont."""
+	base, suffix = os.path.splitext(os.path.basename(varfilename))
+	name = varfont['name']
+	instances = []
+	for i, instance in enumerate(varfont['fvar'].instances):
+		subfamilyName = name.getDebugName(instance.subfamilyNameID)
+		if subfamilyName:
+			subfamilyName = subfamilyName.replace(' ', '')
+		else:
+			subfamilyName = 'instance%d' % i
+		outfile = os.path.join(outdir, '%s-%s%s' % (base, subfamilyName, suffix))
+		instances.append((instance.coordinates, outfile))
+	return instances
 
 
 def main(args=None):
+	from argparse import ArgumentParser
+	from fontTools import configLogger
 
-	if args is None:
-		import sys
-		args = sys.argv[1:]
+	parser = ArgumentParser(prog='varLib.mutator')
+	parser.add_argument('input', metavar='INPUT.ttf', help='Input variable TTF file.')
+	parser.add_argument('locargs', metavar='AXIS=LOC', nargs='*',
+		help='List of space separated locations. A location consist in '
+		'the name of a variation axis, followed by \'=\' and a number. '
+		'E.g.: wdth=100')
+	parser.add_argument('-o', '--output', metavar='OUTPUT.ttf', default=None,
+		help='Output instance TTF file (default: INPUT-instance.ttf).')
+	parser.add_argument('-n', '--named-instances', action='store_true',
+		help='Instantiate all the named instances of the fvar table, '
+		'instead of a single location. They are saved as '
+		'INPUT-<subfamily name>.ttf, in the directory of INPUT.ttf, or '
+		'in OUTPUT if it is given.')
+	parser.add_argument('-j', '--workers', type=int, default=None,
+		help='Number of worker processes for --named-instances.')
+	options = parser.parse_args(args)
 
-	varfilename = args[0]
-	locargs = args[1:]
-	outfile = os.path.splitext(varfilename)[0] + '-instance.ttf'
+	# TODO: allow user to configure logging via command-line options
+	configLogger(level="INFO")
 
+	varfilename = options.input
 	loc = {}
-	for arg in locargs:
+	for arg in options.locargs:
 		tag,val = arg.split('=')
 		assert len(tag) <= 4
 		loc[tag.ljust(4)] = float(val)
-	print("Location:", loc)
 
-	print("Loading variable font")
+	log.info("Loading variable font")
 	varfont = TTFont(varfilename)
 
-	fvar = varfont['fvar']
-	axes = {a.axisTag:(a.minValue,a.defaultValue,a.maxValue) for a in fvar.axes}
-	# TODO Apply avar
-	# TODO Round to F2Dot14?
-	loc = normalizeLocation(loc, axes)
-	# Location is normalized now
-	print("Normalized location:", loc)
-
-	gvar = varfont['gvar']
-	glyf = varfont['glyf']
-	# get list of glyph names in gvar sorted by component depth
-	glyphnames = sorted(
-		gvar.variations.keys(),
-		key=lambda name: (
-			glyf[name].getCompositeMaxpValues(glyf).maxComponentDepth
-			if glyf[name].isComposite() else 0,
-			name))
-	for glyphname in glyphnames:
-		variations = gvar.variations[glyphname]
-		coordinates,_ = _GetCoordinates(varfont, glyphname)
-		origCoords, endPts = None, None
-		for var in variations:
-			scalar = supportScalar(loc, var.axes)
-			if not scalar: continue
-			delta = var.coordinates
-			if None in delta:
-				if origCoords is None:
-					origCoords,control = _GetCoordinates(varfont, glyphname)
-					endPts = control[1] if control[0] >= 1 else list(range(len(control[1])))
-				delta = _iup_delta(delta, origCoords, endPts)
-				# TODO Do IUP / handle None items
-			coordinates += GlyphCoordinates(delta) * scalar
-		_SetCoordinates(varfont, glyphname, coordinates)
-
-	print("Removing variable tables")
-	for tag in ('avar','cvar','fvar','gvar','HVAR','MVAR','VVAR','STAT'):
-		if tag in varfont:
-			del varfont[tag]
-
-	print("Saving instance font", outfile)
+	if options.named_instances:
+		if loc:
+			parser.error("locations can't be given with --named-instances")
+		outdir = options.output or os.path.dirname(varfilename)
+		instances = _getNamedInstances(varfont, varfilename, outdir)
+		saveVariableFontInstances(varfont, instances, workers=options.workers)
+		return
+
+	log.info("Location: %s", loc)
+	outfile = options.output or os.path.splitext(varfilename)[0] + '-instance.ttf'
+
+	instantiateVariableFont(varfont, loc, inplace=True)
+
+	log.info("Saving instance font %s", outfile)
 	varfont.save(outfile)
 
 
@@ -0,0 +1,48 @@
+"""
+Evaluate the deltas of an ItemVariationStore at a location.
+"""
+from __future__ import print_function, division, absolute_import
+from fontTools.misc.py23 import *
+from fontTools.varLib.models import supportScalar
+
+
+class VarStoreInstancer(object):
+
+	"""Returns the interpolated delta of a VarIdx, at a normalized location.
+
+	The scalar of each region is computed once, when the instancer is
+	created; looking up a VarIdx is then just a dot product of its delta
+	row with the scalars of its VarData.
+	"""
+
+	def __init__(self, varstore, fvarAxes, location={}):
+		self.fvarAxes = fvarAxes
+		assert varstore is None or varstore.Format == 1
+		self._varData = varstore.VarData if varstore else []
+		self._regions = varstore.VarRegionList.Region if varstore else []
+		self.setLocation(location)
+
+	def setLocation(self, location):
+		self.location = dict(location)
+		regionScalars = [self._getRegionScalar(region) for region in self._regions]
+		self._scalars = [[regionScalars[i] for i in varData.VarRegionIndex]
+				 for varData in self._varData]
+
+	def _getRegionScalar(self, region):
+		support = {}
+		for axis, regionAxis in zip(self.fvarAxes, region.VarRegionAxis):
+			peak = regionAxis.PeakCoord
+			if peak == 0:
+				continue
+			support[axis.axisTag] = (regionAxis.StartCoord, peak, regionAxis.EndCoord)
+		return supportScalar(self.location, support)
+
+	def __getitem__(self, varidx):
+		major, minor = varidx >> 16, varidx & 0xFFFF
+		scalars = self._scalars[major]
+		deltas = self._varData[major].Item[minor]
+		delta = 0.
+		for d, s in zip(deltas, scalars):
+			if s:
+				delta += d * s
+		return delta
@@ -1,6 +1,6 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
-from fontTools.misc.textTools import pad
+from fontTools.misc.textTools import pad, safeEval
 
 
 def test_pad():
@@ -9,3 +9,12 @@ def test_pad():
     assert len(pad(b'abcde', 4)) == 8
     assert pad(b'abcdef', 4) == b'abcdef\x00\x00'
     assert pad(b'abcdef', 1) == b'abcdef'
+
+
+def test_safeEval():
+    assert safeEval("12") == 12
+    assert safeEval("-3") == -3
+    assert safeEval("0x1F") == 31
+    assert safeEval("1.5") == 1.5
+    assert safeEval("True") is True
+    assert safeEval("(1, 2)") == (1, 2)
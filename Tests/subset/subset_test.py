@@ -3,6 +3,8 @@ from fontTools.misc.py23 import *
 from fontTools import subset
 from fontTools.ttLib import TTFont, newTable
 from fontTools.misc.loggingTools import CapturingLogHandler
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
 import difflib
 import logging
 import os
@@ -123,6 +125,98 @@ class SubsetTest(unittest.TestCase):
         subsetfont = TTFont(subsetpath)
         self.expect_ttx(subsetfont, self.getpath("expect_keep_math.ttx"), ["GlyphOrder", "CFF ", "MATH", "hmtx"])
 
+    def test_closure_GSUB(self):
+        font, fontpath = self.compile_font(self.getpath("TestTTF-Regular.ttx"), ".ttf")
+        # 'B' is only added by the second lookup, so the closure must run
+        # the first lookup again to add 'C'
+        addOpenTypeFeaturesFromString(font, """
+            lookup B_to_C { sub B by C; } B_to_C;
+            lookup A_to_B { sub A by B; } A_to_B;
+            feature liga {
+                lookup B_to_C;
+                lookup A_to_B;
+                sub C' lookup A_to_B A;
+            } liga;
+        """)
+        font.save(fontpath)
+        font = TTFont(fontpath)
+        subsetter = subset.Subsetter()
+        subsetter.populate(glyphs=["A"])
+        subsetter.subset(font)
+        self.assertEqual(font.getGlyphOrder(), [".notdef", "A", "B", "C"])
+
+        font = TTFont(fontpath)
+        subsetter = subset.Subsetter()
+        subsetter.populate(glyphs=["C"])
+        subsetter.subset(font)
+        self.assertEqual(font.getGlyphOrder(), [".notdef", "C"])
+
+    def test_GlyphIDSet(self):
+        a = subset._GlyphIDSet([0, 5, 300])
+        b = subset._GlyphIDSet(range(3, 40))
+        self.assertEqual(list(a), [0, 5, 300])
+        self.assertEqual(len(b), 37)
+        self.assertTrue(5 in a and 6 not in a and 1000 not in a)
+        self.assertEqual(list(a & b), [5])
+        self.assertEqual(list(a - b), [0, 300])
+        self.assertEqual(len(a | b), 39)
+        self.assertTrue(a.intersects(b))
+        self.assertFalse(subset._GlyphIDSet().intersects(a))
+        c = a.copy()
+        c.update([7, 8])
+        self.assertEqual(list(c), [0, 5, 7, 8, 300])
+        self.assertEqual(list(a), [0, 5, 300])
+
+    def test_PreparedFont(self):
+        _, fontpath = self.compile_font(self.getpath("TestTTF-Regular.ttx"), ".ttf")
+        subsetpath = self.temp_path(".ttf")
+        subset.main([fontpath, "--text=BC", "--output-file=%s" % subsetpath])
+        with open(subsetpath, "rb") as f:
+            expected = f.read()
+
+        prepared = subset.PreparedFont(fontpath)
+        data = prepared.subset(text="BC")
+        self.assertEqual(data, expected)
+        # Characters missing from the font don't change the subset
+        self.assertIs(prepared.subset(unicodes=[0x42, 0x43, 0x4E00]), data)
+        self.assertNotEqual(prepared.subset(text="A"), data)
+
+        # The glyph closure is reused after the subset font is evicted
+        prepared = subset.PreparedFont(fontpath, cache_size=0)
+        self.assertEqual(prepared.subset(text="BC"), expected)
+        self.assertEqual(prepared.subset(text="BC"), expected)
+        self.assertEqual(len(prepared._plans._items), 1)
+
+    def test_PreparedFont_closure(self):
+        font, fontpath = self.compile_font(self.getpath("TestTTF-Regular.ttx"), ".ttf")
+        addOpenTypeFeaturesFromString(font, """
+            lookup B_to_C { sub B by C; } B_to_C;
+            lookup A_to_B { sub A by B; } A_to_B;
+            feature liga {
+                lookup B_to_C;
+                lookup A_to_B;
+                sub C' lookup A_to_B A;
+            } liga;
+        """)
+        font.save(fontpath)
+        _, mathpath = self.compile_font(self.getpath("TestMATH-Regular.ttx"), ".otf")
+
+        unicodes = [0x41, 0x28, 0x302, 0x1D400, 0x1D435]
+        for path, args, request in [
+                (fontpath, ["--text=A"], {"text": "A"}),
+                (fontpath, ["--gids=1"], {"gids": [1]}),
+                (fontpath, ["--glyphs=A"], {"glyphs": ["A"]}),
+                (mathpath, ["--unicodes=%s" % ",".join("%X" % u for u in unicodes)],
+                 {"unicodes": unicodes})]:
+            subsetpath = self.temp_path(".ttf")
+            subset.main([path, "--output-file=%s" % subsetpath] + args)
+            with open(subsetpath, "rb") as f:
+                expected = f.read()
+            # The second time, the subset is made from the cached closure
+            prepared = subset.PreparedFont(path, cache_size=0)
+            self.assertEqual(prepared.subset(**request), expected)
+            self.assertEqual(prepared.subset(**request), expected)
+
     def test_options(self):
         # https://github.com/behdad/fonttools/issues/413
         opt1 = subset.Options()
@@ -254,6 +348,54 @@ class SubsetTest(unittest.TestCase):
         self.expect_ttx(subsetfont, self.getpath(
             "expect_no_hinting_desubroutinize_CFF.ttx"), ["CFF "])
 
+    def test_subroutines_CFF(self):
+        ttxpath = self.getpath("Lobster.subset.ttx")
+        font, fontpath = self.compile_font(ttxpath, ".otf")
+        subsetpath = self.temp_path(".otf")
+        subset.main([fontpath, "--glyphs=B,two", "--notdef-outline",
+                     "--output-file=%s" % subsetpath])
+        subsetfont = TTFont(subsetpath)
+        cff = font["CFF "].cff.topDictIndex[0]
+        subsetcff = subsetfont["CFF "].cff.topDictIndex[0]
+        self.assertLess(len(subsetcff.Private.Subrs), len(cff.Private.Subrs))
+        for glyphName in ["B", "two"]:
+            pen = RecordingPen()
+            cff.CharStrings[glyphName].draw(pen)
+            subsetpen = RecordingPen()
+            subsetcff.CharStrings[glyphName].draw(subsetpen)
+            self.assertEqual(subsetpen.value, pen.value)
+
+    def test_FDSelect_remap_CFF(self):
+        font = TTFont(recalcBBoxes=False, recalcTimestamp=False)
+        font.importXML(self.getpath("TestCID-Regular.ttx"))
+        # Move .notdef to the second FontDict too, so that the first one is
+        # dropped and the FDSelect indices of the retained glyphs change.
+        cff = font["CFF "].cff.topDictIndex[0]
+        cff.CharStrings[".notdef"].fdSelectIndex = 1
+        fontpath = self.temp_path(".otf")
+        font.save(fontpath)
+        font = TTFont(fontpath)
+        subsetpath = self.temp_path(".otf")
+        subset.main([fontpath, "--gids=1-3", "--notdef-outline",
+                     "--output-file=%s" % subsetpath])
+        subsetfont = TTFont(subsetpath)
+        cff = font["CFF "].cff.topDictIndex[0]
+        subsetcff = subsetfont["CFF "].cff.topDictIndex[0]
+        self.assertEqual(subsetfont.getGlyphOrder(), font.getGlyphOrder())
+        self.assertEqual(cff.FDSelect.gidArray, [1, 1, 1, 1])
+        self.assertEqual(subsetcff.FDSelect.gidArray, [0, 0, 0, 0])
+        self.assertEqual(len(subsetcff.FDArray), 1)
+        # Charstrings that call no subroutines are kept byte for byte
+        for glyphName in [".notdef", "cid00001"]:
+            self.assertEqual(subsetcff.CharStrings[glyphName].bytecode,
+                             cff.CharStrings[glyphName].bytecode)
+        for glyphName in ["cid00002", "cid00003"]:
+            pen = RecordingPen()
+            cff.CharStrings[glyphName].draw(pen)
+            subsetpen = RecordingPen()
+            subsetcff.CharStrings[glyphName].draw(subsetpen)
+            self.assertEqual(subsetpen.value, pen.value)
+
     def test_no_hinting_TTF(self):
         _, fontpath = self.compile_font(self.getpath("TestTTF-Regular.ttx"), ".ttf")
         subsetpath = self.temp_path(".ttf")
@@ -1,8 +1,101 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
 from fontTools.ttLib.sfnt import calcChecksum
+import sys
 
 
 def test_calcChecksum():
     assert calcChecksum(b"abcd") == 1633837924
     assert calcChecksum(b"abcdxyz") == 3655064932
+
+
+def test_calcChecksum_memoryview():
+    assert calcChecksum(memoryview(b"abcdxyz")) == 3655064932
+
+
+def _makeTestFont(path):
+    from fontTools.ttLib import TTFont
+    import os
+    ttx = os.path.join(os.path.dirname(__file__), "data", "TestTTF-Regular.ttx")
+    font = TTFont()
+    font.importXML(ttx)
+    font.save(path)
+
+
+def test_SFNTReader_useMmap(tmpdir):
+    from fontTools.ttLib.sfnt import SFNTReader
+    path = str(tmpdir / "TestTTF-Regular.ttf")
+    _makeTestFont(path)
+
+    with open(path, "rb") as f:
+        expected = SFNTReader(f, checkChecksums=2)
+        expected = {tag: expected[tag] for tag in expected.keys()}
+
+    reader = SFNTReader(open(path, "rb"), checkChecksums=2, useMmap=True)
+    for tag in reader.keys():
+        data = reader[tag]
+        if sys.version_info[0] >= 3:
+            assert isinstance(data, memoryview)
+        assert data == expected[tag]
+    reader.close()
+    assert reader._mmap is None
+    assert reader.file.closed
+
+
+def test_SFNTReader_useMmap_TTC():
+    from fontTools.ttLib.sfnt import SFNTReader
+    import os
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        "ttx", "data", "TestTTC.ttc")
+    with open(path, "rb") as f:
+        numFonts = SFNTReader(f, fontNumber=0).numFonts
+    assert numFonts > 1
+
+    for fontNumber in range(numFonts):
+        with open(path, "rb") as f:
+            expected = SFNTReader(f, checkChecksums=2, fontNumber=fontNumber)
+            expected = {tag: expected[tag] for tag in expected.keys()}
+
+        reader = SFNTReader(open(path, "rb"), checkChecksums=2,
+                            fontNumber=fontNumber, useMmap=True)
+        assert reader._mmap is not None
+        assert sorted(reader.keys()) == sorted(expected)
+        for tag in reader.keys():
+            assert reader[tag] == expected[tag]
+        reader.close()
+        assert reader._mmap is None
+
+
+def test_TTFont_useMmap(tmpdir):
+    from fontTools.ttLib import TTFont, TTLibError
+    import pytest
+    path = str(tmpdir / "TestTTF-Regular.ttf")
+    _makeTestFont(path)
+
+    font = TTFont(path, recalcTimestamp=False, useMmap=True)
+    assert font.reader._mmap is not None
+    assert font["head"].unitsPerEm == 1000
+    assert len(font["glyf"].keys()) == font["maxp"].numGlyphs
+
+    out = BytesIO()
+    font.save(out)
+    with pytest.raises(TTLibError):
+        font.save(path)
+    font.close()
+    assert font.reader._mmap is None
+
+    with open(path, "rb") as f:
+        assert out.getvalue() == f.read()
+
+
+def test_TTFont_useMmap_BytesIO(tmpdir):
+    from fontTools.ttLib import TTFont
+    path = str(tmpdir / "TestTTF-Regular.ttf")
+    _makeTestFont(path)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # streams without a file descriptor are read as usual
+    font = TTFont(BytesIO(data), useMmap=True)
+    assert font.reader._mmap is None
+    assert font["head"].unitsPerEm == 1000
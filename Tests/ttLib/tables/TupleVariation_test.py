@@ -642,6 +642,36 @@ class TupleVariationTest(unittest.TestCase):
 			                             pos=0, dataPos=len(tuples)),
             variations)
 
+	def test_compileTupleVariationStore_sharedPoints(self):
+		axisTags = ["wght", "wdth"]
+		variations = [
+			TupleVariation({"wght": (0.0, 1.0, 1.0)},
+			               [(1,1), (2,2), (3,3), None, None, None]),
+			TupleVariation({"wdth": (0.0, 1.0, 1.0)},
+			               [None, None, None, (4,4), None, None]),
+			TupleVariation({"wght": (0.0, 1.0, 1.0), "wdth": (0.0, 1.0, 1.0)},
+			               [(5,5), (6,6), (7,7), None, None, None]),
+		]
+		tupleVariationCount, tuples, data = compileTupleVariationStore(
+			variations, pointCount=6, axisTags=axisTags,
+			sharedTupleIndices={})
+		self.assertEqual(tupleVariationCount, 0x8003)
+		# The shared point numbers {0, 1, 2} come first, once
+		self.assertEqual(hexencode(data[:5]), "03 02 00 01 01")
+		self.assertEqual(
+			decompileTupleVariationStore("gvar", axisTags,
+			                             tupleVariationCount, pointCount=6,
+			                             sharedTuples={}, data=(tuples + data),
+			                             pos=0, dataPos=len(tuples)),
+			variations)
+
+		privateCount, privateTuples, privateData = compileTupleVariationStore(
+			variations, pointCount=6, axisTags=axisTags,
+			sharedTupleIndices={}, useSharedPoints=False)
+		self.assertEqual(privateCount, 3)
+		self.assertLess(len(tuples) + len(data),
+		                len(privateTuples) + len(privateData))
+
 	def test_decompileTupleVariationStore_Skia_I(self):
 		tvar = decompileTupleVariationStore(
 			tableTag="gvar", axisTags=["wght", "wdth"],
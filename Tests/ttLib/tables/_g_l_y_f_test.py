@@ -1,10 +1,17 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
-from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import _g_l_y_f
+from fontTools.ttLib.tables._g_l_y_f import GlyphCoordinates, _LazyGlyphs
 import sys
+import os
 import pytest
 
 
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
 class GlyphCoordinatesTest(object):
 
     def test_translate(self):
@@ -150,3 +157,188 @@ class GlyphCoordinatesTest(object):
         # since the Python float is truncated to a C float.
         # when using typecode 'd' it should return the correct value 243
         assert g[0][0] == round(afloat)
+
+    def test_extend(self):
+        g = GlyphCoordinates([(1,2)])
+        g.extend([(3,4), (5,6)])
+        assert list(g) == [(1,2), (3,4), (5,6)]
+        assert not g.isFloat()
+        g.extend(iter([(7.0,8)]))
+        assert list(g) == [(1,2), (3,4), (5,6), (7,8)]
+        assert not g.isFloat()
+        g.extend([(9,10), (.5,0)])
+        assert g.isFloat()
+        assert list(g) == [(1,2), (3,4), (5,6), (7,8), (9,10), (.5,0)]
+
+    @pytest.mark.parametrize("op", [
+        lambda g: g.translate((3, -7)),
+        lambda g: g.translate((.5, 0)),
+        lambda g: g.scale((2, 3)),
+        lambda g: g.scale((.5, 1.5)),
+        lambda g: g.transform(((2, 0), (1, 1))),
+        lambda g: g.transform(((.5, 0), (.2, .5))),
+        lambda g: g.transform(((.5, 0), (0, 1))),
+        lambda g: g.relativeToAbsolute(),
+        lambda g: g.absoluteToRelative(),
+        lambda g: g.toInt(),
+        lambda g: g.__iadd__(GlyphCoordinates([(1, 2)] * 50)),
+        lambda g: g.__isub__(GlyphCoordinates([(.25, 2)] * 50)),
+        lambda g: g.__imul__(.5),
+        lambda g: -g,
+    ])
+    @pytest.mark.parametrize("points", [
+        [(i, -2 * i) for i in range(50)],
+        [(i + .5, -2 * i) for i in range(50)],
+    ])
+    def test_numpy_matches_loops(self, monkeypatch, op, points):
+        pytest.importorskip("numpy")
+        g1 = GlyphCoordinates(points)
+        r1 = op(g1)
+        monkeypatch.setattr(_g_l_y_f, "numpy", None)
+        g2 = GlyphCoordinates(points)
+        r2 = op(g2)
+        assert g1.array.typecode == g2.array.typecode
+        assert g1.array == g2.array
+        if isinstance(r2, GlyphCoordinates):
+            assert r1.array.typecode == r2.array.typecode
+            assert r1.array == r2.array
+
+    @pytest.mark.parametrize("useNumpy", [True, False])
+    def test_toInt_matches_round(self, monkeypatch, useNumpy):
+        if useNumpy:
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setattr(_g_l_y_f, "numpy", None)
+        # enough points for the NumPy code path to be taken
+        n = _g_l_y_f._NUMPY_MIN_LENGTH // 2
+        points = [(i - n + .5, -i - .5) for i in range(2 * n)]
+        g = GlyphCoordinates(points)
+        g.toInt()
+        assert list(g) == [(int(round(x)), int(round(y))) for x, y in points]
+
+    def test_numpy_overflow(self):
+        pytest.importorskip("numpy")
+        g = GlyphCoordinates([(0x7FFF, 0)] * 50)
+        with pytest.raises(OverflowError):
+            g.translate((1, 0))
+
+
+@pytest.fixture
+def ttfData():
+    font = TTFont()
+    font.importXML(os.path.join(DATA_DIR, "TestTTF-Regular.ttx"))
+    buf = BytesIO()
+    font.save(buf)
+    return buf.getvalue()
+
+
+class GlyfTableLazyTest(object):
+
+    def test_lazy_glyphs(self, ttfData):
+        font = TTFont(BytesIO(ttfData), lazy=True)
+        glyf = font["glyf"]
+        assert isinstance(glyf.glyphs, _LazyGlyphs)
+        assert len(glyf) == font["maxp"].numGlyphs
+        assert set(glyf.keys()) == set(font.getGlyphOrder())
+        assert not any(glyf.glyphs.isLoaded(g) for g in font.getGlyphOrder())
+
+        glyph = glyf["period"]
+        assert glyf.glyphs.isLoaded("period")
+        assert glyf["period"] is glyph
+        assert "period" in glyf
+        assert len(glyf) == font["maxp"].numGlyphs
+
+        nonLazy = TTFont(BytesIO(ttfData), lazy=False)
+        assert glyph.coordinates == nonLazy["glyf"]["period"].coordinates
+
+    def test_lazy_compile_untouched(self, ttfData):
+        font = TTFont(BytesIO(ttfData), lazy=True, recalcBBoxes=False)
+        glyf = font["glyf"]
+        glyf["period"].coordinates.translate((10, 0))
+        data = glyf.compile(font)
+        assert [g for g in font.getGlyphOrder()
+                if glyf.glyphs.isLoaded(g)] == ["period"]
+
+        expected = TTFont(BytesIO(ttfData), recalcBBoxes=False)
+        expected["glyf"]["period"].coordinates.translate((10, 0))
+        assert data == expected["glyf"].compile(expected)
+
+    def test_lazy_compile_modified_component(self, ttfData):
+        font = TTFont(BytesIO(ttfData), lazy=True)
+        glyf = font["glyf"]
+        glyf["period"].coordinates.translate((0, 500))
+        data = glyf.compile(font)
+        assert glyf.glyphs.isLoaded("ellipsis")
+        ellipsis = glyf["ellipsis"]
+        assert (ellipsis.xMin, ellipsis.yMin, ellipsis.xMax, ellipsis.yMax) == \
+            (55, 500, 668, 622)
+
+        expected = TTFont(BytesIO(ttfData))
+        expected["glyf"]["period"].coordinates.translate((0, 500))
+        assert data == expected["glyf"].compile(expected)
+
+        # Without recalcBBoxes, the composite glyph is left as it was
+        font = TTFont(BytesIO(ttfData), lazy=True, recalcBBoxes=False)
+        glyf = font["glyf"]
+        glyf["period"].coordinates.translate((0, 500))
+        glyf.compile(font)
+        assert not glyf.glyphs.isLoaded("ellipsis")
+
+    def test_lazy_setitem_delitem(self, ttfData):
+        font = TTFont(BytesIO(ttfData), lazy=True)
+        glyf = font["glyf"]
+        numGlyphs = len(glyf)
+        glyf["period"] = glyf["ellipsis"]
+        assert glyf.glyphs["period"] is glyf.glyphs["ellipsis"]
+        assert len(glyf) == numGlyphs
+        del glyf["ellipsis"]
+        assert "ellipsis" not in glyf
+        assert len(glyf) == numGlyphs - 1
+        with pytest.raises(KeyError):
+            glyf.glyphs["ellipsis"]
+
+
+class GlyfTableExpandTest(object):
+
+    @staticmethod
+    def _glyphsData(ttfData):
+        font = TTFont(BytesIO(ttfData))
+        glyfData = font.reader["glyf"]
+        loca = font["loca"]
+        glyphs = [glyfData[loca[i]:loca[i+1]] for i in range(len(loca) - 1)]
+        return font, glyphs
+
+    @staticmethod
+    def _outline(glyph, glyf):
+        if not glyph.numberOfContours:
+            return None
+        coordinates, endPts, flags = glyph.getCoordinates(glyf)
+        program = getattr(glyph, "program", None)
+        return (
+            list(coordinates), coordinates.array.typecode, endPts, list(flags),
+            program.getBytecode() if program is not None else None)
+
+    @pytest.mark.parametrize("useNumpy", [True, False])
+    def test_expandGlyphs(self, ttfData, monkeypatch, useNumpy):
+        if useNumpy:
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setattr(_g_l_y_f, "numpy", None)
+        font, glyphsData = self._glyphsData(ttfData)
+        glyf = font["glyf"]
+        glyphs = [_g_l_y_f.Glyph(data) for data in glyphsData]
+        glyf.expandGlyphs(glyphs)
+        for glyphName, glyph in zip(font.getGlyphOrder(), glyphs):
+            expected = glyf[glyphName]
+            assert self._outline(glyph, glyf) == self._outline(expected, glyf)
+
+    def test_decompileCoordinatesRaw(self):
+        glyph = _g_l_y_f.Glyph()
+        # three repeated points with short positive x and no y, and one
+        # point with long x and short negative y
+        data = bytes(bytearray([
+            0x3B, 0x02, 0x05, 0x01, 0x02, 0x03, 0x12, 0x34, 0x05]))
+        flags, xs, ys = glyph.decompileCoordinatesRaw(4, data)
+        assert list(flags) == [0x3B, 0x3B, 0x3B, 0x05]
+        assert xs == (1, 2, 3, 0x1234)
+        assert ys == (5,)
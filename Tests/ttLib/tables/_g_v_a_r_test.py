@@ -8,6 +8,7 @@ from fontTools.ttLib.tables.TupleVariation import TupleVariation
 
 
 gvarClass = getTableClass("gvar")
+gvarModule = getTableModule("gvar")
 
 
 GVAR_DATA = deHexStr(
@@ -162,6 +163,30 @@ class GVARTableTest(unittest.TestCase):
 		self.assertEqual(hexStr(gvar.compile(font)),
 		                 hexStr(GVAR_DATA_EMPTY_VARIATIONS))
 
+	def test_compile_sharedPoints(self):
+		deltas = [(1, 1), None, (2, 2), None, None, None, None, None]
+		variations = {"I": [
+			TupleVariation({"wght": (0.0, 1.0, 1.0)}, deltas),
+			TupleVariation({"wdth": (0.0, 1.0, 1.0)}, deltas),
+		]}
+		sizes = {}
+		for useSharedPoints in (False, True):
+			font, gvar = self.makeFont(variations)
+			if useSharedPoints:
+				gvar.useSharedPoints = True
+			else:
+				self.assertFalse(gvar.useSharedPoints)
+			data = gvar.compile(font)
+			sizes[useSharedPoints] = len(data)
+			font, gvar = self.makeFont({})
+			font.lazy = True
+			gvar.decompile(data, font)
+			glyphData = gvar.variations.getGlyphData("I")
+			self.assertEqual(gvarModule._usesSharedPoints(glyphData),
+			                 useSharedPoints)
+			self.assertEqual(gvar.variations["I"], variations["I"])
+		self.assertLess(sizes[True], sizes[False])
+
 	def test_decompile(self):
 		font, gvar = self.makeFont({})
 		gvar.decompile(GVAR_DATA, font)
@@ -173,6 +198,49 @@ class GVARTableTest(unittest.TestCase):
 		self.assertEqual(gvar.variations,
 		                 {".notdef": [], "space": [], "I": []})
 
+	def test_decompile_notLazy(self):
+		for lazy in (None, False):
+			font, gvar = self.makeFont({})
+			font.lazy = lazy
+			gvar.decompile(GVAR_DATA, font)
+			self.assertIsInstance(gvar.variations, dict)
+			self.assertEqual(gvar.variations, GVAR_VARIATIONS)
+
+	def test_decompile_lazy(self):
+		font, gvar = self.makeFont({})
+		font.lazy = True
+		gvar.decompile(GVAR_DATA, font)
+		self.assertFalse(gvar.variations.isLoaded("I"))
+		self.assertEqual(len(gvar.variations), 3)
+		self.assertEqual(gvar.variations["I"], GVAR_VARIATIONS["I"])
+		self.assertTrue(gvar.variations.isLoaded("I"))
+		self.assertEqual(dict(gvar.variations), GVAR_VARIATIONS)
+
+	def test_toXML_lazy(self):
+		font, gvar = self.makeFont({})
+		font.lazy = True
+		gvar.decompile(GVAR_DATA, font)
+		self.assertEqual(getXML(gvar.toXML, font), GVAR_XML)
+		self.assertFalse(gvar.variations.isLoaded("I"))
+
+	def test_compile_lazy(self):
+		font, gvar = self.makeFont({})
+		font.lazy = True
+		gvar.decompile(GVAR_DATA, font)
+		self.assertEqual(hexStr(gvar.compile(font)), hexStr(GVAR_DATA))
+		self.assertFalse(gvar.variations.isLoaded("I"))
+
+	def test_compile_lazy_modified(self):
+		font, gvar = self.makeFont({})
+		font.lazy = True
+		gvar.decompile(GVAR_DATA, font)
+		gvar.variations["I"][0].coordinates[0] = (0, 0)
+		data = gvar.compile(font)
+		font, gvar = self.makeFont({})
+		gvar.decompile(data, font)
+		self.assertEqual(gvar.variations["I"][0].coordinates[0], (0, 0))
+		self.assertEqual(gvar.variations["I"][1:], GVAR_VARIATIONS["I"][1:])
+
 	def test_fromXML(self):
 		font, gvar = self.makeFont({})
 		for name, attrs, content in parseXML(GVAR_XML):
@@ -1,7 +1,11 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
 from fontTools.misc.textTools import deHexStr
+from fontTools.ttLib import TTFont, newTable
 from fontTools.ttLib.tables.otBase import OTTableReader, OTTableWriter
+from fontTools.ttLib.tables import otTables
+from fontTools.otlLib import builder
+import struct
 import unittest
 
 
@@ -32,6 +36,30 @@ class OTTableReaderTest(unittest.TestCase):
                          [0xDEAD, 0xBEEF, 0xCAFE])
         self.assertEqual(reader.pos, 6)
 
+    def test_readULongArray(self):
+        reader = OTTableReader(deHexStr("DEADBEEF 0000CAFE"))
+        self.assertEqual(list(reader.readULongArray(2)),
+                         [0xDEADBEEF, 0xCAFE])
+        self.assertEqual(reader.pos, 8)
+
+    def test_readStructArray(self):
+        reader = OTTableReader(deHexStr("FFFF 0001 FFFE 0002 FFFD 0003"))
+        reader.advance(2)
+        self.assertEqual(reader.readStructArray(struct.Struct(">HH"), 2),
+                         [(1, 0xFFFE), (2, 0xFFFD)])
+        self.assertEqual(reader.pos, 10)
+
+    def test_readStructArray_empty_record(self):
+        reader = OTTableReader(b"")
+        self.assertEqual(reader.readStructArray(struct.Struct(">"), 3),
+                         [(), (), ()])
+        self.assertEqual(reader.pos, 0)
+
+    def test_readStructArray_truncated(self):
+        reader = OTTableReader(deHexStr("0001 0002 0003"))
+        with self.assertRaises(struct.error):
+            reader.readStructArray(struct.Struct(">HH"), 2)
+
     def test_readUInt24(self):
         reader = OTTableReader(deHexStr("C3 13 37"))
         self.assertEqual(reader.readUInt24(), 0xC31337)
@@ -90,6 +118,94 @@ class OTTableWriterTest(unittest.TestCase):
         writer.writeULong(0xBEEFCAFE)
         self.assertEqual(writer.getData(), deHexStr("BE EF CA FE"))
 
+    def test_getAllData_shares_identical_subtables(self):
+        writer = OTTableWriter()
+        for value in (0xCAFE, 0xBEEF, 0xCAFE):
+            subWriter = writer.getSubWriter()
+            writer.writeSubTable(subWriter)
+            leaf = subWriter.getSubWriter()
+            subWriter.writeSubTable(leaf)
+            leaf.writeUShort(value)
+        self.assertEqual(writer.getAllData(), deHexStr(
+            "000A 0006 000A"  # the first and third subtables are shared
+            "0002 BEEF"
+            "0002 CAFE"))
+
+    def test_hash_is_cached(self):
+        writer = OTTableWriter()
+        subWriter = writer.getSubWriter()
+        writer.writeSubTable(subWriter)
+        subWriter.writeUShort(1)
+        writer._doneWriting({})
+        self.assertEqual(hash(subWriter), hash(subWriter.items))
+        self.assertEqual(hash(writer), hash((subWriter,)))
+        # the cached value is used, the subtree isn't walked again
+        subWriter.items = [None]
+        self.assertEqual(hash(writer), hash((subWriter,)))
+
+
+class OffsetOverflowTest(unittest.TestCase):
+
+    def test_getOverflowErrorRecords(self):
+        writer = OTTableWriter(tableTag="GSUB")
+        writer.name = "LookupList"
+        for i in range(3):
+            subWriter = writer.getSubWriter()
+            subWriter.name = "Lookup"
+            subWriter.repeatIndex = i
+            subWriter.writeData(bytechr(i) * 0x8000)
+            writer.writeSubTable(subWriter)
+        tables = writer._layOutTables()
+        records = OTTableWriter._getOverflowErrorRecords(tables)
+        self.assertEqual([r.LookupListIndex for r in records], [2])
+        self.assertIsNone(records[0].SubTableIndex)
+        self.assertIsNone(records[0].itemName)
+
+    def test_compile_fixes_all_overflows(self):
+        glyphs = [".notdef"] + ["g%d" % i for i in range(400)]
+        font = TTFont()
+        font.setGlyphOrder(glyphs)
+        glyphMap = {g: i for i, g in enumerate(glyphs)}
+        kerning = []
+        lookups = []
+        for k in range(2):
+            pairs = {}
+            for i, first in enumerate(glyphs[1:]):
+                for second in glyphs[i % 20 + 1:i % 20 + 31]:
+                    value = builder.buildValue(
+                        {"XPlacement": k, "XAdvance": i, "YAdvance": 1})
+                    pairs[(first, second)] = (value, None)
+            kerning.append(pairs)
+            subtable = builder.buildPairPosGlyphsSubtable(pairs, glyphMap)
+            lookups.append(builder.buildLookup([subtable]))
+        table = otTables.GPOS()
+        table.Version = 0x00010000
+        table.ScriptList = otTables.ScriptList()
+        table.ScriptList.ScriptRecord = []
+        table.FeatureList = otTables.FeatureList()
+        table.FeatureList.FeatureRecord = []
+        table.LookupList = otTables.LookupList()
+        table.LookupList.Lookup = lookups
+        font["GPOS"] = newTable("GPOS")
+        font["GPOS"].table = table
+
+        data = font["GPOS"].compile(font)
+
+        gpos = newTable("GPOS")
+        gpos.decompile(data, font)
+        for lookup, pairs in zip(gpos.table.LookupList.Lookup, kerning):
+            self.assertGreater(len(lookup.SubTable), 1)
+            decompiled = {}
+            for subtable in lookup.SubTable:
+                if lookup.LookupType == 9:
+                    subtable = subtable.ExtSubTable
+                for first, pairSet in zip(subtable.Coverage.glyphs,
+                                          subtable.PairSet):
+                    for record in pairSet.PairValueRecord:
+                        decompiled[(first, record.SecondGlyph)] = record.Value1
+            self.assertEqual(decompiled,
+                             {k: v[0] for k, v in pairs.items()})
+
 
 if __name__ == "__main__":
     import sys
@@ -7,7 +7,9 @@ from fontTools.misc.testTools import FakeFont, makeXMLWriter
 from fontTools.misc.textTools import deHexStr
 import fontTools.ttLib.tables.otConverters as otConverters
 from fontTools.ttLib import newTable
-from fontTools.ttLib.tables.otBase import OTTableReader, OTTableWriter
+from fontTools.ttLib.tables.otBase import (
+    OTTableReader, OTTableWriter, ValueRecordFactory)
+from fontTools.ttLib.tables import otTables
 import unittest
 
 
@@ -174,6 +176,154 @@ class UInt8Test(unittest.TestCase):
         self.assertEqual(xml, '<Foo attr="v" value="251"/>')
 
 
+class BuildConverterProgramsTest(unittest.TestCase):
+    font = FakeFont([".notdef", "A", "B"])
+
+    def buildConverters(self, tableSpec):
+        converters, convertersByName = otConverters.buildConverters(
+            tableSpec, {})
+        return converters
+
+    def test_merged_struct_run(self):
+        converters = self.buildConverters([
+            ("uint16", "Foo", None, None, ""),
+            ("int16", "Bar", None, None, ""),
+            ("uint32", "Baz", None, None, ""),
+            ("GlyphID", "Glyph", None, None, ""),
+        ])
+        decompileProgram, compileProgram = \
+            otConverters.buildConverterPrograms(converters)
+        # the three integers are read in one go
+        self.assertEqual(len(decompileProgram), 2)
+        self.assertEqual(len(compileProgram), 4)
+
+        data = deHexStr("0001 FFFE 00010000 0002 DEAD")
+        reader = OTTableReader(data)
+        table = {}
+        for step in decompileProgram:
+            step(reader, self.font, table)
+        self.assertEqual(table, {
+            "Foo": 1, "Bar": -2, "Baz": 0x10000, "Glyph": "B"})
+        self.assertEqual(reader.pos, 10)
+
+        writer = OTTableWriter()
+        for step in compileProgram:
+            step(writer, self.font, table)
+        self.assertEqual(writer.getData(), data[:10])
+
+    def test_aux(self):
+        converters = self.buildConverters([
+            ("uint16", "Version", None, None, ""),
+            ("uint16", "Foo", None, "Version >= 2", ""),
+        ])
+        decompileProgram, compileProgram = \
+            otConverters.buildConverterPrograms(converters)
+        for data, expected in [(deHexStr("0001 0005"), {"Version": 1}),
+                               (deHexStr("0002 0005"), {"Version": 2, "Foo": 5})]:
+            reader = OTTableReader(data)
+            table = {}
+            for step in decompileProgram:
+                step(reader, self.font, table)
+            self.assertEqual(table, expected)
+            writer = OTTableWriter()
+            for step in compileProgram:
+                step(writer, self.font, table)
+            self.assertEqual(writer.getData(), data[:reader.pos])
+
+    def test_write_error_annotation(self):
+        converters = self.buildConverters([
+            ("uint16", "Foo", None, None, ""),
+        ])
+        decompileProgram, compileProgram = \
+            otConverters.buildConverterPrograms(converters)
+        with self.assertRaises(Exception) as cm:
+            compileProgram[0](OTTableWriter(), self.font, {})
+        self.assertEqual(cm.exception.args[-1], "Foo")
+
+
+class StructReadArrayTest(unittest.TestCase):
+    font = FakeFont([".notdef", "A", "B", "C"])
+
+    def decompileEach(self, converter, reader, count):
+        records = []
+        for i in range(count):
+            records.append(converter.read(reader, self.font, {}))
+        return records
+
+    def test_RangeRecord(self):
+        converter = otConverters.Struct(
+            "RangeRecord", "RangeCount", 0, tableClass=otTables.RangeRecord)
+        data = deHexStr("0001 0002 0000  0003 DEAD 0002")
+        reader = OTTableReader(data)
+        records = converter.readArray(reader, self.font, {}, 2)
+        self.assertEqual(reader.pos, 12)
+        self.assertEqual([(r.Start, r.End, r.StartCoverageIndex)
+                          for r in records],
+                         [("A", "B", 0), ("C", "glyph57005", 2)])
+        self.assertEqual(records,
+                         self.decompileEach(converter, OTTableReader(data), 2))
+
+    def test_PairValueRecord(self):
+        converter = otConverters.Struct(
+            "PairValueRecord", "PairValueCount", 0,
+            tableClass=otTables.PairValueRecord)
+        data = deHexStr("0002 FFF6 0000 0000  0003 0014 0002 0000")
+
+        def makeReader():
+            reader = OTTableReader(data)
+            reader["ValueFormat1"] = ValueRecordFactory(0x0004)  # XAdvance
+            reader["ValueFormat2"] = ValueRecordFactory(0x0001 | 0x0002)
+            return reader
+
+        reader = makeReader()
+        records = converter.readArray(reader, self.font, {}, 2)
+        self.assertEqual(reader.pos, 16)
+        self.assertEqual(records[0].SecondGlyph, "B")
+        self.assertEqual(records[0].Value1.XAdvance, -10)
+        self.assertEqual(records[1].SecondGlyph, "C")
+        self.assertEqual(records[1].Value2.__dict__,
+                         {"XPlacement": 2, "YPlacement": 0})
+        self.assertEqual(records,
+                         self.decompileEach(converter, makeReader(), 2))
+
+    def test_ValueRecord_with_Device_falls_back(self):
+        converter = otConverters.Struct(
+            "PairValueRecord", "PairValueCount", 0,
+            tableClass=otTables.PairValueRecord)
+        reader = OTTableReader(deHexStr("0002 0000 0003 0000"))
+        reader["ValueFormat1"] = ValueRecordFactory(0x0010)  # XPlaDevice
+        reader["ValueFormat2"] = ValueRecordFactory(0)
+        self.assertIs(converter.readRecordArray(reader, self.font, 2),
+                      NotImplemented)
+        records = converter.readArray(reader, self.font, {}, 2)
+        self.assertEqual([r.SecondGlyph for r in records], ["B", "C"])
+        self.assertIsNone(records[0].Value1.XPlaDevice)
+        self.assertIsNone(records[1].Value2)
+
+    def test_offsets(self):
+        converter = otConverters.Struct(
+            "MarkRecord", "MarkCount", 0, tableClass=otTables.MarkRecord)
+        data = deHexStr("0001 000A  0002 0000  FFFF  0001 0064 FF9C")
+        reader = OTTableReader(data)
+        records = converter.readArray(reader, self.font, {}, 2)
+        self.assertEqual(reader.pos, 8)
+        self.assertEqual(records[0].Class, 1)
+        self.assertEqual((records[0].MarkAnchor.XCoordinate,
+                          records[0].MarkAnchor.YCoordinate), (100, -100))
+        self.assertEqual(records[1].Class, 2)
+        self.assertIsNone(records[1].MarkAnchor)
+
+    def test_Table_readArray(self):
+        converter = otConverters.Table(
+            "Coverage", "GlyphCount", 0, tableClass=otTables.Coverage)
+        data = deHexStr("0000 0004  0001 0001 0003")
+        reader = OTTableReader(data)
+        coverages = converter.readArray(reader, self.font, {}, 2)
+        self.assertEqual(reader.pos, 4)
+        self.assertIsNone(coverages[0])
+        self.assertEqual(coverages[1].glyphs, ["C"])
+
+
 if __name__ == "__main__":
     import sys
     sys.exit(unittest.main())
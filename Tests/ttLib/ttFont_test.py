@@ -0,0 +1,163 @@
+from __future__ import print_function, division, absolute_import
+from fontTools.misc.py23 import *
+from fontTools import ttLib
+from fontTools.ttLib import TTFont, newTable
+import os
+import pytest
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+@pytest.fixture
+def ttfData():
+    font = TTFont()
+    font.importXML(os.path.join(DATA_DIR, "TestTTF-Regular.ttx"))
+    buf = BytesIO()
+    font.save(buf)
+    return buf.getvalue()
+
+
+def _failingCompile(self, ttFont):
+    raise AssertionError("should not be compiled")
+
+
+class ReuseUnmodifiedTablesTest(object):
+
+    def test_unmodified(self, ttfData, monkeypatch):
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True)
+        name = font["name"]
+        assert name.getName(1, 3, 1).toUnicode() == "Test TTF"
+        monkeypatch.setattr(type(name), "compile", _failingCompile)
+        assert font.getTableData("name") == font.reader["name"]
+
+    def test_modified(self, ttfData):
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True)
+        font["name"].getName(1, 3, 1).string = "Foo"
+        data = font.getTableData("name")
+        assert data != font.reader["name"]
+        assert data == font["name"].compile(font)
+
+    def test_glyphOrder_modified(self, ttfData):
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True)
+        font["hmtx"]
+        assert font._isTableUnmodified("hmtx")
+        glyphOrder = font.getGlyphOrder()
+        font.setGlyphOrder(glyphOrder[:1] + glyphOrder[1:][::-1])
+        assert not font._isTableUnmodified("hmtx")
+
+    def test_table_replaced(self, ttfData):
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True)
+        font["name"]
+        font["name"] = newTable("name")
+        font["name"].names = []
+        assert not font._isTableUnmodified("name")
+
+    def test_recalculated(self, ttfData):
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True)
+        font["head"]
+        font["maxp"]
+        assert not font._isTableUnmodified("head")
+        assert not font._isTableUnmodified("maxp")
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True,
+                      recalcTimestamp=False, recalcBBoxes=False)
+        font.getGlyphOrder()
+        font["head"]
+        assert font._isTableUnmodified("head")
+
+    def test_disabled(self, ttfData):
+        font = TTFont(BytesIO(ttfData))
+        font["name"]
+        assert not font._isTableUnmodified("name")
+
+    def test_save(self, ttfData):
+        font = TTFont(BytesIO(ttfData), reuseUnmodifiedTables=True,
+                      recalcTimestamp=False)
+        for tag in font.keys():
+            font[tag]
+        buf = BytesIO()
+        font.save(buf)
+        assert buf.getvalue() == ttfData
+
+
+needsFork = pytest.mark.skipif(
+    ttLib._getForkContext() is None, reason="can't fork worker processes")
+
+
+class SaveWorkersTest(object):
+
+    @pytest.mark.parametrize("fileName", [
+        "TestTTF-Regular.ttx", "TestOTF-Regular.otx"])
+    @needsFork
+    def test_same_output(self, fileName):
+        font = TTFont(recalcTimestamp=False)
+        font.importXML(os.path.join(DATA_DIR, fileName))
+        expected = BytesIO()
+        font.save(expected)
+        actual = BytesIO()
+        font.save(actual, workers=2)
+        assert actual.getvalue() == expected.getvalue()
+
+    def test_only_leaf_tables_in_workers(self, ttfData, monkeypatch):
+        font = TTFont(BytesIO(ttfData), recalcTimestamp=False)
+        for tag in font.keys():
+            font[tag]
+        compiled = []
+
+        class FakePool(object):
+            def __init__(self, processes):
+                assert processes == 2
+            def map(self, func, tags, chunksize=None):
+                compiled.extend(tags)
+                return [font.getTableData(tag) for tag in tags]
+            def close(self):
+                pass
+            def join(self):
+                pass
+
+        class FakeContext(object):
+            Pool = FakePool
+
+        monkeypatch.setattr(ttLib, "_getForkContext", lambda: FakeContext)
+        buf = BytesIO()
+        font.save(buf, workers=2)
+        assert buf.getvalue() == ttfData
+        assert "name" in compiled and "post" in compiled
+        for tag in ("glyf", "loca", "hmtx", "maxp", "head"):
+            assert tag not in compiled
+
+    def test_read_from_file(self, tmpdir, ttfData):
+        path = str(tmpdir / "TestTTF.ttf")
+        with open(path, "wb") as f:
+            f.write(ttfData)
+        font = TTFont(path, lazy=True)
+        assert not font._canForkWorkers()
+        font.close()
+
+
+class SaveXMLStreamingTest(object):
+
+    @pytest.mark.parametrize("fileName", [
+        "TestTTF-Regular.ttx", "TestOTF-Regular.otx"])
+    @pytest.mark.parametrize("lazy", [None, True])
+    def test_same_output(self, fileName, lazy):
+        font = TTFont()
+        font.importXML(os.path.join(DATA_DIR, fileName))
+        buf = BytesIO()
+        font.save(buf)
+        expected = StringIO()
+        TTFont(BytesIO(buf.getvalue())).saveXML(expected)
+        font = TTFont(BytesIO(buf.getvalue()), lazy=lazy)
+        actual = StringIO()
+        font.saveXML(actual, streaming=True)
+        assert actual.getvalue() == expected.getvalue()
+        assert not font.tables
+
+    def test_keep_loaded_tables(self, ttfData):
+        font = TTFont(BytesIO(ttfData))
+        glyf = font["glyf"]
+        loaded = sorted(font.tables)
+        font.saveXML(StringIO(), streaming=True)
+        assert sorted(font.tables) == loaded
+        assert font["glyf"] is glyf
+        assert font.lazy is None
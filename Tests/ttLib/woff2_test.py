@@ -1,6 +1,7 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 from fontTools.misc.py23 import *
 from fontTools import ttLib
+from fontTools.ttLib import woff2
 from fontTools.ttLib.woff2 import (
 	WOFF2Reader, woff2DirectorySize, woff2DirectoryFormat,
 	woff2FlagsSize, woff2UnknownTagSize, woff2Base128MaxSize, WOFF2DirectoryEntry,
@@ -647,6 +648,79 @@ class WOFF2GlyfTableTest(unittest.TestCase):
 		data = glyfTable.compile(self.font)
 		self.assertEqual(self.tables['glyf'], data)
 
+	def test_reconstruct_glyf_without_numpy(self):
+		expected = WOFF2GlyfTable()
+		expected.reconstruct(self.transformedGlyfData, self.font)
+		numpy = woff2.numpy
+		woff2.numpy = None
+		try:
+			glyfTable = WOFF2GlyfTable()
+			glyfTable.reconstruct(self.transformedGlyfData, self.font)
+		finally:
+			woff2.numpy = numpy
+		self.assertEqual(expected.glyphs, glyfTable.glyphs)
+		data = glyfTable.compile(self.font)
+		self.assertEqual(self.tables['glyf'], data)
+
+	def test_reconstructData(self):
+		for padding in (1, 2, 4):
+			glyfTable = WOFF2GlyfTable()
+			glyfTable.reconstruct(self.transformedGlyfData, self.font)
+			glyfTable.padding = padding
+			expected = glyfTable.compile(self.font)
+			expectedLoca = self.font['loca'].compile(self.font)
+			glyfTable = WOFF2GlyfTable()
+			glyfTable.padding = padding
+			data = glyfTable.reconstructData(self.transformedGlyfData, self.font)
+			self.assertEqual(expected, data)
+			self.assertEqual(expectedLoca, self.font['loca'].compile(self.font))
+			self.assertFalse(hasattr(glyfTable, 'glyphs'))
+
+	def test_reconstructData_without_numpy(self):
+		numpy = woff2.numpy
+		woff2.numpy = None
+		try:
+			data = WOFF2GlyfTable().reconstructData(self.transformedGlyfData, self.font)
+		finally:
+			woff2.numpy = numpy
+		self.assertEqual(self.tables['glyf'], data)
+		self.assertEqual(self.tables['loca'], self.font['loca'].compile(self.font))
+
+	def test_reconstructData_explicit_bbox(self):
+		glyfTable = WOFF2GlyfTable()
+		glyfTable.reconstruct(self.transformedGlyfData, self.font)
+		glyphName = next(
+			glyphName for glyphName in glyfTable.glyphOrder
+			if glyfTable[glyphName].numberOfContours > 0)
+		glyph = glyfTable[glyphName]
+		bounds = glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax
+		glyph.xMin -= 10
+		glyph.yMax += 10
+		transformedGlyfData = glyfTable.transform(self.font)
+		for recalcBBoxes in (False, True):
+			self.font.recalcBBoxes = recalcBBoxes
+			glyfTable = WOFF2GlyfTable()
+			glyfTable.reconstruct(transformedGlyfData, self.font)
+			expected = glyfTable.compile(self.font)
+			data = WOFF2GlyfTable().reconstructData(transformedGlyfData, self.font)
+			self.assertEqual(expected, data)
+			offset = self.font['loca'][glyfTable.glyphOrder.index(glyphName)]
+			bbox = struct.unpack(">4h", data[offset+2:offset+10])
+			if recalcBBoxes:
+				self.assertEqual(bounds, bbox)
+			else:
+				self.assertEqual((bounds[0] - 10,) + bounds[1:3] + (bounds[3] + 10,), bbox)
+
+	def test_reconstructData_not_enough_data(self):
+		glyfTable = WOFF2GlyfTable()
+		glyfTable._decompileSubStreams(self.transformedGlyfData, self.font)
+		data = bytearray(self.transformedGlyfData)
+		# move the last byte of the flagStream to the glyphStream
+		data[16:24] = struct.pack(">II",
+			glyfTable.flagStreamSize - 1, glyfTable.glyphStreamSize + 1)
+		with self.assertRaisesRegex(ttLib.TTLibError, "not enough 'flagStream' data"):
+			WOFF2GlyfTable().reconstructData(bytes(data), self.font)
+
 	def test_reconstruct_glyf_incorrect_glyphOrder(self):
 		glyfTable = WOFF2GlyfTable()
 		badGlyphOrder = self.font.getGlyphOrder()[:-1]
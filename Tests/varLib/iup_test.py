@@ -0,0 +1,71 @@
+from __future__ import print_function, division, absolute_import
+from fontTools.misc.py23 import *
+from fontTools.varLib.iup import (
+    iup_contour, iup_delta, iup_contour_optimize, iup_delta_optimize)
+import math
+import pytest
+
+
+def check_contour(delta, coords, optimized, tolerance):
+    assert len(optimized) == len(delta)
+    for (x, y), (p, q) in zip(delta, iup_contour(optimized, coords)):
+        assert abs(complex(x - p, y - q)) <= tolerance
+
+
+def count_explicit(delta):
+    return sum(1 for d in delta if d is not None)
+
+
+@pytest.mark.parametrize("delta, coords, tolerance, expected", [
+    ([(0, 0), (0, 0)], [(0, 0), (10, 10)], 0, [None, None]),
+    ([(.2, -.3), (0, .4)], [(0, 0), (10, 10)], .5, [None, None]),
+    ([(5, 5)], [(0, 0)], 0, [(5, 5)]),
+    ([(3, 4), (3, 4), (3, 4)], [(0, 0), (10, 0), (5, 5)], 0,
+     [(3, 4), None, None]),
+    # the corners of a square scaled by 2: two opposite corners are enough
+    ([(0, 0), (0, 100), (100, 100), (100, 0)],
+     [(0, 0), (0, 100), (100, 100), (100, 0)], 0,
+     [None, (0, 100), None, (100, 0)]),
+    # a single explicit point is enough within tolerance
+    ([(9, 4), (10, 4)], [(4, 8), (5, 8)], 1, [None, (10, 4)]),
+])
+def test_iup_contour_optimize(delta, coords, tolerance, expected):
+    optimized = iup_contour_optimize(delta, coords, tolerance)
+    assert optimized == expected
+    check_contour(delta, coords, optimized, tolerance)
+
+
+@pytest.mark.parametrize("n", [16, 200])
+@pytest.mark.parametrize("tolerance", [.1, .5])
+def test_iup_contour_optimize_ellipse(n, tolerance):
+    coords = [
+        (round(500 + 400 * math.cos(2 * math.pi * i / n)),
+         round(500 + 300 * math.sin(2 * math.pi * i / n)))
+        for i in range(n)]
+    # scaling the ellipse: a few extrema reproduce all the other points
+    delta = [(x * .1, y * .05) for x, y in coords]
+    optimized = iup_contour_optimize(delta, coords, tolerance)
+    check_contour(delta, coords, optimized, tolerance)
+    assert count_explicit(optimized) <= 8
+
+    # make every other point move on its own: they all must be explicit
+    delta = [(dx + 50 * (i % 2), dy) for i, (dx, dy) in enumerate(delta)]
+    optimized = iup_contour_optimize(delta, coords, tolerance)
+    check_contour(delta, coords, optimized, tolerance)
+    assert count_explicit(optimized) >= n // 2
+
+
+def test_iup_delta_optimize():
+    # two contours, plus the four phantom points
+    coords = [(0, 0), (0, 100), (100, 100), (100, 0),
+              (200, 0), (300, 0), (250, 100),
+              (0, 0), (400, 0), (0, 0), (0, 0)]
+    ends = [3, 6]
+    delta = [(0, 0), (0, 100), (100, 100), (100, 0),
+             (10, 0), (10, 0), (10, 0),
+             (0, 0), (20, 0), (0, 0), (0, 0)]
+    optimized = iup_delta_optimize(delta, coords, ends)
+    assert optimized == [None, (0, 100), None, (100, 0),
+                         (10, 0), None, None,
+                         None, (20, 0), None, None]
+    assert iup_delta(optimized, coords, ends) == delta
@@ -1,7 +1,9 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
+from fontTools.varLib import models
 from fontTools.varLib.models import (
     normalizeLocation, supportScalar, VariationModel)
+import pytest
 
 
 def test_normalizeLocation():
@@ -75,3 +77,43 @@ def test_VariationModel():
          5: 0.6666666666666667,
          6: 0.16666666666666669,
          7: 0.6666666666666667}]
+
+
+@pytest.mark.parametrize("useNumpy", [True, False])
+def test_VariationModel_batch(monkeypatch, useNumpy):
+    if useNumpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(models, "numpy", None)
+    locations = [
+        {},
+        {'wght': 1},
+        {'wght': -1},
+        {'wdth': 1},
+        {'wght': 1, 'wdth': 1},
+        {'wght': .5},
+    ]
+    model = VariationModel(locations)
+    masterValuesList = [
+        [0, 0, 0, 0, 0, 0],
+        [500, 700, 300, 600, 800, 650],
+        [-3, 17, 11, 5, -8, 101],
+        [0.5, 1.25, -2.75, 3, 4, 5],
+    ]
+
+    deltasList = model.getDeltasBatch(masterValuesList)
+    assert deltasList == [
+        model.getDeltas(values) for values in masterValuesList]
+
+    locs = [{}, {'wght': .25}, {'wght': 1, 'wdth': .5}, {'wdth': -1}]
+    assert model.getScalarsMatrix(locs) == [
+        model.getScalars(loc) for loc in locs]
+    result = model.interpolateFromMastersBatch(locs, masterValuesList)
+    assert len(result) == len(locs)
+    for loc, values in zip(locs, result):
+        assert values == pytest.approx([
+            model.interpolateFromMasters(loc, masterValues)
+            for masterValues in masterValuesList])
+
+    assert model.getDeltasBatch([]) == []
+    assert model.interpolateFromDeltasBatch(locs, []) == [[]] * len(locs)
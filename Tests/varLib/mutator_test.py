@@ -1,8 +1,13 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
-from fontTools.ttLib import TTFont
+from fontTools.ttLib import TTFont, newTable, _getForkContext
+from fontTools.ttLib.tables import _g_v_a_r
+from fontTools.varLib import mutator as mutatorModule
 from fontTools.varLib import build
 from fontTools.varLib.mutator import main as mutator
+from fontTools.varLib.mutator import (
+    instantiateVariableFont, instantiateVariableFonts,
+    normalizeVariableFontLocation, saveVariableFontInstances)
 import difflib
 import os
 import shutil
@@ -139,6 +144,157 @@ class MutatorTest(unittest.TestCase):
         expected_ttx_path = self.get_test_output(varfont_name + '-instance.ttx')
         self.expect_ttx(instfont, expected_ttx_path, tables)
 
+    def test_varlib_mutator_instantiateVariableFont(self):
+        varfont = TTFont(recalcTimestamp=False)
+        varfont.importXML(self.get_test_input(
+            os.path.join('master_ttx_varfont_ttf', 'Mutator_IUP.ttx')))
+
+        instfont = instantiateVariableFont(
+            varfont, {'wdth': 80, 'ASCN': 628})
+
+        # The variable font is left untouched
+        self.assertIn('gvar', varfont)
+        for tag in ('fvar', 'gvar', 'HVAR', 'MVAR'):
+            self.assertNotIn(tag, instfont)
+
+        instfont_path = self.temp_path(suffix='.ttf')
+        instfont.save(instfont_path)
+        instfont = TTFont(instfont_path)
+        tables = [table_tag for table_tag in instfont.keys() if table_tag != 'head']
+        expected_ttx_path = self.get_test_output('Mutator_IUP-instance.ttx')
+        self.expect_ttx(instfont, expected_ttx_path, tables)
+
+    def test_varlib_mutator_moved_components(self):
+        varfont = TTFont(recalcTimestamp=False)
+        varfont.importXML(self.get_test_input(
+            os.path.join('master_ttx_varfont_ttf', 'Mutator_IUP.ttx')))
+        # No tuple of the composite 'q' applies at wdth=60, but the tuples
+        # of its components do.
+        variations = varfont['gvar'].variations
+        self.assertTrue(varfont['glyf']['q'].isComposite())
+        variations['q'] = [v for v in variations['q'] if 'wdth' not in v.axes]
+
+        instfont = instantiateVariableFont(varfont, {'wdth': 60})
+        glyf = instfont['glyf']
+        glyph = glyf['q']
+        glyph.recalcBounds(glyf)
+        self.assertEqual(instfont['hmtx']['q'][1], glyph.xMin)
+
+    def test_varlib_mutator_normalize_location_avar(self):
+        varfont = TTFont(recalcBBoxes=False, recalcTimestamp=False)
+        varfont.importXML(self.get_test_input(
+            os.path.join('master_ttx_varfont_ttf', 'Mutator_IUP.ttx')))
+        axes = {a.axisTag: a for a in varfont['fvar'].axes}
+        wdth = axes['wdth']
+        halfway = (wdth.minValue + wdth.defaultValue) / 2
+
+        loc = normalizeVariableFontLocation(varfont, {'wdth': halfway})
+        self.assertEqual(loc['wdth'], -0.5)
+
+        avar = varfont['avar'] = newTable('avar')
+        avar.segments = {tag: {-1.0: -1.0, 0.0: 0.0, 1.0: 1.0} for tag in axes}
+        avar.segments['wdth'][-0.5] = -0.2
+        loc = normalizeVariableFontLocation(varfont, {'wdth': halfway})
+        # Rounded to F2Dot14
+        self.assertEqual(loc['wdth'], -3277 / 16384)
+
+    def test_varlib_mutator_instantiateVariableFonts(self):
+        varfont_path = self.temp_path(suffix='.ttf')
+        varfont = TTFont(recalcTimestamp=False)
+        varfont.importXML(self.get_test_input(
+            os.path.join('master_ttx_varfont_ttf', 'Mutator_IUP.ttx')))
+        varfont.save(varfont_path)
+
+        locations = [{'wdth': 80, 'ASCN': 628}, {'wdth': 100}, {'wdth': 90}]
+        expected = []
+        for location in locations:
+            font = instantiateVariableFont(
+                TTFont(varfont_path, recalcTimestamp=False), location)
+            data = BytesIO()
+            font.save(data)
+            expected.append(data.getvalue())
+
+        varfont = TTFont(varfont_path, recalcTimestamp=False)
+        actual = []
+        for font in instantiateVariableFonts(varfont, locations):
+            self.assertNotIn('gvar', font)
+            data = BytesIO()
+            font.save(data)
+            actual.append(data.getvalue())
+        self.assertEqual(expected, actual)
+        self.assertIn('gvar', varfont)
+
+    @unittest.skipIf(_getForkContext() is None, "needs fork")
+    def test_varlib_mutator_workers_share_deltas(self):
+        varfont_path = self.temp_path(suffix='.ttf')
+        varfont = TTFont()
+        varfont.importXML(self.get_test_input(
+            os.path.join('master_ttx_varfont_ttf', 'Mutator_IUP.ttx')))
+        varfont.save(varfont_path)
+        varfont = TTFont(varfont_path, lazy=True)
+
+        # The workers must neither decode 'gvar' nor interpolate deltas
+        pid = os.getpid()
+        def inParent(func):
+            def wrapper(*args, **kwargs):
+                assert os.getpid() == pid, "%s called in worker" % func.__name__
+                return func(*args, **kwargs)
+            return wrapper
+        saved = mutatorModule.iup_delta, _g_v_a_r.decompileGlyph_
+        mutatorModule.iup_delta = inParent(saved[0])
+        _g_v_a_r.decompileGlyph_ = inParent(saved[1])
+        try:
+            instances = [({'wdth': wdth}, self.temp_path(suffix='.ttf'))
+                         for wdth in (60, 80, 100)]
+            saveVariableFontInstances(varfont, instances, workers=2)
+        finally:
+            mutatorModule.iup_delta, _g_v_a_r.decompileGlyph_ = saved
+
+        for location, outfile in instances:
+            expected = instantiateVariableFont(
+                TTFont(varfont_path), location)
+            self.assertEqual(TTFont(outfile)['hmtx'].metrics,
+                             expected['hmtx'].metrics)
+
+    def test_varlib_mutator_named_instances(self):
+        suffix = '.ttf'
+        ds_path = self.get_test_input('Build.designspace')
+        ufo_dir = self.get_test_input('master_ufo')
+        ttx_dir = self.get_test_input('master_ttx_interpolatable_ttf')
+
+        self.temp_dir()
+        ttx_paths = self.get_file_list(ttx_dir, '.ttx', 'TestFamily-')
+        for path in ttx_paths:
+            self.compile_font(path, suffix, self.tempdir)
+
+        finder = lambda s: s.replace(ufo_dir, self.tempdir).replace('.ufo', suffix)
+        varfont, _, _ = build(ds_path, finder)
+        varfont_path = os.path.join(self.tempdir, 'Mutator' + suffix)
+        varfont.save(varfont_path)
+        instances = varfont['fvar'].instances
+        self.assertTrue(instances)
+
+        outdirs = []
+        for workers in (1, 2):
+            outdir = os.path.join(self.tempdir, 'workers%d' % workers)
+            os.mkdir(outdir)
+            mutator([varfont_path, '--named-instances', '-o', outdir,
+                     '-j', str(workers)])
+            outdirs.append(outdir)
+
+        name = varfont['name']
+        for instance in instances:
+            subfamilyName = name.getDebugName(instance.subfamilyNameID)
+            filename = 'Mutator-%s%s' % (subfamilyName.replace(' ', ''), suffix)
+            expected = instantiateVariableFont(varfont, instance.coordinates)
+            for outdir in outdirs:
+                instfont = TTFont(os.path.join(outdir, filename))
+                self.assertNotIn('fvar', instfont)
+                self.assertEqual(
+                    instfont['hmtx'].metrics, expected['hmtx'].metrics)
+                self.assertEqual(
+                    instfont['OS/2'].sxHeight, expected['OS/2'].sxHeight)
+
 
 if __name__ == "__main__":
     sys.exit(unittest.main())
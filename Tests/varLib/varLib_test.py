@@ -1,6 +1,7 @@
 from __future__ import print_function, division, absolute_import
 from fontTools.misc.py23 import *
 from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._g_v_a_r import _usesSharedPoints
 from fontTools.varLib import build
 from fontTools.varLib import main as varLib_main
 import difflib
@@ -117,6 +118,46 @@ class BuildTest(unittest.TestCase):
         self.expect_ttx(varfont, expected_ttx_path, tables)
         self.check_ttx_dump(varfont, expected_ttx_path, tables, suffix)
 
+    def test_varlib_build_ttf_workers(self):
+        suffix = '.ttf'
+        ds_path = self.get_test_input('Build.designspace')
+        ufo_dir = self.get_test_input('master_ufo')
+        ttx_dir = self.get_test_input('master_ttx_interpolatable_ttf')
+
+        self.temp_dir()
+        ttx_paths = self.get_file_list(ttx_dir, '.ttx', 'TestFamily-')
+        for path in ttx_paths:
+            self.compile_font(path, suffix, self.tempdir)
+
+        finder = lambda s: s.replace(ufo_dir, self.tempdir).replace('.ufo', suffix)
+        varfont, model, _ = build(ds_path, finder, workers=2)
+
+        tables = ['GDEF', 'HVAR', 'fvar', 'gvar']
+        expected_ttx_path = self.get_test_output('Build.ttx')
+        self.expect_ttx(varfont, expected_ttx_path, tables)
+
+    def test_varlib_build_ttf_optimize(self):
+        suffix = '.ttf'
+        ds_path = self.get_test_input('Build.designspace')
+        ufo_dir = self.get_test_input('master_ufo')
+        ttx_dir = self.get_test_input('master_ttx_interpolatable_ttf')
+
+        self.temp_dir()
+        ttx_paths = self.get_file_list(ttx_dir, '.ttx', 'TestFamily-')
+        for path in ttx_paths:
+            self.compile_font(path, suffix, self.tempdir)
+
+        finder = lambda s: s.replace(ufo_dir, self.tempdir).replace('.ufo', suffix)
+        for optimize in (True, False):
+            varfont, _, _ = build(ds_path, finder, optimize=optimize)
+            self.assertEqual(varfont['gvar'].useSharedPoints, optimize)
+            path = self.temp_path(suffix=suffix)
+            varfont.save(path)
+            variations = TTFont(path, lazy=True)['gvar'].variations
+            sharing = [glyph for glyph in variations if
+                       _usesSharedPoints(variations.getGlyphData(glyph))]
+            self.assertEqual(bool(sharing), optimize)
+
 
     def test_varlib_build3_ttf(self):
         """Designspace file does not contain an <axes> element."""